@@ -0,0 +1,139 @@
+"""
+Background anti-entropy between replicas.
+
+Every interval, this server asks each peer for one digest per mailbox and compares them with its own. For each
+mailbox that differs, it asks for the digests of the mailbox's hash buckets (messages are spread over
+mailbox_store.DIGEST_BUCKETS by the hash of their key). It then pulls only the messages of the buckets that
+differ. The store merges them, skipping messages it already holds or has already delivered. Repair traffic is
+therefore proportional to the divergence, not to the mailbox size. Every server pulls from its peers, so the
+repair runs in both directions.
+
+The tombstones of delivered messages are what keeps a peer that still holds them from handing them back. A
+tombstone is only forgotten once a sync with every peer, started after it was buried, found that peer without
+the message: then no replica is left to copy it back from.
+"""
+import sys
+import os
+import logging
+import threading
+
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_messenger"))
+try:
+    import messenger_pb2
+    import messenger_pb2_grpc
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+import metrics
+from mailbox_store import MailboxStore
+from replication import format_peer_address
+
+
+DEFAULT_INTERVAL = 10  # seconds
+RPC_TIMEOUT = 5  # seconds
+
+REPAIRED_MESSAGES = metrics.REGISTRY.counter(
+    "server_anti_entropy_repaired_total", "Messages copied from a peer by anti-entropy", ("peer",))
+PULLED_BUCKETS = metrics.REGISTRY.counter(
+    "server_anti_entropy_buckets_total", "Hash buckets pulled from a peer by anti-entropy", ("peer",))
+
+
+def sync_from_peer(
+        store: MailboxStore, stub: messenger_pb2_grpc.MessengerServiceStub, peer: str = "",
+        confirmed: dict[str, int] | None = None
+    ) -> int:
+    """
+        Pulls what this store is missing from one peer. Returns how many messages were added.
+        confirmed gets, for every mailbox with tombstones, a mark (store.tombstone_mark()) such that the peer
+        holds none of the messages buried before it. Mailboxes where the peer still holds one are left out.
+    """
+    mark = store.tombstone_mark()
+    remote = stub.Digest(messenger_pb2.DigestRequest(), timeout=RPC_TIMEOUT).mailboxes
+    local = store.mailbox_digests()
+
+    # Matching buckets hold the same (undelivered) messages, so a peer can only hold delivered ones in pulled buckets
+    unconfirmed = set()
+    repaired = 0
+    for mailbox, digest in remote.items():
+        if local.get(mailbox) == digest:
+            continue
+        remote_buckets = stub.Digest(messenger_pb2.DigestRequest(mailbox=mailbox), timeout=RPC_TIMEOUT).buckets
+        local_buckets = store.bucket_digests(mailbox)
+        differing = [
+            bucket for bucket, (mine, theirs) in enumerate(zip(local_buckets, remote_buckets))
+            if theirs and mine != theirs
+        ]
+        if not differing:
+            continue
+
+        inbox = stub.Pull(messenger_pb2.PullRequest(mailbox=mailbox, buckets=differing), timeout=RPC_TIMEOUT)
+        if store.tombstoned(mailbox, [message.id for message in inbox.messages]):
+            unconfirmed.add(mailbox)
+        added = store.merge(mailbox, list(inbox.messages))
+        PULLED_BUCKETS.inc(len(differing), peer=peer)
+        REPAIRED_MESSAGES.inc(added, peer=peer)
+        repaired += added
+
+    if confirmed is not None:
+        for mailbox in store.tombstone_mailboxes():
+            if mailbox not in unconfirmed:
+                confirmed[mailbox] = mark
+    return repaired
+
+
+class AntiEntropy:
+    """
+        Runs sync_from_peer against every peer, once per interval, on a background thread, then forgets the
+        tombstones every peer has confirmed. The store should be created with max_tombstones=None, so it does
+        not drop tombstones on its own.
+    """
+
+    def __init__(self, store: MailboxStore, peers: list[str], interval: float = DEFAULT_INTERVAL):
+        self.store = store
+        self.peers = peers
+        self.interval = interval
+        # Latest confirmation of each peer: key=peer, value={mailbox: tombstone mark}
+        self._confirmed = {peer: {} for peer in peers}
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "AntiEntropy":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self) -> None:
+        channels = {peer: grpc.insecure_channel(format_peer_address(peer)) for peer in self.peers}
+        stubs = {peer: messenger_pb2_grpc.MessengerServiceStub(channel) for peer, channel in channels.items()}
+
+        while not self._stopped.wait(self.interval):
+            self.sync_round(stubs)
+
+        for channel in channels.values():
+            channel.close()
+
+    def sync_round(self, stubs: dict[str, messenger_pb2_grpc.MessengerServiceStub]) -> None:
+        """Syncs from every peer of stubs, then forgets the tombstones no peer can bring back anymore."""
+        for peer, stub in stubs.items():
+            try:
+                repaired = sync_from_peer(self.store, stub, peer, self._confirmed[peer])
+            except grpc.RpcError as e:
+                logging.debug("Anti-entropy with %s failed: %s", peer, e.code())
+                continue
+            if repaired:
+                logging.info("Anti-entropy copied %d message(s) from %s", repaired, peer)
+
+        for mailbox in self.store.tombstone_mailboxes():
+            # A peer that never confirmed this mailbox (down, or still holding a message) keeps every tombstone
+            before = min(confirmed.get(mailbox, 0) for confirmed in self._confirmed.values())
+            if before:
+                self.store.forget_tombstones(mailbox, before)
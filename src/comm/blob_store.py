@@ -0,0 +1,122 @@
+"""
+Content-addressed storage for message attachments.
+
+Every blob is a file named after the SHA-256 of its content (<directory>/<first 2 hex digits>/<digest>), so an
+attachment sent to many recipients, or uploaded twice, is stored once. Uploads are written to a temporary file
+while the digest is computed incrementally, then renamed into place, so readers never see a partial blob and
+neither side ever holds a whole file in memory.
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from typing import Iterator
+
+
+CHUNK_SIZE = 64 * 1024  # bytes
+MAX_BLOB_BYTES = 1024 * 1024 * 1024  # bytes
+
+
+class BlobTooLargeError(ValueError):
+    pass
+
+
+class DigestMismatchError(ValueError):
+    pass
+
+
+def is_digest(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+class BlobWriter:
+    """One upload in progress. commit() moves it into the store, close() discards it if it was not committed."""
+
+    def __init__(self, store: "BlobStore", max_bytes: int):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self._path = tempfile.mkstemp(dir=store.temp_dir)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise BlobTooLargeError(f"Attachments are limited to {self.max_bytes} bytes")
+        self._hash.update(data)
+        self._file.write(data)
+
+    def commit(self, expected: str = "") -> str:
+        """Stores the blob and returns its digest. Raises DigestMismatchError if it is not the expected one."""
+        digest = self._hash.hexdigest()
+        if expected and digest != expected:
+            raise DigestMismatchError(f"Expected {expected}, received content hashes to {digest}")
+        self._file.close()
+        path = self.store.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomic, and identical content makes a concurrent upload of the same blob harmless
+        os.replace(self._path, path)
+        self._path = None
+        return digest
+
+    def close(self) -> None:
+        self._file.close()
+        if self._path is not None:
+            os.unlink(self._path)
+            self._path = None
+
+    def __enter__(self) -> "BlobWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BlobStore:
+    """Blobs under directory, or under a temporary directory created on first use when none is given."""
+
+    def __init__(self, directory: str | None = None, max_bytes: int = MAX_BLOB_BYTES):
+        self._directory = directory
+        self.max_bytes = max_bytes
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        with self._lock:
+            if not self._ready:
+                if self._directory is None:
+                    self._directory = tempfile.mkdtemp(prefix="messenger-blobs-")
+                os.makedirs(os.path.join(self._directory, "tmp"), exist_ok=True)
+                self._ready = True
+            return self._directory
+
+    @property
+    def temp_dir(self) -> str:
+        # Same file system as the blobs, so commit() is a rename
+        return os.path.join(self.directory, "tmp")
+
+    def path(self, digest: str) -> str:
+        if not is_digest(digest):
+            raise ValueError(f"Not a SHA-256 hex digest: {digest!r}")
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return is_digest(digest) and os.path.exists(self.path(digest))
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self.path(digest))
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self, self.max_bytes)
+
+    def read_chunks(self, digest: str, offset: int = 0, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yields the blob from offset on, chunk_size bytes at a time. Raises FileNotFoundError if it is unknown."""
+        with open(self.path(digest), "rb") as file:
+            file.seek(offset)
+            while True:
+                data = file.read(chunk_size)
+                if not data:
+                    return
+                yield data
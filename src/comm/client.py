@@ -4,7 +4,26 @@ import os
 import grpc
 import time
 import functools
-from dataclasses import dataclass
+import threading
+import heapq
+import random
+import hashlib
+import itertools
+import logging
+from concurrent import futures
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Iterator
+
+import metrics
+from health import HealthTracker, CircuitOpenError, ThrottledError, BreakerState, retry_after_hint
+from codec import MessageCodec, decode_text
+from retry import RetryPolicy, HedgePolicy
+
+CALL_DURATION = metrics.REGISTRY.histogram(
+    "client_call_duration_ms", "Duration of client helper calls", ("function",))
+DEDUP_MESSAGES = metrics.REGISTRY.counter(
+    "client_dedup_messages_total", "Messages seen by the inbox merge, unique or duplicate", ("result",))
 
 def measure_time(func):
     @functools.wraps(func)
@@ -14,7 +33,7 @@ def measure_time(func):
         end_time = time.perf_counter()
         
         duration = (end_time - start_time) * 1000 # Converter para ms
-        print(f" [{func.__name__}] executou em {duration:.2f} ms")
+        CALL_DURATION.observe(duration, function=func.__name__)
         return result
     return wrapper
 
@@ -36,12 +55,282 @@ except ImportError as e:
 
 @dataclass
 class ServerConnection:
+    """
+        Pool of channels to a single replica. Every access to stub hands out the next channel's stub
+        (round robin), so concurrent RPCs spread over several HTTP/2 connections.
+    """
     address: str
-    channel: grpc.Channel
-    stub: messenger_pb2_grpc.MessengerServiceStub
+    channels: list[grpc.Channel]
+    stubs: list[messenger_pb2_grpc.MessengerServiceStub]
+    _next: Iterator[int] = field(default_factory=itertools.count, repr=False, compare=False)
+
+    @property
+    def channel(self) -> grpc.Channel:
+        return self.channels[0]
+
+    @property
+    def stub(self) -> messenger_pb2_grpc.MessengerServiceStub:
+        # next() on itertools.count is atomic, so no lock is needed
+        return self.stubs[next(self._next) % len(self.stubs)]
+
+    def close(self) -> None:
+        for channel in self.channels:
+            channel.close()
+
+
+@dataclass
+class ClientConfig:
+    """Channel settings used by connect_to_servers for every replica."""
+    pool_size: int = 1
+    # Pings keep idle connections open through middleboxes and detect dead peers
+    keepalive_time_ms: int = 30_000
+    keepalive_timeout_ms: int = 10_000
+    keepalive_permit_without_calls: bool = True
+    max_message_bytes: int = 4 * 1024 * 1024
+    compression: grpc.Compression = grpc.Compression.NoCompression
+    # Replicas that take writes, e.g. the replication leader (server --peers); empty writes to every replica
+    write_addresses: tuple[str, ...] = ()
+    # Snowflake node id of this client, unique among all clients; None draws a random one
+    node_id: int | None = None
+
+    def channel_options(self) -> list[tuple[str, Any]]:
+        return [
+            ("grpc.keepalive_time_ms", self.keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", self.keepalive_timeout_ms),
+            ("grpc.keepalive_permit_without_calls", int(self.keepalive_permit_without_calls)),
+            ("grpc.max_send_message_length", self.max_message_bytes),
+            ("grpc.max_receive_message_length", self.max_message_bytes),
+            # Channels with the same target would otherwise share one subchannel, and one TCP connection
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+
+    def write_connections(self, connections: list["ServerConnection"]) -> list["ServerConnection"]:
+        """
+            The connections send_messages should write to. With write_addresses, only those replicas are written
+            and they replicate to the rest, so every message leaves the client once. When none of them is
+            connected, every replica is written instead (anti-entropy spreads those writes).
+        """
+        writers = [conn for conn in connections if conn.address in self.write_addresses]
+        return writers or list(connections)
+
+    def create_channel(self, address: str) -> grpc.Channel:
+        return grpc.insecure_channel(
+            format_address_for_grpc(address), options=self.channel_options(), compression=self.compression
+        )
     
             
 MAX_HANDSHAKE_TIMEOUT = 2  # seconds
+RPC_TIMEOUT = 2  # seconds
+FAN_OUT_GRACE = 1  # seconds fan_out waits past the deadlines of its RPCs, for their callbacks
+STREAM_RETRY_DELAY = 2  # seconds
+RECONNECT_INTERVAL = 5  # seconds
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_BATCH_WINDOW = 0.01  # seconds
+DEFAULT_MAX_BATCH = 100
+ATTACHMENT_CHUNK_SIZE = 64 * 1024  # bytes
+TRANSFER_TIMEOUT = 300  # seconds, for a whole Upload or Download
+SNOWFLAKE_EPOCH_MS = 1_735_689_600_000  # 2025-01-01T00:00:00Z
+
+
+# Shared by every fan-out unless the caller passes its own tracker (or None to disable it)
+HEALTH = HealthTracker()
+
+# Compresses long texts once, before they are copied to every replica (None sends them as they are)
+CODEC = MessageCodec()
+
+# Retries of idempotent writes, with a budget shared by the whole process
+RETRY = RetryPolicy()
+
+# Hedged reads, on at most 10% of the reads
+HEDGE = HedgePolicy()
+
+
+class SnowflakeIdGenerator:
+    """
+        64 bit message ids: 41 bits of milliseconds since SNOWFLAKE_EPOCH_MS, 10 bits of node id and
+        12 bits of sequence within the millisecond. Ids from one generator are strictly increasing, and
+        generators with different node ids never collide. Every layer (servers, merge, InboxCache) takes the id
+        alone as the identity of a message, so each client must have its own node id (ClientConfig.node_id).
+    """
+    NODE_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_NODE = (1 << NODE_BITS) - 1
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+    
+    def __init__(self, node_id: int | None = None, clock: Callable[[], float] = time.time):
+        if node_id is None:
+            # Random node per process. Two processes drawing the same node (1/1024 per pair, likely among a few
+            # dozen clients) generate the same ids whenever both send within one millisecond, so deployments
+            # with more than a handful of clients should assign node ids instead
+            node_id = random.SystemRandom().randint(0, self.MAX_NODE)
+        if not 0 <= node_id <= self.MAX_NODE:
+            raise ValueError(f"node_id must be between 0 and {self.MAX_NODE}")
+        self.node_id = node_id
+        self.clock = clock
+        
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _now_ms(self) -> int:
+        return int(self.clock() * 1000) - SNOWFLAKE_EPOCH_MS
+
+    def next_id(self) -> int:
+        with self._lock:
+            # A clock that steps back keeps using the last timestamp, so ids never decrease
+            now = max(self._now_ms(), self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & self.MAX_SEQUENCE
+                if self._sequence == 0:
+                    # 4096 ids in this millisecond already, borrow the next one
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (self.NODE_BITS + self.SEQUENCE_BITS)) | (self.node_id << self.SEQUENCE_BITS) | self._sequence
+
+
+ID_GENERATOR = SnowflakeIdGenerator()
+
+
+class Quorum(Enum):
+    """How many replicas must answer successfully before a fan-out returns."""
+    FIRST = "first"
+    MAJORITY = "majority"
+    ALL = "all"
+
+    def required(self, total: int) -> int:
+        if self is Quorum.FIRST:
+            return min(1, total)
+        if self is Quorum.MAJORITY:
+            return total // 2 + 1
+        return total
+
+
+class FanOutTimeoutError(grpc.RpcError):
+    """Stands in for the answer of a replica that fan_out stopped waiting for, past its overall deadline."""
+
+    def __init__(self, address: str):
+        super().__init__(address)
+        self.address = address
+
+    def code(self) -> grpc.StatusCode:
+        return grpc.StatusCode.DEADLINE_EXCEEDED
+
+    def details(self) -> str:
+        return f"No answer from {self.address} before the fan-out deadline"
+
+    def __str__(self) -> str:
+        return self.details()
+
+
+@dataclass
+class ReplicaResult:
+    """Outcome of a single RPC inside a fan-out. 
+        Replicas that had not answered when the quorum was reached keep response and error as None.
+    """
+    address: str
+    response: Any = None
+    error: grpc.RpcError | None = None
+    latency_ms: float | None = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.response is not None
+
+
+def fan_out(
+        connections: list[ServerConnection], method: str, request,
+        quorum: Quorum = Quorum.ALL, timeout: float = RPC_TIMEOUT,
+        health: HealthTracker | None = HEALTH, keys: tuple[str, ...] = (),
+        retry: RetryPolicy | None = None
+    ) -> list[ReplicaResult]:
+    """
+        Issues the same RPC to every connection at once using gRPC futures.
+        Returns one ReplicaResult per connection (same order) as soon as the quorum of
+        successful answers is reached, or once every replica has answered or failed.
+        Replicas whose circuit breaker is open are not called; their result carries a CircuitOpenError.
+        Nor are replicas that rate limited one of keys (the senders and recipients of the request) within
+        their retry-after hint; their result carries a ThrottledError.
+        For client streaming methods, request is a callable returning a new request iterator per replica.
+        With a retry policy, a replica failing with a retryable status is called again after a backoff, as
+        long as the policy and its breaker allow it. Only pass one for idempotent requests.
+        Never waits longer than every attempt could take; replicas still unfinished then, without a quorum,
+        carry a FanOutTimeoutError.
+    """
+    # Reconnector may append to the list while the RPCs are in flight
+    connections = list(connections)
+    results = [ReplicaResult(address=conn.address) for conn in connections]
+    required = quorum.required(len(connections))
+    done = threading.Condition()
+    state = {"success": 0, "finished": 0}
+
+    def finish(index: int, response, error: grpc.RpcError | None, latency: float | None = None) -> None:
+        with done:
+            results[index].response = response
+            results[index].error = error
+            results[index].latency_ms = latency
+            state["finished"] += 1
+            if error is None:
+                state["success"] += 1
+            done.notify()
+
+    def on_done(index: int, start: float, future: grpc.Future) -> None:
+        latency = (time.perf_counter() - start) * 1000
+        try:
+            response = future.result()
+            error = None
+        except grpc.RpcError as e:
+            response = None
+            error = e
+        if health is not None:
+            health.record(connections[index].address, latency, error)
+        if retry is not None:
+            retry.record(error)
+            if error is not None and retry.should_retry(error, results[index].attempts):
+                timer = threading.Timer(retry.backoff(results[index].attempts), reissue, (index, error))
+                timer.daemon = True
+                timer.start()
+                return
+        finish(index, response, error, latency)
+
+    def issue(index: int) -> None:
+        conn = connections[index]
+        wait = health.throttled(conn.address, keys) if health is not None and keys else 0
+        if wait or (health is not None and not health.allow(conn.address)):
+            finish(index, None, ThrottledError(conn.address, wait) if wait else CircuitOpenError(conn.address))
+            return
+        results[index].attempts += 1
+        start = time.perf_counter()
+        payload = request() if callable(request) else request
+        future = getattr(conn.stub, method).future(payload, timeout=timeout)
+        future.add_done_callback(functools.partial(on_done, index, start))
+
+    def reissue(index: int, error: grpc.RpcError) -> None:
+        """Retry from a timer thread, where an exception would be lost: it ends the replica with the last error."""
+        try:
+            issue(index)
+        except Exception as e:
+            logging.warning("Retry of %s on %s failed: %s", method, connections[index].address, e)
+            finish(index, None, error)
+
+    for i in range(len(connections)):
+        issue(i)
+
+    deadline = timeout + FAN_OUT_GRACE
+    if retry is not None:
+        deadline += (retry.max_attempts - 1) * (timeout + retry.max_delay)
+    with done:
+        reached = done.wait_for(
+            lambda: state["success"] >= required or state["finished"] == len(connections), timeout=deadline
+        )
+        if not reached:
+            for r in results:
+                if r.response is None and r.error is None:
+                    r.error = FanOutTimeoutError(r.address)
+        # Snapshot so late callbacks cannot mutate what the caller sees
+        return [ReplicaResult(r.address, r.response, r.error, r.latency_ms, r.attempts) for r in results]
 
 
 def extract_send_response(
@@ -66,7 +355,7 @@ def extract_receive_all_response(
         # Access its fields directly using dot notation.
         # (Replace these attribute names with the actual ones from your .proto)
         msg_id = msg.id          # int
-        sender = msg.msg      # str
+        sender = decode_text(msg)      # str
         recipient = msg.self_email # str
         body = msg.dest_email          # str
         
@@ -93,39 +382,101 @@ def format_address_for_grpc(addr: str) -> str:
     return f'[{ip_part}]:{port_part}'
 
 
-def connect_to_servers(server_addresses: list[str]) -> tuple[list[ServerConnection], list[str]]:
+def connect_to_servers(
+        server_addresses: list[str], config: ClientConfig | None = None
+    ) -> tuple[list[ServerConnection], list[str]]:
     """ 
-        Attempts to connect to a list of server addresses.
+        Attempts to connect to a list of server addresses, opening config.pool_size channels to each.
+        Every handshake is started at once and they share a single MAX_HANDSHAKE_TIMEOUT deadline.
         Returns a tuple containing a list of successful connections and a list of failed addresses.
     """
+    if config is None:
+        config = ClientConfig()
     
     connections = []
     failed_connections = []
     
-    for addr in server_addresses:
-        formatted_addr = format_address_for_grpc(addr)
-        channel = grpc.insecure_channel(formatted_addr)
+    # Force handshakes to ensure they are connectable
+    pools = [[config.create_channel(addr) for _ in range(config.pool_size)] for addr in server_addresses]
+    ready_futures = [[grpc.channel_ready_future(channel) for channel in pool] for pool in pools]
+    deadline = time.monotonic() + MAX_HANDSHAKE_TIMEOUT
+    
+    for addr, channels, pool_ready in zip(server_addresses, pools, ready_futures):
         try:
-            # Force handshake to ensure its connectable
-            grpc.channel_ready_future(channel).result(timeout=MAX_HANDSHAKE_TIMEOUT)
-            stub = messenger_pb2_grpc.MessengerServiceStub(channel)
-            connections.append(ServerConnection(address=addr, channel=channel, stub=stub))
+            for ready in pool_ready:
+                ready.result(timeout=max(deadline - time.monotonic(), 0))
+            interceptor = metrics.MetricsClientInterceptor(addr)
+            stubs = [
+                messenger_pb2_grpc.MessengerServiceStub(grpc.intercept_channel(channel, interceptor))
+                for channel in channels
+            ]
+            connections.append(ServerConnection(address=addr, channels=channels, stubs=stubs))
             
         except grpc.FutureTimeoutError:
+            for ready, channel in zip(pool_ready, channels):
+                ready.cancel()
+                channel.close()
             failed_connections.append(addr)
-            channel.close()
             
     return connections, failed_connections
 
 
+class Reconnector:
+    """
+        Retries the failed addresses every interval seconds in the background.
+        Once a server answers it is moved from failed to connections (both lists are updated in place)
+        and on_reconnect is called with its ServerConnection, on the reconnector thread.
+    """
+    
+    def __init__(
+            self, connections: list[ServerConnection], failed: list[str],
+            interval: float = RECONNECT_INTERVAL,
+            on_reconnect: Callable[[ServerConnection], None] | None = None,
+            config: ClientConfig | None = None
+        ):
+        self.connections = connections
+        self.failed = failed
+        self.interval = interval
+        self.on_reconnect = on_reconnect
+        self.config = config
+        
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Returns at once. A retry already in flight is discarded when it finishes."""
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if not self.failed:
+                continue
+            reconnected, _ = connect_to_servers(list(self.failed), self.config)
+            for conn in reconnected:
+                if self._stopped.is_set():
+                    conn.close()
+                    continue
+                self.failed.remove(conn.address)
+                self.connections.append(conn)
+                if self.on_reconnect is not None:
+                    self.on_reconnect(conn)
+
+
  
 @measure_time
 def send_messages(
         id: int, connections: list[ServerConnection], 
-        dest_message: str, self_email:str, dest_email: str
+        dest_message: str, self_email:str, dest_email: str,
+        quorum: Quorum = Quorum.ALL, codec: MessageCodec | None = CODEC,
+        attachments: list[messenger_pb2.Attachment] | None = None, retry: RetryPolicy | None = RETRY
     ) -> list[str]:
     """
-        Send message to all connected servers
+        Send message to all connected servers concurrently, returning once the quorum has answered.
+        Attachments must be uploaded first (upload_attachment), the message only carries their digests.
+        Unavailable replicas are retried (retry), the server ignores a message id it already queued.
         dest_message and dest_port simulates the logical addressing of the recipient.
         In a real-world app, these would correspond to actual user identifiers.
     """
@@ -135,31 +486,232 @@ def send_messages(
         id=id,
         msg=dest_message,
         self_email=self_email,
-        dest_email=dest_email
+        dest_email=dest_email,
+        attachments=attachments or []
     )
+    if codec is not None:
+        codec.encode(send_payload)
     
-    failure_servers = []
-    for conn in connections:
-        try:
-            #message and status, which is always positive currently
-            response = conn.stub.Send(send_payload, timeout=2)
-            
-        except grpc.RpcError as e:
-            failure_servers.append(conn.address)
-           
+    results = fan_out(
+        connections, "Send", send_payload, quorum=quorum, keys=(self_email, dest_email), retry=retry
+    )
     
+    # Replicas still pending when the quorum was reached are not counted as failures
+    failure_servers = [r.address for r in results if r.error is not None]
     return failure_servers
 
 
 
+def file_sha256(path: str, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while data := file.read(chunk_size):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def iter_upload_chunks(path: str, sha256: str, size: int, chunk_size: int) -> Iterator[messenger_pb2.UploadChunk]:
+    # The digest goes first, so a server that already has the content stops reading right away
+    yield messenger_pb2.UploadChunk(sha256=sha256, size=size)
+    with open(path, "rb") as file:
+        while data := file.read(chunk_size):
+            yield messenger_pb2.UploadChunk(data=data)
+
+
+@measure_time
+def upload_attachment(
+        connections: list[ServerConnection], path: str, name: str | None = None,
+        chunk_size: int = ATTACHMENT_CHUNK_SIZE, quorum: Quorum = Quorum.ALL
+    ) -> tuple[messenger_pb2.Attachment, list[str]]:
+    """
+        Uploads a file to every server in chunks of chunk_size bytes, reading it from disk once per server.
+        Returns the Attachment to put in a message, and the addresses of the servers that failed to store it.
+    """
+    sha256 = file_sha256(path, chunk_size)
+    size = os.path.getsize(path)
+    
+    # Transfers take far longer than an RPC, so they stay out of the latency averages
+    results = fan_out(
+        connections, "Upload", lambda: iter_upload_chunks(path, sha256, size, chunk_size),
+        quorum=quorum, timeout=TRANSFER_TIMEOUT, health=None
+    )
+    for result in results:
+        if result.error is not None:
+            logging.warning("Upload of %s to %s failed: %s", sha256, result.address, result.error)
+    
+    attachment = messenger_pb2.Attachment(sha256=sha256, name=name or os.path.basename(path), size=size)
+    return attachment, [r.address for r in results if r.error is not None]
+
+
+@measure_time
+def download_attachment(
+        connections: list[ServerConnection], attachment: messenger_pb2.Attachment, path: str,
+        health: HealthTracker | None = HEALTH
+    ) -> None:
+    """
+        Streams an attachment to path, chunk by chunk, trying the fastest healthy replica first.
+        A broken stream resumes on the next replica from the last byte received. Replicas with an open
+        breaker are only tried when it admits a probe. The content is only moved to path once its digest
+        matches; raises grpc.RpcError if no replica could serve it.
+    """
+    candidates = health.ranked(connections) if health is not None else list(connections)
+    
+    partial = path + ".part"
+    digest = hashlib.sha256()
+    offset = 0
+    error = None
+    try:
+        with open(partial, "wb") as file:
+            for conn in candidates:
+                if health is not None and not health.allow(conn.address):
+                    error = error or CircuitOpenError(conn.address)
+                    continue
+                try:
+                    request = messenger_pb2.DownloadRequest(sha256=attachment.sha256, offset=offset)
+                    for chunk in conn.stub.Download(request, timeout=TRANSFER_TIMEOUT):
+                        file.write(chunk.data)
+                        digest.update(chunk.data)
+                        offset += len(chunk.data)
+                except grpc.RpcError as e:
+                    logging.warning("Download of %s from %s failed: %s", attachment.sha256, conn.address, e)
+                    error = e
+                    if health is not None:
+                        health.record(conn.address, None, e)
+                    continue
+                # A whole transfer says nothing about RPC latency, only that the replica is back
+                if health is not None:
+                    health.record_success(conn.address)
+                error = None
+                break
+        if error is not None:
+            raise error
+        if digest.hexdigest() != attachment.sha256:
+            raise ValueError(f"Downloaded content of {attachment.name} does not match its digest")
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+
+
+@measure_time
+def send_batch(
+        connections: list[ServerConnection], messages: list[messenger_pb2.SendRequest],
+        quorum: Quorum = Quorum.ALL, retry: RetryPolicy | None = RETRY
+    ) -> list[list[str]]:
+    """
+        Send several messages to all connected servers with a single SendBatch call per server.
+        Returns, for each message (same order), the addresses of the servers that failed to queue it.
+    """
+    batch_payload = messenger_pb2.SendBatchRequest(messages=messages)
+    keys = tuple({email for message in messages for email in (message.self_email, message.dest_email)})
+    results = fan_out(connections, "SendBatch", batch_payload, quorum=quorum, keys=keys, retry=retry)
+    
+    failure_servers = [[] for _ in messages]
+    for result in results:
+        if result.error is not None:
+            for failures in failure_servers:
+                failures.append(result.address)
+        elif result.response is not None:
+            for failures, response in zip(failure_servers, result.response.results):
+                if not response.success:
+                    failures.append(result.address)
+    
+    return failure_servers
+
+
+class SendCoalescer:
+    """
+        Client-side queue that coalesces outgoing messages into SendBatch calls.
+        A batch is flushed once max_batch messages are waiting or window seconds after its first message,
+        whichever comes first. submit() returns a Future resolving to the failed server addresses of that message.
+    """
+    
+    def __init__(
+            self, connections: list[ServerConnection],
+            window: float = DEFAULT_BATCH_WINDOW, max_batch: int = DEFAULT_MAX_BATCH,
+            quorum: Quorum = Quorum.ALL, codec: MessageCodec | None = CODEC
+        ):
+        self.connections = connections
+        self.window = window
+        self.max_batch = max_batch
+        self.quorum = quorum
+        self.codec = codec
+        
+        self._pending = []  # (SendRequest, Future)
+        self._cond = threading.Condition()
+        self._flush_requested = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, id: int, dest_message: str, self_email: str, dest_email: str) -> futures.Future:
+        future = futures.Future()
+        message = messenger_pb2.SendRequest(id=id, msg=dest_message, self_email=self_email, dest_email=dest_email)
+        if self.codec is not None:
+            self.codec.encode(message)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SendCoalescer is closed")
+            self._pending.append((message, future))
+            self._cond.notify()
+        return future
+
+    def flush(self) -> None:
+        """Sends whatever is waiting without waiting for the window to expire."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Flushes the remaining messages and stops the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch and not (self._flush_requested or self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self._flush_requested = self._flush_requested and bool(self._pending)
+            
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: list[tuple[messenger_pb2.SendRequest, futures.Future]]) -> None:
+        try:
+            failure_servers = send_batch(self.connections, [message for message, _ in batch], quorum=self.quorum)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), failures in zip(batch, failure_servers):
+            future.set_result(failures)
+
+
+
 # Warning: This is an extremly naive implementation for demo purposes only.
 # All messages are being returned: handling duplicates is done at a higher layer.
 @measure_time
 def receive_all_messages(
         connections: list[ServerConnection], self_email:str,
+        quorum: Quorum = Quorum.ALL
     ) ->list[messenger_pb2.InboxResponse | None]:
     """
-        Retrieve all messages from all connected servers.
+        Retrieve all messages from all connected servers concurrently.
+        ReceiveAll is destructive: with a quorum below ALL, inboxes arriving after the quorum are discarded.
         
         self_ip and self_port simulates the logical addressing of the client.
         In a real-world app, these would correspond to actual user identifiers.
@@ -167,82 +719,282 @@ def receive_all_messages(
 
     receive_payload = messenger_pb2.ReceiveRequest(self_email=self_email)
 
-    failure_servers = []
+    results = fan_out(connections, "ReceiveAll", receive_payload, quorum=quorum)
+
     inboxes = []
-    for conn in connections:
-        try:
-            inbox = conn.stub.ReceiveAll(receive_payload, timeout=2)
-            inboxes.append(inbox)   
+    for result in results:
+        if result.error is not None:
+            print(result.error)
+        inboxes.append(result.response)
             
+    return inboxes
 
+def fetch_replica_inbox(
+        conn: ServerConnection, self_email: str, page_size: int = DEFAULT_PAGE_SIZE, since_id: int = 0,
+        before_ack: Callable[[], bool] | None = None, known: Callable[[list[int]], set[int]] | None = None
+    ) -> messenger_pb2.InboxResponse | None:
+    """
+        Pulls the whole mailbox of one server in pages of at most page_size messages,
+        then acknowledges it so the server trims only what was actually received.
+        Messages with an id up to since_id are not transferred when known (e.g. InboxCache.known) says the client
+        already has them; a page that skipped any other message is fetched again in full, so the acknowledgement
+        never removes a message the client does not have. Without known, no skipped message is taken as known.
+        before_ack is called once every page arrived; when it returns False the mailbox is left untouched
+        and None is returned (a hedged read that lost the race).
+        Raises grpc.RpcError if any page or the acknowledgement fails.
+    """
+    messages = []
+    cursor = 0
+    skipped_any = False
+    while True:
+        request = messenger_pb2.FetchRequest(self_email=self_email, cursor=cursor, limit=page_size, since_id=since_id)
+        page = conn.stub.Fetch(request, timeout=RPC_TIMEOUT)
+        skipped = list(page.skipped_ids)
+        if skipped and (known is None or len(known(skipped)) < len(skipped)):
+            request.since_id = 0
+            page = conn.stub.Fetch(request, timeout=RPC_TIMEOUT)
+        skipped_any = skipped_any or bool(page.skipped_ids)
+        messages.extend(page.messages)
+        cursor = page.next_cursor
+        if not page.has_more:
+            break
+    
+    if before_ack is not None and not before_ack():
+        return None
+    # Skipped messages are behind the cursor too, and need the acknowledgement to leave the server
+    if messages or skipped_any:
+        conn.stub.Ack(messenger_pb2.AckRequest(self_email=self_email, cursor=cursor), timeout=RPC_TIMEOUT)
+    return messenger_pb2.InboxResponse(messages=messages)
+
+
+@measure_time
+def receive_paginated_messages(
+        connections: list[ServerConnection], self_email: str,
+        page_size: int = DEFAULT_PAGE_SIZE, quorum: Quorum = Quorum.ALL,
+        health: HealthTracker | None = HEALTH, since_id: int = 0,
+        hedge: HedgePolicy | None = HEDGE, known: Callable[[list[int]], set[int]] | None = None
+    ) -> list[messenger_pb2.InboxResponse | None]:
+    """
+        Retrieve all messages from the connected servers concurrently using bounded Fetch pages.
+        Unlike receive_all_messages, a server only drops its messages after they were acknowledged,
+        so a lost response is fetched again on the next call.
+        Messages with an id up to since_id (see InboxCache.since_id) that known says the client has are left out
+        of the responses (see fetch_replica_inbox).
+        With a health tracker, only the quorum.required() fastest healthy replicas are read (plus those due
+        for a probe); the others get None, and keep their messages for a later read.
+        The others are also spares: a read still running after the p95 latency of its replica is hedged
+        by reading a spare too (hedge), and a failed read is retried on a spare at once.
+        Whichever finishes first is acknowledged and returned under its own address; the other is dropped
+        before its acknowledgement, so that replica keeps its messages.
+    """
+    if not connections:
+        return []
+    
+    connections = list(connections)
+    targets = connections
+    spares = []
+    if health is not None:
+        targets = health.fastest(connections, quorum.required(len(connections)))
+        if hedge is not None:
+            spares = [
+                conn for conn in connections if conn not in targets
+                and health.snapshot(conn.address).state is BreakerState.CLOSED
+            ]
+    spares_lock = threading.Lock()
+    
+    def fetch(conn: ServerConnection, before_ack: Callable[[], bool]) -> messenger_pb2.InboxResponse | None:
+        start = time.perf_counter()
+        try:
+            inbox = fetch_replica_inbox(conn, self_email, page_size, since_id, before_ack, known)
         except grpc.RpcError as e:
-            inboxes.append(None)
-            print(e)
+            if health is not None:
+                health.record(conn.address, None, e)
+            raise
+        if health is not None:
+            # Whole mailboxes take longer than one RPC, so only single page reads feed the latency average
+            latency = (time.perf_counter() - start) * 1000
+            single_page = inbox is not None and len(inbox.messages) < page_size
+            health.record_success(conn.address, latency if single_page else None)
+        return inbox
+    
+    def race(
+            primary: ServerConnection, executor: futures.ThreadPoolExecutor
+        ) -> tuple[str, messenger_pb2.InboxResponse] | None:
+        """Reads primary, and a spare if needed. Returns the address and inbox of the read that got acknowledged."""
+        winner = []
+        claim_lock = threading.Lock()
+        
+        def claim() -> bool:
+            with claim_lock:
+                if winner:
+                    return False
+                winner.append(True)
+                return True
+        
+        running = {executor.submit(fetch, primary, claim): primary}
+        delay = None
+        if spares:
+            hedge.record_read()
+            delay = health.latency_quantile(primary.address, hedge.quantile, hedge.min_samples)
+        hedged = not spares or delay is None
+        while running:
+            done, _ = futures.wait(
+                running, timeout=None if hedged else delay / 1000, return_when=futures.FIRST_COMPLETED
+            )
+            failed = False
+            for future in done:
+                conn = running.pop(future)
+                try:
+                    inbox = future.result()
+                except grpc.RpcError as e:
+                    logging.warning("Hedged read of %s from %s failed: %s", self_email, conn.address, e)
+                    failed = True
+                    continue
+                if inbox is not None:
+                    return conn.address, inbox
             
-    return inboxes
+            if (failed or not done and not hedged and hedge.try_hedge()) and not winner:
+                with spares_lock:
+                    spare = spares.pop(0) if spares else None
+                if spare is not None:
+                    running[executor.submit(fetch, spare, claim)] = spare
+            # At most one spare per read
+            hedged = hedged or failed or not done
+        return None
+    
+    inboxes = {}
+    executor = futures.ThreadPoolExecutor(max_workers=len(targets) + len(spares) or 1)
+    try:
+        with futures.ThreadPoolExecutor(max_workers=max(len(targets), 1)) as races:
+            for outcome in races.map(lambda conn: race(conn, executor), targets):
+                if outcome is not None:
+                    inboxes[outcome[0]] = outcome[1]
+    finally:
+        # Reads that lost a race finish in the background, and skip their acknowledgement
+        executor.shutdown(wait=False)
+    
+    return [inboxes.get(conn.address) for conn in connections]
+
+
+def iter_receive_all_unique_responses(
+        inbox_list: list[messenger_pb2.InboxResponse | None]
+    ) -> Iterator[tuple[int, str, str, str]]:
+    """Generator that merges multiple inbox responses, yielding each unique message as soon as it is reached.
+    Performs a heap based k-way merge keyed on the message id, so the total cost is O(n log k) for
+    n messages across k inboxes. Ids are globally unique, so duplicates are dropped through a set of ints,
+    which keeps the output correct even when an inbox is not sorted by ID.
+    Args:
+        inbox_list (list[messenger_pb2.InboxResponse | None]): Inbox responses, None for failed servers
+    Yields:
+        tuple[int, str, str, str]: id, msg, self_email, dest_email
+    """
+    streams = [
+        ((msg.id, decode_text(msg), msg.self_email, msg.dest_email) for msg in inbox.messages)
+        for inbox in inbox_list if inbox is not None
+    ]
+    
+    seen = set()
+    duplicates = 0
+    try:
+        for message in heapq.merge(*streams, key=lambda m: m[0]):
+            if message[0] in seen:
+                duplicates += 1
+                continue
+            seen.add(message[0])
+            yield message
+    finally:
+        # Recorded once per merge, which keeps the per message loop free of locking
+        DEDUP_MESSAGES.inc(len(seen), result="unique")
+        DEDUP_MESSAGES.inc(duplicates, result="duplicate")
+
 
 def extract_receive_all_unique_responses(
         inbox_list: list[messenger_pb2.InboxResponse | None]
     ) -> list[tuple[int, str, str, str]]:
-    """Function that merges multiple inbox responses, removing duplicates based on message ID. Assumes each inbox is sorted by ID.
+    """Function that merges multiple inbox responses, removing duplicates based on the message ID.
     Args:
-        inbox_list (list[tuple[messenger_pb2.InboxResponse, str]]): List of tuples containing inbox response and server IP
+        inbox_list (list[messenger_pb2.InboxResponse | None]): Inbox responses, None for failed servers
     Returns:
         list[tuple[int, str, str, str]]: id, msg, self_email, dest_email    
     """
-    results = []
-    responses = []
-    counters = [0] * len(inbox_list)
-
-    # Extract messages from each inbox response
-    for i, inbox in enumerate(inbox_list):
-        response = extract_receive_all_response(inbox)
-        if response is None:
-            response = []
-        responses.append(response)
-        counters[i] = 0
-    
-    # Merge responses while removing duplicates based on message ID
-    all_read_messages = False
-    while not all_read_messages:
-        ids = [0] * len(responses)
-        min_id = (sys.maxsize, -1)  # (id, index)
-        
-        # Find minimum ID among current positions
-        for i in range(len(responses)):
-            if counters[i] < len(responses[i]):
-                current_id = responses[i][counters[i]][0]
-                ids[i] = current_id
-                if current_id < min_id[0]:
-                    min_id = (current_id, i)
-        
-        # If no more messages to read
-        if min_id[1] == -1:
-            all_read_messages = True
-        else:
-            # Add the message with minimum ID
-
-            repeatedMessage = False
-
-            for i in range(len(results)):
-                if results[i][0] == responses[min_id[1]][counters[min_id[1]]][0] and results[i][1] == responses[min_id[1]][counters[min_id[1]]][1]:
-                    repeatedMessage = True
-                    break
-            if not repeatedMessage:
-                results.append(responses[min_id[1]][counters[min_id[1]]])
-            
-            # Advance all counters that have this same ID and sender address (remove duplicates)
-            minID_sender_addrs = responses[min_id[1]][counters[min_id[1]]][1]
-            for i in range(len(responses)):
-                I_sender_addrs = responses[i][counters[i]][1]
-                if counters[i] < len(responses[i]) and ids[i] == min_id[0] and I_sender_addrs == minID_sender_addrs:
-                    counters[i] += 1
-
-    return results
-
-
-    
+    return list(iter_receive_all_unique_responses(inbox_list))
 
 
 
+class InboxSubscription:
+    """
+        Keeps one ReceiveStream open per connected server and calls on_message once for every unique message,
+        as soon as any replica pushes it. Streams that break are reopened after STREAM_RETRY_DELAY, or after the
+        retry-after hint of a server that rejected the stream.
+        Callbacks run on the subscription threads, not on the caller's thread.
+    """
     
+    def __init__(
+            self, connections: list[ServerConnection], self_email: str,
+            on_message: Callable[[tuple[int, str, str, str]], None],
+            on_error: Callable[[str, grpc.RpcError], None] | None = None
+        ):
+        self.connections = connections
+        self.self_email = self_email
+        self.on_message = on_message
+        self.on_error = on_error
+        
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cancelled = threading.Event()
+        self._threads = {}
+
+    def start(self) -> None:
+        for conn in list(self.connections):
+            self.add_connection(conn)
+
+    def add_connection(self, conn: ServerConnection) -> None:
+        """Opens a stream to a server that joined after start(). Servers already streaming are ignored."""
+        with self._lock:
+            if self._cancelled.is_set() or conn.address in self._threads:
+                return
+            thread = threading.Thread(target=self._consume, args=(conn,), daemon=True)
+            self._threads[conn.address] = thread
+        thread.start()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        with self._lock:
+            calls = list(self._calls.values())
+        for call in calls:
+            call.cancel()
+
+    def _consume(self, conn: ServerConnection) -> None:
+        request = messenger_pb2.ReceiveRequest(self_email=self.self_email)
+        
+        while not self._cancelled.is_set():
+            call = conn.stub.ReceiveStream(request)
+            with self._lock:
+                self._calls[conn.address] = call
+            # Close the race with a cancel() issued before the call was registered
+            if self._cancelled.is_set():
+                call.cancel()
+            
+            delay = STREAM_RETRY_DELAY
+            try:
+                for msg in call:
+                    self._deliver(msg)
+            except grpc.RpcError as e:
+                if self._cancelled.is_set():
+                    break
+                if self.on_error is not None:
+                    self.on_error(conn.address, e)
+                # A server at its stream cap says when to come back; messages keep queueing for Fetch meanwhile
+                hint = retry_after_hint(e)
+                if hint is not None:
+                    delay = hint[1]
+            
+            self._cancelled.wait(delay)
+
+    def _deliver(self, msg: messenger_pb2.SendRequest) -> None:
+        with self._lock:
+            if msg.id in self._seen:
+                return
+            self._seen.add(msg.id)
+        self.on_message((msg.id, decode_text(msg), msg.self_email, msg.dest_email))
@@ -0,0 +1,106 @@
+"""
+Size-aware compression of the message text.
+
+gRPC compression (ClientConfig.compression, server --compression) squeezes whole RPC messages on the wire only.
+MessageCodec compresses the text itself, so it stays small everywhere: in every per replica copy of a Send, in
+the server mailboxes, in the replication streams and in the write-ahead log. Texts of at least threshold bytes
+are compressed into SendRequest.body and msg is left empty. Shorter texts are kept as they are, since the
+compressed form of a short text is barely smaller, or even larger. Readers call decode_text(), which restores
+the text whatever codec the sender used.
+
+zstd needs the optional zstandard package; zlib is always available.
+"""
+import sys
+import os
+import zlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_messenger"))
+try:
+    import messenger_pb2
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULT_THRESHOLD = 1024  # bytes of UTF-8 text
+DEFAULT_LEVELS = {messenger_pb2.CODEC_ZLIB: 6, messenger_pb2.CODEC_ZSTD: 3}
+
+CODECS = {
+    "none": messenger_pb2.CODEC_NONE,
+    "zlib": messenger_pb2.CODEC_ZLIB,
+    "zstd": messenger_pb2.CODEC_ZSTD,
+}
+
+
+def available_codecs() -> list[str]:
+    return [name for name, codec in CODECS.items() if codec != messenger_pb2.CODEC_ZSTD or zstandard is not None]
+
+
+def compress(codec: int, data: bytes, level: int | None = None) -> bytes:
+    if level is None:
+        level = DEFAULT_LEVELS.get(codec, 0)
+    if codec == messenger_pb2.CODEC_ZLIB:
+        return zlib.compress(data, level)
+    if codec == messenger_pb2.CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unknown codec {codec}")
+
+
+def decompress(codec: int, data: bytes) -> bytes:
+    if codec == messenger_pb2.CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == messenger_pb2.CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec {codec}")
+
+
+def decode_text(message: messenger_pb2.SendRequest) -> str:
+    """The text of a message, decompressed if needed."""
+    if message.codec == messenger_pb2.CODEC_NONE:
+        return message.msg
+    return decompress(message.codec, message.body).decode("utf-8")
+
+
+class MessageCodec:
+    """Compresses the text of outgoing messages of at least threshold bytes with codec."""
+
+    def __init__(
+            self, codec: int = messenger_pb2.CODEC_ZLIB, threshold: int = DEFAULT_THRESHOLD,
+            level: int | None = None
+        ):
+        if codec == messenger_pb2.CODEC_ZSTD and zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package")
+        self.codec = codec
+        self.threshold = threshold
+        self.level = level
+
+    @classmethod
+    def from_name(cls, name: str, threshold: int = DEFAULT_THRESHOLD) -> "MessageCodec | None":
+        """Codec for a command line name, None for "none"."""
+        codec = CODECS[name]
+        return None if codec == messenger_pb2.CODEC_NONE else cls(codec, threshold)
+
+    def encode(self, message: messenger_pb2.SendRequest) -> messenger_pb2.SendRequest:
+        """Compresses the text of message in place, if it is long enough and compression pays off. Returns message."""
+        if message.codec != messenger_pb2.CODEC_NONE or len(message.msg) * 4 < self.threshold:
+            # Already encoded, or too short even if every character took 4 bytes
+            return message
+        text = message.msg.encode("utf-8")
+        if len(text) < self.threshold:
+            return message
+        body = compress(self.codec, text, self.level)
+        if len(body) < len(text):
+            message.body = body
+            message.codec = self.codec
+            message.ClearField("msg")
+        return message
@@ -24,21 +24,59 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fmessenger.proto\x12\tmessenger\"N\n\x0bSendRequest\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0b\n\x03msg\x18\x02 \x01(\t\x12\x12\n\nself_email\x18\x03 \x01(\t\x12\x12\n\ndest_email\x18\x04 \x01(\t\"6\n\x0cSendResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rdebug_message\x18\x02 \x01(\t\"$\n\x0eReceiveRequest\x12\x12\n\nself_email\x18\x01 \x01(\t\"9\n\rInboxResponse\x12(\n\x08messages\x18\x01 \x03(\x0b\x32\x16.messenger.SendRequest2\x8e\x01\n\x10MessengerService\x12\x37\n\x04Send\x12\x16.messenger.SendRequest\x1a\x17.messenger.SendResponse\x12\x41\n\nReceiveAll\x12\x19.messenger.ReceiveRequest\x1a\x18.messenger.InboxResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fmessenger.proto\x12\tmessenger\"\xa9\x01\n\x0bSendRequest\x12\n\n\x02id\x18\x01 \x01(\x03\x12\x0b\n\x03msg\x18\x02 \x01(\t\x12\x12\n\nself_email\x18\x03 \x01(\t\x12\x12\n\ndest_email\x18\x04 \x01(\t\x12\x1f\n\x05\x63odec\x18\x05 \x01(\x0e\x32\x10.messenger.Codec\x12\x0c\n\x04\x62ody\x18\x06 \x01(\x0c\x12*\n\x0b\x61ttachments\x18\x07 \x03(\x0b\x32\x15.messenger.Attachment\"8\n\nAttachment\x12\x0e\n\x06sha256\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0c\n\x04size\x18\x03 \x01(\x04\"6\n\x0cSendResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rdebug_message\x18\x02 \x01(\t\"$\n\x0eReceiveRequest\x12\x12\n\nself_email\x18\x01 \x01(\t\"9\n\rInboxResponse\x12(\n\x08messages\x18\x01 \x03(\x0b\x32\x16.messenger.SendRequest\"S\n\x0c\x46\x65tchRequest\x12\x12\n\nself_email\x18\x01 \x01(\t\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\x04\x12\r\n\x05limit\x18\x03 \x01(\r\x12\x10\n\x08since_id\x18\x04 \x01(\x03\"u\n\rFetchResponse\x12(\n\x08messages\x18\x01 \x03(\x0b\x32\x16.messenger.SendRequest\x12\x13\n\x0bnext_cursor\x18\x02 \x01(\x04\x12\x10\n\x08has_more\x18\x03 \x01(\x08\x12\x13\n\x0bskipped_ids\x18\x04 \x03(\x03\"0\n\nAckRequest\x12\x12\n\nself_email\x18\x01 \x01(\t\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\x04\"5\n\x0b\x41\x63kResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rdebug_message\x18\x02 \x01(\t\"<\n\x10SendBatchRequest\x12(\n\x08messages\x18\x01 \x03(\x0b\x32\x16.messenger.SendRequest\"=\n\x11SendBatchResponse\x12(\n\x07results\x18\x01 \x03(\x0b\x32\x17.messenger.SendResponse\"_\n\x0eReplicateBatch\x12\x11\n\tleader_id\x18\x01 \x01(\t\x12\x10\n\x08sequence\x18\x02 \x01(\x04\x12(\n\x08messages\x18\x03 \x03(\x0b\x32\x16.messenger.SendRequest\" \n\x0cReplicateAck\x12\x10\n\x08sequence\x18\x01 \x01(\x04\" \n\rDigestRequest\x12\x0f\n\x07mailbox\x18\x01 \x01(\t\"\x90\x01\n\x0e\x44igestResponse\x12;\n\tmailboxes\x18\x01 \x03(\x0b\x32(.messenger.DigestResponse.MailboxesEntry\x12\x0f\n\x07\x62uckets\x18\x02 \x03(\x04\x1a\x30\n\x0eMailboxesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x04:\x02\x38\x01\"/\n\x0bPullRequest\x12\x0f\n\x07mailbox\x18\x01 \x01(\t\x12\x0f\n\x07\x62uckets\x18\x02 \x03(\r\"9\n\x0bUploadChunk\x12\x0e\n\x06sha256\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x04\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\"?\n\x0eUploadResponse\x12\x0e\n\x06sha256\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x04\x12\x0f\n\x07\x65xisted\x18\x03 \x01(\x08\"1\n\x0f\x44ownloadRequest\x12\x0e\n\x06sha256\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x04\"\x1d\n\rDownloadChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c*7\n\x05\x43odec\x12\x0e\n\nCODEC_NONE\x10\x00\x12\x0e\n\nCODEC_ZLIB\x10\x01\x12\x0e\n\nCODEC_ZSTD\x10\x02\x32\xcf\x05\n\x10MessengerService\x12\x37\n\x04Send\x12\x16.messenger.SendRequest\x1a\x17.messenger.SendResponse\x12\x41\n\nReceiveAll\x12\x19.messenger.ReceiveRequest\x1a\x18.messenger.InboxResponse\x12\x44\n\rReceiveStream\x12\x19.messenger.ReceiveRequest\x1a\x16.messenger.SendRequest0\x01\x12:\n\x05\x46\x65tch\x12\x17.messenger.FetchRequest\x1a\x18.messenger.FetchResponse\x12\x34\n\x03\x41\x63k\x12\x15.messenger.AckRequest\x1a\x16.messenger.AckResponse\x12\x46\n\tSendBatch\x12\x1b.messenger.SendBatchRequest\x1a\x1c.messenger.SendBatchResponse\x12\x43\n\tReplicate\x12\x19.messenger.ReplicateBatch\x1a\x17.messenger.ReplicateAck(\x01\x30\x01\x12=\n\x06\x44igest\x12\x18.messenger.DigestRequest\x1a\x19.messenger.DigestResponse\x12\x38\n\x04Pull\x12\x16.messenger.PullRequest\x1a\x18.messenger.InboxResponse\x12=\n\x06Upload\x12\x16.messenger.UploadChunk\x1a\x19.messenger.UploadResponse(\x01\x12\x42\n\x08\x44ownload\x12\x1a.messenger.DownloadRequest\x1a\x18.messenger.DownloadChunk0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'messenger_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_SENDREQUEST']._serialized_start=30
-  _globals['_SENDREQUEST']._serialized_end=108
-  _globals['_SENDRESPONSE']._serialized_start=110
-  _globals['_SENDRESPONSE']._serialized_end=164
-  _globals['_RECEIVEREQUEST']._serialized_start=166
-  _globals['_RECEIVEREQUEST']._serialized_end=202
-  _globals['_INBOXRESPONSE']._serialized_start=204
-  _globals['_INBOXRESPONSE']._serialized_end=261
-  _globals['_MESSENGERSERVICE']._serialized_start=264
-  _globals['_MESSENGERSERVICE']._serialized_end=406
+  _globals['_DIGESTRESPONSE_MAILBOXESENTRY']._loaded_options = None
+  _globals['_DIGESTRESPONSE_MAILBOXESENTRY']._serialized_options = b'8\001'
+  _globals['_CODEC']._serialized_start=1414
+  _globals['_CODEC']._serialized_end=1469
+  _globals['_SENDREQUEST']._serialized_start=31
+  _globals['_SENDREQUEST']._serialized_end=200
+  _globals['_ATTACHMENT']._serialized_start=202
+  _globals['_ATTACHMENT']._serialized_end=258
+  _globals['_SENDRESPONSE']._serialized_start=260
+  _globals['_SENDRESPONSE']._serialized_end=314
+  _globals['_RECEIVEREQUEST']._serialized_start=316
+  _globals['_RECEIVEREQUEST']._serialized_end=352
+  _globals['_INBOXRESPONSE']._serialized_start=354
+  _globals['_INBOXRESPONSE']._serialized_end=411
+  _globals['_FETCHREQUEST']._serialized_start=413
+  _globals['_FETCHREQUEST']._serialized_end=496
+  _globals['_FETCHRESPONSE']._serialized_start=498
+  _globals['_FETCHRESPONSE']._serialized_end=615
+  _globals['_ACKREQUEST']._serialized_start=617
+  _globals['_ACKREQUEST']._serialized_end=665
+  _globals['_ACKRESPONSE']._serialized_start=667
+  _globals['_ACKRESPONSE']._serialized_end=720
+  _globals['_SENDBATCHREQUEST']._serialized_start=722
+  _globals['_SENDBATCHREQUEST']._serialized_end=782
+  _globals['_SENDBATCHRESPONSE']._serialized_start=784
+  _globals['_SENDBATCHRESPONSE']._serialized_end=845
+  _globals['_REPLICATEBATCH']._serialized_start=847
+  _globals['_REPLICATEBATCH']._serialized_end=942
+  _globals['_REPLICATEACK']._serialized_start=944
+  _globals['_REPLICATEACK']._serialized_end=976
+  _globals['_DIGESTREQUEST']._serialized_start=978
+  _globals['_DIGESTREQUEST']._serialized_end=1010
+  _globals['_DIGESTRESPONSE']._serialized_start=1013
+  _globals['_DIGESTRESPONSE']._serialized_end=1157
+  _globals['_DIGESTRESPONSE_MAILBOXESENTRY']._serialized_start=1109
+  _globals['_DIGESTRESPONSE_MAILBOXESENTRY']._serialized_end=1157
+  _globals['_PULLREQUEST']._serialized_start=1159
+  _globals['_PULLREQUEST']._serialized_end=1206
+  _globals['_UPLOADCHUNK']._serialized_start=1208
+  _globals['_UPLOADCHUNK']._serialized_end=1265
+  _globals['_UPLOADRESPONSE']._serialized_start=1267
+  _globals['_UPLOADRESPONSE']._serialized_end=1330
+  _globals['_DOWNLOADREQUEST']._serialized_start=1332
+  _globals['_DOWNLOADREQUEST']._serialized_end=1381
+  _globals['_DOWNLOADCHUNK']._serialized_start=1383
+  _globals['_DOWNLOADCHUNK']._serialized_end=1412
+  _globals['_MESSENGERSERVICE']._serialized_start=1472
+  _globals['_MESSENGERSERVICE']._serialized_end=2191
 # @@protoc_insertion_point(module_scope)
@@ -6,30 +6,61 @@ import builtins
 import collections.abc
 import google.protobuf.descriptor
 import google.protobuf.internal.containers
+import google.protobuf.internal.enum_type_wrapper
 import google.protobuf.message
 import sys
+import typing
 
-if sys.version_info >= (3, 8):
+if sys.version_info >= (3, 10):
     import typing as typing_extensions
 else:
     import typing_extensions
 
 DESCRIPTOR: google.protobuf.descriptor.FileDescriptor
 
+class _Codec:
+    ValueType = typing.NewType("ValueType", builtins.int)
+    V: typing_extensions.TypeAlias = ValueType
+
+class _CodecEnumTypeWrapper(google.protobuf.internal.enum_type_wrapper._EnumTypeWrapper[_Codec.ValueType], builtins.type):
+    DESCRIPTOR: google.protobuf.descriptor.EnumDescriptor
+    CODEC_NONE: _Codec.ValueType  # 0
+    CODEC_ZLIB: _Codec.ValueType  # 1
+    CODEC_ZSTD: _Codec.ValueType  # 2
+
+class Codec(_Codec, metaclass=_CodecEnumTypeWrapper):
+    """Data Structures
+
+    Compression of SendRequest.body (see codec.py)
+    """
+
+CODEC_NONE: Codec.ValueType  # 0
+CODEC_ZLIB: Codec.ValueType  # 1
+CODEC_ZSTD: Codec.ValueType  # 2
+global___Codec = Codec
+
 @typing_extensions.final
 class SendRequest(google.protobuf.message.Message):
-    """Data Structures"""
-
     DESCRIPTOR: google.protobuf.descriptor.Descriptor
 
     ID_FIELD_NUMBER: builtins.int
     MSG_FIELD_NUMBER: builtins.int
     SELF_EMAIL_FIELD_NUMBER: builtins.int
     DEST_EMAIL_FIELD_NUMBER: builtins.int
+    CODEC_FIELD_NUMBER: builtins.int
+    BODY_FIELD_NUMBER: builtins.int
+    ATTACHMENTS_FIELD_NUMBER: builtins.int
     id: builtins.int
+    """Globally unique and time ordered (client.SnowflakeIdGenerator)"""
     msg: builtins.str
+    """Empty when the text was compressed into body"""
     self_email: builtins.str
     dest_email: builtins.str
+    codec: global___Codec.ValueType
+    body: builtins.bytes
+    """The UTF-8 text compressed with codec, set only when codec is not CODEC_NONE"""
+    @property
+    def attachments(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___Attachment]: ...
     def __init__(
         self,
         *,
@@ -37,11 +68,38 @@ class SendRequest(google.protobuf.message.Message):
         msg: builtins.str = ...,
         self_email: builtins.str = ...,
         dest_email: builtins.str = ...,
+        codec: global___Codec.ValueType = ...,
+        body: builtins.bytes = ...,
+        attachments: collections.abc.Iterable[global___Attachment] | None = ...,
     ) -> None: ...
-    def ClearField(self, field_name: typing_extensions.Literal["dest_email", b"dest_email", "id", b"id", "msg", b"msg", "self_email", b"self_email"]) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["attachments", b"attachments", "body", b"body", "codec", b"codec", "dest_email", b"dest_email", "id", b"id", "msg", b"msg", "self_email", b"self_email"]) -> None: ...
 
 global___SendRequest = SendRequest
 
+@typing_extensions.final
+class Attachment(google.protobuf.message.Message):
+    """Reference to an uploaded attachment, the content itself is fetched with Download"""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SHA256_FIELD_NUMBER: builtins.int
+    NAME_FIELD_NUMBER: builtins.int
+    SIZE_FIELD_NUMBER: builtins.int
+    sha256: builtins.str
+    """Hex digest of the content"""
+    name: builtins.str
+    size: builtins.int
+    def __init__(
+        self,
+        *,
+        sha256: builtins.str = ...,
+        name: builtins.str = ...,
+        size: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["name", b"name", "sha256", b"sha256", "size", b"size"]) -> None: ...
+
+global___Attachment = Attachment
+
 @typing_extensions.final
 class SendResponse(google.protobuf.message.Message):
     """Extensibility"""
@@ -93,3 +151,322 @@ class InboxResponse(google.protobuf.message.Message):
     def ClearField(self, field_name: typing_extensions.Literal["messages", b"messages"]) -> None: ...
 
 global___InboxResponse = InboxResponse
+
+@typing_extensions.final
+class FetchRequest(google.protobuf.message.Message):
+    """Cursors are per mailbox positions assigned by each server, starting at 0"""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SELF_EMAIL_FIELD_NUMBER: builtins.int
+    CURSOR_FIELD_NUMBER: builtins.int
+    LIMIT_FIELD_NUMBER: builtins.int
+    SINCE_ID_FIELD_NUMBER: builtins.int
+    self_email: builtins.str
+    cursor: builtins.int
+    """Position of the first message to return"""
+    limit: builtins.int
+    """Maximum page size, 0 uses the server default"""
+    since_id: builtins.int
+    """Messages with an id up to this one are skipped (the client already has them)"""
+    def __init__(
+        self,
+        *,
+        self_email: builtins.str = ...,
+        cursor: builtins.int = ...,
+        limit: builtins.int = ...,
+        since_id: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["cursor", b"cursor", "limit", b"limit", "self_email", b"self_email", "since_id", b"since_id"]) -> None: ...
+
+global___FetchRequest = FetchRequest
+
+@typing_extensions.final
+class FetchResponse(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    MESSAGES_FIELD_NUMBER: builtins.int
+    NEXT_CURSOR_FIELD_NUMBER: builtins.int
+    HAS_MORE_FIELD_NUMBER: builtins.int
+    SKIPPED_IDS_FIELD_NUMBER: builtins.int
+    @property
+    def messages(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___SendRequest]: ...
+    next_cursor: builtins.int
+    """Cursor for the next page, and the value to acknowledge"""
+    has_more: builtins.bool
+    @property
+    def skipped_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]:
+        """Ids skipped because of since_id, behind next_cursor all the same"""
+    def __init__(
+        self,
+        *,
+        messages: collections.abc.Iterable[global___SendRequest] | None = ...,
+        next_cursor: builtins.int = ...,
+        has_more: builtins.bool = ...,
+        skipped_ids: collections.abc.Iterable[builtins.int] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["has_more", b"has_more", "messages", b"messages", "next_cursor", b"next_cursor", "skipped_ids", b"skipped_ids"]) -> None: ...
+
+global___FetchResponse = FetchResponse
+
+@typing_extensions.final
+class AckRequest(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SELF_EMAIL_FIELD_NUMBER: builtins.int
+    CURSOR_FIELD_NUMBER: builtins.int
+    self_email: builtins.str
+    cursor: builtins.int
+    """Every message before this position is removed"""
+    def __init__(
+        self,
+        *,
+        self_email: builtins.str = ...,
+        cursor: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["cursor", b"cursor", "self_email", b"self_email"]) -> None: ...
+
+global___AckRequest = AckRequest
+
+@typing_extensions.final
+class AckResponse(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SUCCESS_FIELD_NUMBER: builtins.int
+    DEBUG_MESSAGE_FIELD_NUMBER: builtins.int
+    success: builtins.bool
+    debug_message: builtins.str
+    def __init__(
+        self,
+        *,
+        success: builtins.bool = ...,
+        debug_message: builtins.str = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["debug_message", b"debug_message", "success", b"success"]) -> None: ...
+
+global___AckResponse = AckResponse
+
+@typing_extensions.final
+class SendBatchRequest(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    MESSAGES_FIELD_NUMBER: builtins.int
+    @property
+    def messages(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___SendRequest]: ...
+    def __init__(
+        self,
+        *,
+        messages: collections.abc.Iterable[global___SendRequest] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["messages", b"messages"]) -> None: ...
+
+global___SendBatchRequest = SendBatchRequest
+
+@typing_extensions.final
+class SendBatchResponse(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    RESULTS_FIELD_NUMBER: builtins.int
+    @property
+    def results(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___SendResponse]: ...
+    def __init__(
+        self,
+        *,
+        results: collections.abc.Iterable[global___SendResponse] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["results", b"results"]) -> None: ...
+
+global___SendBatchResponse = SendBatchResponse
+
+@typing_extensions.final
+class ReplicateBatch(google.protobuf.message.Message):
+    """Sequences grow by one per batch of a leader, so a follower can skip batches resent after a reconnect"""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    LEADER_ID_FIELD_NUMBER: builtins.int
+    SEQUENCE_FIELD_NUMBER: builtins.int
+    MESSAGES_FIELD_NUMBER: builtins.int
+    leader_id: builtins.str
+    sequence: builtins.int
+    @property
+    def messages(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___SendRequest]: ...
+    def __init__(
+        self,
+        *,
+        leader_id: builtins.str = ...,
+        sequence: builtins.int = ...,
+        messages: collections.abc.Iterable[global___SendRequest] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["leader_id", b"leader_id", "messages", b"messages", "sequence", b"sequence"]) -> None: ...
+
+global___ReplicateBatch = ReplicateBatch
+
+@typing_extensions.final
+class ReplicateAck(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SEQUENCE_FIELD_NUMBER: builtins.int
+    sequence: builtins.int
+    def __init__(
+        self,
+        *,
+        sequence: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["sequence", b"sequence"]) -> None: ...
+
+global___ReplicateAck = ReplicateAck
+
+@typing_extensions.final
+class DigestRequest(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    MAILBOX_FIELD_NUMBER: builtins.int
+    mailbox: builtins.str
+    """Empty asks for one digest per mailbox"""
+    def __init__(
+        self,
+        *,
+        mailbox: builtins.str = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["mailbox", b"mailbox"]) -> None: ...
+
+global___DigestRequest = DigestRequest
+
+@typing_extensions.final
+class DigestResponse(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    @typing_extensions.final
+    class MailboxesEntry(google.protobuf.message.Message):
+        DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+        KEY_FIELD_NUMBER: builtins.int
+        VALUE_FIELD_NUMBER: builtins.int
+        key: builtins.str
+        value: builtins.int
+        def __init__(
+            self,
+            *,
+            key: builtins.str = ...,
+            value: builtins.int = ...,
+        ) -> None: ...
+        def ClearField(self, field_name: typing_extensions.Literal["key", b"key", "value", b"value"]) -> None: ...
+
+    MAILBOXES_FIELD_NUMBER: builtins.int
+    BUCKETS_FIELD_NUMBER: builtins.int
+    @property
+    def mailboxes(self) -> google.protobuf.internal.containers.ScalarMap[builtins.str, builtins.int]:
+        """Set when no mailbox was requested"""
+    @property
+    def buckets(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]:
+        """Set when a mailbox was requested, one digest per hash bucket"""
+    def __init__(
+        self,
+        *,
+        mailboxes: collections.abc.Mapping[builtins.str, builtins.int] | None = ...,
+        buckets: collections.abc.Iterable[builtins.int] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["buckets", b"buckets", "mailboxes", b"mailboxes"]) -> None: ...
+
+global___DigestResponse = DigestResponse
+
+@typing_extensions.final
+class PullRequest(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    MAILBOX_FIELD_NUMBER: builtins.int
+    BUCKETS_FIELD_NUMBER: builtins.int
+    mailbox: builtins.str
+    @property
+    def buckets(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    def __init__(
+        self,
+        *,
+        mailbox: builtins.str = ...,
+        buckets: collections.abc.Iterable[builtins.int] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["buckets", b"buckets", "mailbox", b"mailbox"]) -> None: ...
+
+global___PullRequest = PullRequest
+
+@typing_extensions.final
+class UploadChunk(google.protobuf.message.Message):
+    """The first chunk announces the digest and size, so a server that already has the content can answer at once"""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SHA256_FIELD_NUMBER: builtins.int
+    SIZE_FIELD_NUMBER: builtins.int
+    DATA_FIELD_NUMBER: builtins.int
+    sha256: builtins.str
+    """First chunk only"""
+    size: builtins.int
+    """First chunk only"""
+    data: builtins.bytes
+    def __init__(
+        self,
+        *,
+        sha256: builtins.str = ...,
+        size: builtins.int = ...,
+        data: builtins.bytes = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["data", b"data", "sha256", b"sha256", "size", b"size"]) -> None: ...
+
+global___UploadChunk = UploadChunk
+
+@typing_extensions.final
+class UploadResponse(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SHA256_FIELD_NUMBER: builtins.int
+    SIZE_FIELD_NUMBER: builtins.int
+    EXISTED_FIELD_NUMBER: builtins.int
+    sha256: builtins.str
+    size: builtins.int
+    existed: builtins.bool
+    """The content was already stored, the chunks were not read"""
+    def __init__(
+        self,
+        *,
+        sha256: builtins.str = ...,
+        size: builtins.int = ...,
+        existed: builtins.bool = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["existed", b"existed", "sha256", b"sha256", "size", b"size"]) -> None: ...
+
+global___UploadResponse = UploadResponse
+
+@typing_extensions.final
+class DownloadRequest(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SHA256_FIELD_NUMBER: builtins.int
+    OFFSET_FIELD_NUMBER: builtins.int
+    sha256: builtins.str
+    offset: builtins.int
+    """Resumes an interrupted download"""
+    def __init__(
+        self,
+        *,
+        sha256: builtins.str = ...,
+        offset: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["offset", b"offset", "sha256", b"sha256"]) -> None: ...
+
+global___DownloadRequest = DownloadRequest
+
+@typing_extensions.final
+class DownloadChunk(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    DATA_FIELD_NUMBER: builtins.int
+    data: builtins.bytes
+    def __init__(
+        self,
+        *,
+        data: builtins.bytes = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["data", b"data"]) -> None: ...
+
+global___DownloadChunk = DownloadChunk
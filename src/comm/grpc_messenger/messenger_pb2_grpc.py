@@ -45,6 +45,51 @@ class MessengerServiceStub(object):
                 request_serializer=messenger__pb2.ReceiveRequest.SerializeToString,
                 response_deserializer=messenger__pb2.InboxResponse.FromString,
                 _registered_method=True)
+        self.ReceiveStream = channel.unary_stream(
+                '/messenger.MessengerService/ReceiveStream',
+                request_serializer=messenger__pb2.ReceiveRequest.SerializeToString,
+                response_deserializer=messenger__pb2.SendRequest.FromString,
+                _registered_method=True)
+        self.Fetch = channel.unary_unary(
+                '/messenger.MessengerService/Fetch',
+                request_serializer=messenger__pb2.FetchRequest.SerializeToString,
+                response_deserializer=messenger__pb2.FetchResponse.FromString,
+                _registered_method=True)
+        self.Ack = channel.unary_unary(
+                '/messenger.MessengerService/Ack',
+                request_serializer=messenger__pb2.AckRequest.SerializeToString,
+                response_deserializer=messenger__pb2.AckResponse.FromString,
+                _registered_method=True)
+        self.SendBatch = channel.unary_unary(
+                '/messenger.MessengerService/SendBatch',
+                request_serializer=messenger__pb2.SendBatchRequest.SerializeToString,
+                response_deserializer=messenger__pb2.SendBatchResponse.FromString,
+                _registered_method=True)
+        self.Replicate = channel.stream_stream(
+                '/messenger.MessengerService/Replicate',
+                request_serializer=messenger__pb2.ReplicateBatch.SerializeToString,
+                response_deserializer=messenger__pb2.ReplicateAck.FromString,
+                _registered_method=True)
+        self.Digest = channel.unary_unary(
+                '/messenger.MessengerService/Digest',
+                request_serializer=messenger__pb2.DigestRequest.SerializeToString,
+                response_deserializer=messenger__pb2.DigestResponse.FromString,
+                _registered_method=True)
+        self.Pull = channel.unary_unary(
+                '/messenger.MessengerService/Pull',
+                request_serializer=messenger__pb2.PullRequest.SerializeToString,
+                response_deserializer=messenger__pb2.InboxResponse.FromString,
+                _registered_method=True)
+        self.Upload = channel.stream_unary(
+                '/messenger.MessengerService/Upload',
+                request_serializer=messenger__pb2.UploadChunk.SerializeToString,
+                response_deserializer=messenger__pb2.UploadResponse.FromString,
+                _registered_method=True)
+        self.Download = channel.unary_stream(
+                '/messenger.MessengerService/Download',
+                request_serializer=messenger__pb2.DownloadRequest.SerializeToString,
+                response_deserializer=messenger__pb2.DownloadChunk.FromString,
+                _registered_method=True)
 
 
 class MessengerServiceServicer(object):
@@ -65,6 +110,69 @@ class MessengerServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ReceiveStream(self, request, context):
+        """Keeps the subscription open, pushing each message as soon as it is queued for the requester
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Fetch(self, request, context):
+        """Returns a bounded page of queued messages after a cursor, without removing them
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Ack(self, request, context):
+        """Removes every queued message before the acknowledged cursor
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SendBatch(self, request, context):
+        """Queues several messages in one call, answering one SendResponse per message (same order)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Replicate(self, request_iterator, context):
+        """Server to server: the leader streams batches of the writes it accepted, the follower acknowledges each one
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Digest(self, request, context):
+        """Server to server anti-entropy: digests of every mailbox, or of the hash buckets of one mailbox
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Pull(self, request, context):
+        """Server to server anti-entropy: the queued messages of a mailbox that fall in the given hash buckets
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Upload(self, request_iterator, context):
+        """Stores an attachment sent in chunks, under the SHA-256 of its content
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Download(self, request, context):
+        """Streams a stored attachment back in chunks, starting at an offset
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_MessengerServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -78,6 +186,51 @@ def add_MessengerServiceServicer_to_server(servicer, server):
                     request_deserializer=messenger__pb2.ReceiveRequest.FromString,
                     response_serializer=messenger__pb2.InboxResponse.SerializeToString,
             ),
+            'ReceiveStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.ReceiveStream,
+                    request_deserializer=messenger__pb2.ReceiveRequest.FromString,
+                    response_serializer=messenger__pb2.SendRequest.SerializeToString,
+            ),
+            'Fetch': grpc.unary_unary_rpc_method_handler(
+                    servicer.Fetch,
+                    request_deserializer=messenger__pb2.FetchRequest.FromString,
+                    response_serializer=messenger__pb2.FetchResponse.SerializeToString,
+            ),
+            'Ack': grpc.unary_unary_rpc_method_handler(
+                    servicer.Ack,
+                    request_deserializer=messenger__pb2.AckRequest.FromString,
+                    response_serializer=messenger__pb2.AckResponse.SerializeToString,
+            ),
+            'SendBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.SendBatch,
+                    request_deserializer=messenger__pb2.SendBatchRequest.FromString,
+                    response_serializer=messenger__pb2.SendBatchResponse.SerializeToString,
+            ),
+            'Replicate': grpc.stream_stream_rpc_method_handler(
+                    servicer.Replicate,
+                    request_deserializer=messenger__pb2.ReplicateBatch.FromString,
+                    response_serializer=messenger__pb2.ReplicateAck.SerializeToString,
+            ),
+            'Digest': grpc.unary_unary_rpc_method_handler(
+                    servicer.Digest,
+                    request_deserializer=messenger__pb2.DigestRequest.FromString,
+                    response_serializer=messenger__pb2.DigestResponse.SerializeToString,
+            ),
+            'Pull': grpc.unary_unary_rpc_method_handler(
+                    servicer.Pull,
+                    request_deserializer=messenger__pb2.PullRequest.FromString,
+                    response_serializer=messenger__pb2.InboxResponse.SerializeToString,
+            ),
+            'Upload': grpc.stream_unary_rpc_method_handler(
+                    servicer.Upload,
+                    request_deserializer=messenger__pb2.UploadChunk.FromString,
+                    response_serializer=messenger__pb2.UploadResponse.SerializeToString,
+            ),
+            'Download': grpc.unary_stream_rpc_method_handler(
+                    servicer.Download,
+                    request_deserializer=messenger__pb2.DownloadRequest.FromString,
+                    response_serializer=messenger__pb2.DownloadChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'messenger.MessengerService', rpc_method_handlers)
@@ -143,3 +296,246 @@ class MessengerService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def ReceiveStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/messenger.MessengerService/ReceiveStream',
+            messenger__pb2.ReceiveRequest.SerializeToString,
+            messenger__pb2.SendRequest.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Fetch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.MessengerService/Fetch',
+            messenger__pb2.FetchRequest.SerializeToString,
+            messenger__pb2.FetchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Ack(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.MessengerService/Ack',
+            messenger__pb2.AckRequest.SerializeToString,
+            messenger__pb2.AckResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SendBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.MessengerService/SendBatch',
+            messenger__pb2.SendBatchRequest.SerializeToString,
+            messenger__pb2.SendBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Replicate(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/messenger.MessengerService/Replicate',
+            messenger__pb2.ReplicateBatch.SerializeToString,
+            messenger__pb2.ReplicateAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Digest(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.MessengerService/Digest',
+            messenger__pb2.DigestRequest.SerializeToString,
+            messenger__pb2.DigestResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Pull(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.MessengerService/Pull',
+            messenger__pb2.PullRequest.SerializeToString,
+            messenger__pb2.InboxResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Upload(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/messenger.MessengerService/Upload',
+            messenger__pb2.UploadChunk.SerializeToString,
+            messenger__pb2.UploadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Download(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/messenger.MessengerService/Download',
+            messenger__pb2.DownloadRequest.SerializeToString,
+            messenger__pb2.DownloadChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -31,6 +31,51 @@ class MessengerServiceStub:
         messenger_pb2.InboxResponse,
     ]
     """Retrieves all messages waiting for the requester's IP/Port"""
+    ReceiveStream: grpc.UnaryStreamMultiCallable[
+        messenger_pb2.ReceiveRequest,
+        messenger_pb2.SendRequest,
+    ]
+    """Keeps the subscription open, pushing each message as soon as it is queued for the requester"""
+    Fetch: grpc.UnaryUnaryMultiCallable[
+        messenger_pb2.FetchRequest,
+        messenger_pb2.FetchResponse,
+    ]
+    """Returns a bounded page of queued messages after a cursor, without removing them"""
+    Ack: grpc.UnaryUnaryMultiCallable[
+        messenger_pb2.AckRequest,
+        messenger_pb2.AckResponse,
+    ]
+    """Removes every queued message before the acknowledged cursor"""
+    SendBatch: grpc.UnaryUnaryMultiCallable[
+        messenger_pb2.SendBatchRequest,
+        messenger_pb2.SendBatchResponse,
+    ]
+    """Queues several messages in one call, answering one SendResponse per message (same order)"""
+    Replicate: grpc.StreamStreamMultiCallable[
+        messenger_pb2.ReplicateBatch,
+        messenger_pb2.ReplicateAck,
+    ]
+    """Server to server: the leader streams batches of the writes it accepted, the follower acknowledges each one"""
+    Digest: grpc.UnaryUnaryMultiCallable[
+        messenger_pb2.DigestRequest,
+        messenger_pb2.DigestResponse,
+    ]
+    """Server to server anti-entropy: digests of every mailbox, or of the hash buckets of one mailbox"""
+    Pull: grpc.UnaryUnaryMultiCallable[
+        messenger_pb2.PullRequest,
+        messenger_pb2.InboxResponse,
+    ]
+    """Server to server anti-entropy: the queued messages of a mailbox that fall in the given hash buckets"""
+    Upload: grpc.StreamUnaryMultiCallable[
+        messenger_pb2.UploadChunk,
+        messenger_pb2.UploadResponse,
+    ]
+    """Stores an attachment sent in chunks, under the SHA-256 of its content"""
+    Download: grpc.UnaryStreamMultiCallable[
+        messenger_pb2.DownloadRequest,
+        messenger_pb2.DownloadChunk,
+    ]
+    """Streams a stored attachment back in chunks, starting at an offset"""
 
 class MessengerServiceAsyncStub:
     """The Service Definition"""
@@ -45,6 +90,51 @@ class MessengerServiceAsyncStub:
         messenger_pb2.InboxResponse,
     ]
     """Retrieves all messages waiting for the requester's IP/Port"""
+    ReceiveStream: grpc.aio.UnaryStreamMultiCallable[
+        messenger_pb2.ReceiveRequest,
+        messenger_pb2.SendRequest,
+    ]
+    """Keeps the subscription open, pushing each message as soon as it is queued for the requester"""
+    Fetch: grpc.aio.UnaryUnaryMultiCallable[
+        messenger_pb2.FetchRequest,
+        messenger_pb2.FetchResponse,
+    ]
+    """Returns a bounded page of queued messages after a cursor, without removing them"""
+    Ack: grpc.aio.UnaryUnaryMultiCallable[
+        messenger_pb2.AckRequest,
+        messenger_pb2.AckResponse,
+    ]
+    """Removes every queued message before the acknowledged cursor"""
+    SendBatch: grpc.aio.UnaryUnaryMultiCallable[
+        messenger_pb2.SendBatchRequest,
+        messenger_pb2.SendBatchResponse,
+    ]
+    """Queues several messages in one call, answering one SendResponse per message (same order)"""
+    Replicate: grpc.aio.StreamStreamMultiCallable[
+        messenger_pb2.ReplicateBatch,
+        messenger_pb2.ReplicateAck,
+    ]
+    """Server to server: the leader streams batches of the writes it accepted, the follower acknowledges each one"""
+    Digest: grpc.aio.UnaryUnaryMultiCallable[
+        messenger_pb2.DigestRequest,
+        messenger_pb2.DigestResponse,
+    ]
+    """Server to server anti-entropy: digests of every mailbox, or of the hash buckets of one mailbox"""
+    Pull: grpc.aio.UnaryUnaryMultiCallable[
+        messenger_pb2.PullRequest,
+        messenger_pb2.InboxResponse,
+    ]
+    """Server to server anti-entropy: the queued messages of a mailbox that fall in the given hash buckets"""
+    Upload: grpc.aio.StreamUnaryMultiCallable[
+        messenger_pb2.UploadChunk,
+        messenger_pb2.UploadResponse,
+    ]
+    """Stores an attachment sent in chunks, under the SHA-256 of its content"""
+    Download: grpc.aio.UnaryStreamMultiCallable[
+        messenger_pb2.DownloadRequest,
+        messenger_pb2.DownloadChunk,
+    ]
+    """Streams a stored attachment back in chunks, starting at an offset"""
 
 class MessengerServiceServicer(metaclass=abc.ABCMeta):
     """The Service Definition"""
@@ -63,5 +153,68 @@ class MessengerServiceServicer(metaclass=abc.ABCMeta):
         context: _ServicerContext,
     ) -> typing.Union[messenger_pb2.InboxResponse, collections.abc.Awaitable[messenger_pb2.InboxResponse]]:
         """Retrieves all messages waiting for the requester's IP/Port"""
+    @abc.abstractmethod
+    def ReceiveStream(
+        self,
+        request: messenger_pb2.ReceiveRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[collections.abc.Iterator[messenger_pb2.SendRequest], collections.abc.AsyncIterator[messenger_pb2.SendRequest]]:
+        """Keeps the subscription open, pushing each message as soon as it is queued for the requester"""
+    @abc.abstractmethod
+    def Fetch(
+        self,
+        request: messenger_pb2.FetchRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[messenger_pb2.FetchResponse, collections.abc.Awaitable[messenger_pb2.FetchResponse]]:
+        """Returns a bounded page of queued messages after a cursor, without removing them"""
+    @abc.abstractmethod
+    def Ack(
+        self,
+        request: messenger_pb2.AckRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[messenger_pb2.AckResponse, collections.abc.Awaitable[messenger_pb2.AckResponse]]:
+        """Removes every queued message before the acknowledged cursor"""
+    @abc.abstractmethod
+    def SendBatch(
+        self,
+        request: messenger_pb2.SendBatchRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[messenger_pb2.SendBatchResponse, collections.abc.Awaitable[messenger_pb2.SendBatchResponse]]:
+        """Queues several messages in one call, answering one SendResponse per message (same order)"""
+    @abc.abstractmethod
+    def Replicate(
+        self,
+        request_iterator: _MaybeAsyncIterator[messenger_pb2.ReplicateBatch],
+        context: _ServicerContext,
+    ) -> typing.Union[collections.abc.Iterator[messenger_pb2.ReplicateAck], collections.abc.AsyncIterator[messenger_pb2.ReplicateAck]]:
+        """Server to server: the leader streams batches of the writes it accepted, the follower acknowledges each one"""
+    @abc.abstractmethod
+    def Digest(
+        self,
+        request: messenger_pb2.DigestRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[messenger_pb2.DigestResponse, collections.abc.Awaitable[messenger_pb2.DigestResponse]]:
+        """Server to server anti-entropy: digests of every mailbox, or of the hash buckets of one mailbox"""
+    @abc.abstractmethod
+    def Pull(
+        self,
+        request: messenger_pb2.PullRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[messenger_pb2.InboxResponse, collections.abc.Awaitable[messenger_pb2.InboxResponse]]:
+        """Server to server anti-entropy: the queued messages of a mailbox that fall in the given hash buckets"""
+    @abc.abstractmethod
+    def Upload(
+        self,
+        request_iterator: _MaybeAsyncIterator[messenger_pb2.UploadChunk],
+        context: _ServicerContext,
+    ) -> typing.Union[messenger_pb2.UploadResponse, collections.abc.Awaitable[messenger_pb2.UploadResponse]]:
+        """Stores an attachment sent in chunks, under the SHA-256 of its content"""
+    @abc.abstractmethod
+    def Download(
+        self,
+        request: messenger_pb2.DownloadRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[collections.abc.Iterator[messenger_pb2.DownloadChunk], collections.abc.AsyncIterator[messenger_pb2.DownloadChunk]]:
+        """Streams a stored attachment back in chunks, starting at an offset"""
 
 def add_MessengerServiceServicer_to_server(servicer: MessengerServiceServicer, server: typing.Union[grpc.Server, grpc.aio.Server]) -> None: ...
@@ -0,0 +1,255 @@
+"""
+Client-side replica health tracking.
+
+Every RPC outcome updates an exponentially weighted moving average (EWMA) of the latency and of the error rate
+of its replica. After failure_threshold consecutive failures the replica's circuit breaker opens: calls to it
+are skipped without touching the network until a backoff expires. Then a single probe call is let through
+(half open). A successful probe closes the breaker; a failed one reopens it with twice the backoff. A probe
+whose outcome is never recorded (the caller gave up on it) does not strand the replica: after probe_timeout
+another probe is let through.
+
+A RESOURCE_EXHAUSTED error carrying a retry-after hint (ratelimit.py) is not a replica failure: the server
+answered, and only rejected one sender or mailbox. The tracker then throttles that key on that replica until
+the hint expires, and fan_out skips calls involving it, while the breaker and every other key are unaffected.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Callable, Sequence, TypeVar
+
+import grpc
+
+import metrics
+from ratelimit import RETRY_AFTER_METADATA, LIMITED_KEY_METADATA
+
+
+DEFAULT_ALPHA = 0.2
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_BASE_BACKOFF = 0.5  # seconds
+DEFAULT_MAX_BACKOFF = 30  # seconds
+DEFAULT_PROBE_TIMEOUT = 10  # seconds before a half open breaker lets another probe through
+LATENCY_SAMPLES = 100  # latest latencies kept per replica, for quantiles
+
+# Errors that say something about the replica rather than about the request
+BREAKER_CODES = frozenset({
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+})
+
+BREAKER_OPENED = metrics.REGISTRY.counter(
+    "client_breaker_opened_total", "Times a replica circuit breaker opened", ("replica",))
+
+T = TypeVar("T")
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(grpc.RpcError):
+    """Stands in for an RPC that was never sent because the replica's breaker is open."""
+
+    def __init__(self, address: str):
+        super().__init__(address)
+        self.address = address
+
+    def code(self) -> grpc.StatusCode:
+        return grpc.StatusCode.UNAVAILABLE
+
+    def details(self) -> str:
+        return f"Circuit breaker open for {self.address}"
+
+    def __str__(self) -> str:
+        return self.details()
+
+
+class ThrottledError(grpc.RpcError):
+    """Stands in for an RPC that was never sent because the replica asked to back off one of its keys."""
+
+    def __init__(self, address: str, retry_after: float):
+        super().__init__(address)
+        self.address = address
+        self.retry_after = retry_after
+
+    def code(self) -> grpc.StatusCode:
+        return grpc.StatusCode.RESOURCE_EXHAUSTED
+
+    def details(self) -> str:
+        return f"Backing off from {self.address} for {self.retry_after:.1f}s"
+
+    def __str__(self) -> str:
+        return self.details()
+
+
+def retry_after_hint(error: grpc.RpcError) -> tuple[str, float] | None:
+    """(limited key, seconds to wait) from the trailing metadata of a rate limited call, if any."""
+    if error.code() != grpc.StatusCode.RESOURCE_EXHAUSTED or not hasattr(error, "trailing_metadata"):
+        return None
+    metadata = dict(error.trailing_metadata() or ())
+    if RETRY_AFTER_METADATA not in metadata or LIMITED_KEY_METADATA not in metadata:
+        return None
+    return metadata[LIMITED_KEY_METADATA].decode("utf-8"), int(metadata[RETRY_AFTER_METADATA]) / 1000
+
+
+@dataclass
+class ReplicaHealth:
+    latency_ms: float | None = None
+    error_rate: float = 0.0
+    consecutive_failures: int = 0
+    state: BreakerState = BreakerState.CLOSED
+    backoff: float = 0.0
+    retry_at: float = 0.0
+    probe_deadline: float = 0.0
+
+
+class HealthTracker:
+    """Thread-safe health state of every replica address seen so far."""
+
+    def __init__(
+            self, alpha: float = DEFAULT_ALPHA, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+            base_backoff: float = DEFAULT_BASE_BACKOFF, max_backoff: float = DEFAULT_MAX_BACKOFF,
+            clock: Callable[[], float] = time.monotonic, probe_timeout: float = DEFAULT_PROBE_TIMEOUT
+        ):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self.clock = clock
+
+        self._replicas = {}
+        self._throttles = {}  # (address, key) -> clock() when calls may resume
+        self._samples = {}  # address -> latest latencies in ms
+        self._lock = threading.Lock()
+
+    def _get(self, address: str) -> ReplicaHealth:
+        """Must be called with the lock held."""
+        health = self._replicas.get(address)
+        if health is None:
+            health = self._replicas[address] = ReplicaHealth()
+        return health
+
+    def allow(self, address: str) -> bool:
+        """
+            Whether a call to address may be sent now. Once the backoff of an open breaker expires,
+            the first caller gets True and becomes the probe; everyone else keeps getting False until it finishes,
+            or until probe_timeout passed without an outcome, when the next caller becomes the probe instead.
+            A caller that gets True must send the call and record its outcome.
+        """
+        with self._lock:
+            health = self._get(address)
+            if health.state is BreakerState.CLOSED:
+                return True
+            now = self.clock()
+            due = health.retry_at if health.state is BreakerState.OPEN else health.probe_deadline
+            if now >= due:
+                health.state = BreakerState.HALF_OPEN
+                health.probe_deadline = now + self.probe_timeout
+                return True
+            return False
+
+    def record(self, address: str, latency_ms: float | None, error: grpc.RpcError | None = None) -> None:
+        """Feeds the outcome of one call. Errors outside BREAKER_CODES mean the replica answered, so they count as success."""
+        hint = retry_after_hint(error) if error is not None else None
+        if hint is not None:
+            self.throttle(address, *hint)
+            self.record_success(address, latency_ms)
+        elif error is not None and error.code() in BREAKER_CODES:
+            self.record_failure(address)
+        else:
+            self.record_success(address, latency_ms)
+
+    def throttle(self, address: str, key: str, seconds: float) -> None:
+        with self._lock:
+            until = self.clock() + seconds
+            self._throttles[(address, key)] = max(until, self._throttles.get((address, key), 0.0))
+
+    def throttled(self, address: str, keys: Sequence[str]) -> float:
+        """Seconds until address accepts calls involving any of keys again, 0 if it already does."""
+        with self._lock:
+            now = self.clock()
+            wait = 0.0
+            for key in keys:
+                until = self._throttles.get((address, key))
+                if until is None:
+                    continue
+                if until <= now:
+                    del self._throttles[(address, key)]
+                else:
+                    wait = max(wait, until - now)
+            return wait
+
+    def record_success(self, address: str, latency_ms: float | None = None) -> None:
+        with self._lock:
+            health = self._get(address)
+            if latency_ms is not None:
+                samples = self._samples.get(address)
+                if samples is None:
+                    samples = self._samples[address] = deque(maxlen=LATENCY_SAMPLES)
+                samples.append(latency_ms)
+                if health.latency_ms is None:
+                    health.latency_ms = latency_ms
+                else:
+                    health.latency_ms += self.alpha * (latency_ms - health.latency_ms)
+            health.error_rate -= self.alpha * health.error_rate
+            health.consecutive_failures = 0
+            health.state = BreakerState.CLOSED
+            health.backoff = 0.0
+
+    def record_failure(self, address: str) -> None:
+        with self._lock:
+            health = self._get(address)
+            health.error_rate += self.alpha * (1 - health.error_rate)
+            health.consecutive_failures += 1
+            if health.state is BreakerState.OPEN:
+                # Late failure of a call sent before the breaker opened
+                return
+            if health.state is BreakerState.HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                health.backoff = min(health.backoff * 2 or self.base_backoff, self.max_backoff)
+                health.retry_at = self.clock() + health.backoff
+                health.state = BreakerState.OPEN
+                BREAKER_OPENED.inc(replica=address)
+
+    def latency_quantile(self, address: str, quantile: float, min_samples: int = 1) -> float | None:
+        """Quantile of the latest latencies of address in ms, None with fewer than min_samples of them."""
+        with self._lock:
+            samples = sorted(self._samples.get(address, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(int(quantile * len(samples)), len(samples) - 1)]
+
+    def snapshot(self, address: str) -> ReplicaHealth:
+        with self._lock:
+            return replace(self._get(address))
+
+    def fastest(self, items: Sequence[T], count: int, address: Callable[[T], str] = lambda conn: conn.address) -> list[T]:
+        """
+            Up to count items with a closed breaker, lowest EWMA latency first (replicas without samples yet come first,
+            so they get measured). Replicas due for a probe are added on top, so they can recover.
+        """
+        with self._lock:
+            closed = [item for item in items if self._get(address(item)).state is BreakerState.CLOSED]
+            closed.sort(key=lambda item: self._get(address(item)).latency_ms or 0.0)
+        probes = [
+            item for item in items
+            if self.snapshot(address(item)).state is not BreakerState.CLOSED and self.allow(address(item))
+        ]
+        return closed[:count] + probes
+
+    def ranked(self, items: Sequence[T], address: Callable[[T], str] = lambda conn: conn.address) -> list[T]:
+        """
+            Every item, closed breakers first by EWMA latency, then the others by when they may be probed.
+            Unlike fastest(), no probe is admitted: callers check allow() right before each call they send.
+        """
+        with self._lock:
+            def rank(item: T) -> tuple:
+                health = self._get(address(item))
+                if health.state is BreakerState.CLOSED:
+                    return (0, health.latency_ms or 0.0)
+                return (1, health.retry_at if health.state is BreakerState.OPEN else health.probe_deadline)
+            return sorted(items, key=rank)
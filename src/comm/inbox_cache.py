@@ -0,0 +1,99 @@
+"""
+Persistent client-side inbox, kept in a local SQLite database.
+
+The servers forget a message once it was delivered, so the client keeps every message it received here, keyed
+by its globally unique id. The history is loaded from disk at startup, and each refresh only asks the servers
+for messages newer than since_id() (FetchRequest.since_id), so it transfers the delta instead of whatever the
+replicas still hold. The servers report the ids they skipped, and known() tells which of them are really cached,
+so a message older than since_id that never reached this cache is fetched instead of being acknowledged unseen.
+"""
+import os
+import sqlite3
+import threading
+
+from client import SnowflakeIdGenerator
+
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".messenger", "inbox.sqlite3")
+# Snowflake ids are only ordered by the sender clocks, so a message created shortly before the newest cached one
+# can still arrive after it. since_id() stays this far behind the newest id, and the ids in that window are
+# deduplicated locally.
+SINCE_ID_MARGIN_MS = 60_000
+# Ids per query in known(), below the SQLite limit of bound parameters
+KNOWN_CHUNK = 500
+
+SCHEMA = """
+-- Commits only append to the WAL file, so storing a pushed message does not stall the GUI thread
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    msg TEXT NOT NULL,
+    self_email TEXT NOT NULL,
+    dest_email TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_owner ON messages (owner, id);
+"""
+
+
+class InboxCache:
+    """
+        Messages received by each local user, as (id, msg, self_email, dest_email) tuples.
+        Thread-safe: refreshes store from worker threads while pushed messages are stored on the GUI thread.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def load(self, owner: str) -> list[tuple[int, str, str, str]]:
+        """Every cached message of owner, oldest first."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, msg, self_email, dest_email FROM messages WHERE owner = ? ORDER BY id", (owner,)
+            ).fetchall()
+
+    def add(self, owner: str, messages: list[tuple[int, str, str, str]]) -> list[tuple[int, str, str, str]]:
+        """Stores the messages not cached yet, in a single transaction. Returns those messages."""
+        new = []
+        with self._lock, self._db:
+            for message in messages:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO messages (id, owner, msg, self_email, dest_email) VALUES (?, ?, ?, ?, ?)",
+                    (message[0], owner, *message[1:])
+                )
+                if cursor.rowcount:
+                    new.append(message)
+        return new
+
+    def last_id(self, owner: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT MAX(id) FROM messages WHERE owner = ?", (owner,)).fetchone()
+        return row[0] or 0
+
+    def known(self, owner: str, ids: list[int]) -> set[int]:
+        """The ids among ids that are cached for owner."""
+        found = set()
+        with self._lock:
+            for start in range(0, len(ids), KNOWN_CHUNK):
+                chunk = ids[start:start + KNOWN_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT id FROM messages WHERE owner = ? AND id IN ({placeholders})", (owner, *chunk)
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def since_id(self, owner: str) -> int:
+        """since_id for the next refresh: messages with an id up to it are only transferred if known() misses them."""
+        margin = SINCE_ID_MARGIN_MS << (SnowflakeIdGenerator.NODE_BITS + SnowflakeIdGenerator.SEQUENCE_BITS)
+        return max(self.last_id(owner) - margin, 0)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,497 @@
+"""
+Thread-safe mailbox storage for MessengerService.
+
+Every recipient hashes onto one of a fixed number of lock stripes, so concurrent operations on
+different mailboxes rarely contend, while operations on the same mailbox (and their write-ahead
+log records) are serialized. Single dict operations are atomic under the GIL, so the shared
+dicts only need the stripe lock for multi-step updates of one key.
+
+Messages pushed to a ReceiveStream are logged as in flight until the stream has written them, so a
+push is as durable as a queued message: whatever was still in flight when the server stopped is queued
+again on the next start.
+
+Delivered messages leave a tombstone, so anti-entropy never copies them back from a peer that still holds
+them. Tombstones are part of every snapshot, and with max_tombstones=None they are only forgotten through
+forget_tombstones(), once every peer has been seen without them (antientropy.AntiEntropy).
+
+Queued messages are kept serialized, without the dest_email every message of a mailbox shares,
+next to an array of their ids. Reads splice the bytes straight into the wire format of the
+response, so no SendRequest object lives longer than a single call.
+"""
+import sys
+import os
+import hashlib
+import threading
+import itertools
+from array import array
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_messenger"))
+try:
+    import messenger_pb2
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+import wal as wal_log
+from wal import WriteAheadLog
+
+
+DEFAULT_STRIPES = 64
+# Anti-entropy compares mailboxes per hash bucket of message keys
+DIGEST_BUCKETS = 64
+# Keys of delivered messages remembered per mailbox when no anti-entropy prunes them
+MAX_TOMBSTONES = 10_000
+DIGEST_MASK = (1 << 64) - 1
+
+
+def message_hash(id: int) -> int:
+    """64 bit hash of a message id, the same on every replica."""
+    key = (id & DIGEST_MASK).to_bytes(8, "little")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def signed_id(value: int) -> int:
+    """Inverse of id & DIGEST_MASK, for ids stored as unsigned 64 bit integers."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+# Wire format tags (field number << 3 | length delimited)
+MESSAGES_TAG = b"\x0a"    # InboxResponse.messages / FetchResponse.messages = 1
+DEST_EMAIL_TAG = b"\x22"  # SendRequest.dest_email = 4
+
+
+class Mailbox:
+    """Queued messages of one recipient: ids, and each message serialized without dest_email."""
+    __slots__ = ("dest_field", "ids", "payloads")
+
+    def __init__(self, email: str):
+        # Appending this to a payload restores the full SendRequest encoding
+        encoded_email = email.encode()
+        self.dest_field = DEST_EMAIL_TAG + encode_varint(len(encoded_email)) + encoded_email
+        self.ids = array("q")
+        self.payloads = []
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def append(self, message: messenger_pb2.SendRequest) -> None:
+        stripped = messenger_pb2.SendRequest()
+        stripped.CopyFrom(message)
+        stripped.ClearField("dest_email")
+        self.ids.append(message.id)
+        self.payloads.append(stripped.SerializeToString())
+
+    def trim(self, count: int) -> None:
+        del self.ids[:count]
+        del self.payloads[:count]
+
+    def full_message(self, index: int) -> bytes:
+        return self.payloads[index] + self.dest_field
+
+    def encode(self, start: int = 0, stop: int | None = None, indexes=None) -> bytes:
+        """Wire encoding of messages[start:stop] (or of the given indexes) as a repeated field 1."""
+        dest_field = self.dest_field
+        extra = len(dest_field)
+        payloads = self.payloads
+        selected = payloads[start:stop] if indexes is None else [payloads[i] for i in indexes]
+        return b"".join(
+            MESSAGES_TAG + encode_varint(len(payload) + extra) + payload + dest_field for payload in selected
+        )
+
+    def decode(self) -> list[messenger_pb2.SendRequest]:
+        return list(messenger_pb2.InboxResponse.FromString(self.encode()).messages)
+
+
+class MailboxStore:
+    def __init__(
+            self, wal: WriteAheadLog | None = None, wait_durable: bool = False,
+            stripes: int = DEFAULT_STRIPES, max_tombstones: int | None = MAX_TOMBSTONES
+        ):
+        # key=email, value=Mailbox
+        self._mailboxes = {}
+        # Cursor position of the first queued message of each mailbox
+        self._offsets = {}
+        # Open ReceiveStream subscriptions: key=email, value=[subscription per stream]
+        self._subscribers = {}
+        # Pushed to a stream but not written to it yet: key=email, value={id: serialized message}
+        self._in_flight = {}
+        # Sum (mod 2**64) of the message hashes in each bucket: key=email, value=[DIGEST_BUCKETS sums]
+        self._digests = {}
+        # Keys of delivered messages: key=email, value={id: burial sequence number}, in burial order
+        self._tombstones = {}
+        self._burials = itertools.count(1)
+        self.max_tombstones = max_tombstones
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+        self.wal = wal
+        self.wait_durable = wait_durable
+        if wal is not None:
+            for op, payload in wal.replay():
+                self._apply_record(op, payload)
+            self._requeue_in_flight()
+            wal.start(compactor=self.compact)
+
+    def _lock(self, email: str) -> threading.Lock:
+        return self._locks[hash(email) % len(self._locks)]
+
+    def _apply_record(self, op: int, payload: bytes) -> None:
+        if op == wal_log.OP_APPEND:
+            message = messenger_pb2.SendRequest.FromString(payload)
+            self._add(message.dest_email, [message])
+        elif op == wal_log.OP_TRIM:
+            email, count = wal_log.decode_email_count(payload)
+            self._trim(email, count, log=False)
+        elif op == wal_log.OP_OFFSET:
+            email, offset = wal_log.decode_email_count(payload)
+            self._offsets[email] = offset
+        elif op == wal_log.OP_PUSH:
+            message = messenger_pb2.SendRequest.FromString(payload)
+            self._in_flight.setdefault(message.dest_email, {})[message.id] = payload
+            self._bury(message.dest_email, [message.id])
+        elif op == wal_log.OP_DELIVERED:
+            email, id = wal_log.decode_email_count(payload)
+            self._settle(email, [signed_id(id)], log=False)
+        elif op == wal_log.OP_TOMBSTONE:
+            email, id = wal_log.decode_email_count(payload)
+            self._bury(email, [signed_id(id)])
+
+    def _requeue_in_flight(self) -> None:
+        """Queues the messages that were pushed to streams but never written to them before the server stopped."""
+        for email, pushed in list(self._in_flight.items()):
+            messages = [messenger_pb2.SendRequest.FromString(payload) for payload in pushed.values()]
+            self._settle(email, list(pushed))
+            self._enqueue(email, messages)
+
+    def _log(self, op: int, payload: bytes) -> int:
+        return self.wal.append(op, payload) if self.wal is not None else 0
+
+    def _commit(self, ticket: int) -> None:
+        if ticket and self.wait_durable:
+            self.wal.wait_durable(ticket)
+
+    def _update_digest(self, email: str, ids, sign: int) -> None:
+        digest = self._digests.get(email)
+        if digest is None:
+            digest = self._digests[email] = [0] * DIGEST_BUCKETS
+        for id in ids:
+            h = message_hash(id)
+            bucket = h % DIGEST_BUCKETS
+            digest[bucket] = (digest[bucket] + sign * h) & DIGEST_MASK
+        if not any(digest):
+            del self._digests[email]
+
+    def _bury(self, email: str, ids) -> None:
+        """Remembers delivered message ids. Must be called with the stripe lock held."""
+        tombstones = self._tombstones.setdefault(email, {})
+        for id in ids:
+            tombstones[id] = next(self._burials)
+        if self.max_tombstones is not None:
+            while len(tombstones) > self.max_tombstones:
+                del tombstones[next(iter(tombstones))]
+
+    def _add(self, email: str, messages: list) -> None:
+        """Appends messages to a mailbox without logging them. Must be called with the stripe lock held."""
+        if not messages:
+            return
+        mailbox = self._mailboxes.get(email)
+        if mailbox is None:
+            mailbox = self._mailboxes[email] = Mailbox(email)
+        for message in messages:
+            mailbox.append(message)
+        ids = [message.id for message in messages]
+        self._update_digest(email, ids, 1)
+        tombstones = self._tombstones.get(email)
+        if tombstones:
+            # Requeued after an interrupted stream, so not delivered after all
+            for id in ids:
+                tombstones.pop(id, None)
+
+    def _deliver(self, email: str, messages: list) -> int:
+        """Pushes to the open subscriptions of email, or queues. Must be called with the stripe lock held."""
+        subscriptions = self._subscribers.get(email)
+        if not subscriptions:
+            return self._enqueue(email, messages)
+        ticket = 0
+        for message in messages:
+            ticket = self._push(email, message.id, message.SerializeToString())
+            for subscription in subscriptions:
+                subscription.put(message)
+        self._bury(email, [message.id for message in messages])
+        return ticket
+
+    def _push(self, email: str, id: int, payload: bytes) -> int:
+        """Marks a message as in flight to the streams of email. Must be called with the stripe lock held."""
+        self._in_flight.setdefault(email, {})[id] = payload
+        return self._log(wal_log.OP_PUSH, payload)
+
+    def _settle(self, email: str, ids, log: bool = True) -> tuple[set, int]:
+        """
+            Ends the in flight state of pushed messages. Returns the ids that were still in flight, and the
+            ticket of the last log record. Must be called with the stripe lock held.
+        """
+        pushed = self._in_flight.get(email)
+        settled = set()
+        ticket = 0
+        if not pushed:
+            return settled, ticket
+        for id in ids:
+            if pushed.pop(id, None) is None:
+                continue
+            settled.add(id)
+            if log:
+                ticket = self._log(wal_log.OP_DELIVERED, wal_log.encode_email_count(email, id & DIGEST_MASK))
+        if not pushed:
+            del self._in_flight[email]
+        return settled, ticket
+
+    def _enqueue(self, email: str, messages: list) -> int:
+        """Appends messages to a mailbox. Must be called with the stripe lock held."""
+        ticket = 0
+        self._add(email, messages)
+        for message in messages:
+            ticket = self._log(wal_log.OP_APPEND, message.SerializeToString())
+        return ticket
+
+    def _trim(self, email: str, count: int, log: bool = True) -> int:
+        """Removes count messages from the head of a mailbox. Must be called with the stripe lock held."""
+        mailbox = self._mailboxes.get(email)
+        if count <= 0 or not mailbox:
+            return 0
+        removed = mailbox.ids[:count]
+        # Callers may still hold the drained mailbox, so a full drain detaches it instead of emptying it
+        if count >= len(mailbox):
+            del self._mailboxes[email]
+        else:
+            mailbox.trim(count)
+        self._update_digest(email, removed, -1)
+        self._bury(email, removed)
+        self._offsets[email] = self._offsets.get(email, 0) + count
+        return self._log(wal_log.OP_TRIM, wal_log.encode_email_count(email, count)) if log else 0
+
+    def append(self, email: str, message: messenger_pb2.SendRequest) -> bool:
+        """Delivers to the open subscriptions of email, or queues. Returns True if it was pushed."""
+        with self._lock(email):
+            pushed = bool(self._subscribers.get(email))
+            ticket = self._deliver(email, [message])
+        self._commit(ticket)
+        return pushed
+
+    def drain(self, email: str) -> messenger_pb2.InboxResponse:
+        """Removes the whole mailbox (swap on drain, it is detached, never copied) and returns it as a response."""
+        with self._lock(email):
+            mailbox = self._mailboxes.get(email)
+            ticket = self._trim(email, len(mailbox) if mailbox else 0)
+        self._commit(ticket)
+        # Encoded outside the lock, the detached mailbox is no longer shared
+        if not mailbox:
+            return messenger_pb2.InboxResponse()
+        return messenger_pb2.InboxResponse.FromString(mailbox.encode())
+
+    def fetch(self, email: str, cursor: int, limit: int, since_id: int = 0) -> messenger_pb2.FetchResponse:
+        """
+            Returns up to limit messages from cursor on, the next cursor, and whether more are queued.
+            Messages with an id up to since_id are skipped, but the cursor still moves past them; their ids are
+            listed in skipped_ids, so the client can make sure it has them before acknowledging the cursor.
+            Skipped messages count toward limit too, so a page never spans more than limit queued messages.
+        """
+        with self._lock(email):
+            mailbox = self._mailboxes.get(email)
+            offset = self._offsets.get(email, 0)
+            queued = len(mailbox) if mailbox else 0
+
+            # Cursors behind the mailbox start point to already acknowledged messages
+            start = max(cursor, offset) - offset
+            skipped = []
+            if not since_id:
+                stop = min(start + limit, queued)
+                encoded = mailbox.encode(start, stop) if mailbox and start < stop else b""
+            else:
+                indexes = []
+                stop = start
+                while stop < queued and stop - start < limit:
+                    if mailbox.ids[stop] > since_id:
+                        indexes.append(stop)
+                    else:
+                        skipped.append(mailbox.ids[stop])
+                    stop += 1
+                encoded = mailbox.encode(indexes=indexes) if indexes else b""
+
+        response = messenger_pb2.FetchResponse.FromString(encoded)
+        response.skipped_ids.extend(skipped)
+        response.next_cursor = offset + max(start, stop)
+        response.has_more = response.next_cursor < offset + queued
+        return response
+
+    def ack(self, email: str, cursor: int) -> int:
+        """Removes every message before cursor. Returns how many were removed."""
+        with self._lock(email):
+            offset = self._offsets.get(email, 0)
+            acknowledged = min(max(cursor - offset, 0), len(self._mailboxes.get(email, ())))
+            ticket = self._trim(email, acknowledged)
+        self._commit(ticket)
+        return acknowledged
+
+    def subscribe(self, email: str, subscription) -> list:
+        """
+            Registers a stream subscription (any object with a thread-safe put()) for email.
+            Returns the messages queued while the recipient was offline, moved from the mailbox to in flight.
+            The stream must report each message it writes with delivered().
+        """
+        with self._lock(email):
+            self._subscribers.setdefault(email, []).append(subscription)
+            pending = self._mailboxes.get(email)
+            ticket = 0
+            if pending:
+                # Logged before the trim, so a crash in between duplicates messages instead of losing them
+                for i in range(len(pending)):
+                    self._push(email, pending.ids[i], pending.full_message(i))
+                ticket = self._trim(email, len(pending))
+        self._commit(ticket)
+        return pending.decode() if pending else []
+
+    def delivered(self, email: str, ids) -> None:
+        """Pushed messages that a stream has written."""
+        with self._lock(email):
+            self._settle(email, ids)
+
+    def unsubscribe(self, email: str, subscription, undelivered: list) -> None:
+        """
+            Removes a stream subscription, requeueing whatever was pushed to it but never delivered,
+            unless another stream of the same mailbox delivered it meanwhile.
+        """
+        with self._lock(email):
+            subscriptions = self._subscribers[email]
+            subscriptions.remove(subscription)
+            if not subscriptions:
+                del self._subscribers[email]
+            settled, ticket = self._settle(email, [message.id for message in undelivered])
+            requeued = [message for message in undelivered if message.id in settled]
+            ticket = self._enqueue(email, requeued) or ticket
+        self._commit(ticket)
+
+    def messages(self, email: str) -> list[messenger_pb2.SendRequest]:
+        """Copy of the queued messages of email."""
+        with self._lock(email):
+            mailbox = self._mailboxes.get(email)
+            return mailbox.decode() if mailbox else []
+
+    def holds(self, email: str, id: int) -> bool:
+        """Whether message id is queued in the mailbox of email, or pushed to one of its streams and not written yet."""
+        with self._lock(email):
+            mailbox = self._mailboxes.get(email)
+            return bool(mailbox and id in mailbox.ids) or id in self._in_flight.get(email, ())
+
+    def depth(self, email: str) -> int:
+        """Number of queued messages of one mailbox. Unlocked, so only approximate under load."""
+        return len(self._mailboxes.get(email, ()))
+
+    def depths(self) -> dict[str, int]:
+        """Number of queued messages per mailbox. Unlocked, so only approximate under load."""
+        return {email: len(messages) for email, messages in list(self._mailboxes.items())}
+
+    def mailbox_digests(self) -> dict[str, int]:
+        """One 64 bit digest per non empty mailbox, equal on replicas holding the same messages."""
+        digests = {}
+        for email, buckets in list(self._digests.items()):
+            packed = b"".join(bucket.to_bytes(8, "little") for bucket in buckets)
+            digests[email] = int.from_bytes(hashlib.blake2b(packed, digest_size=8).digest(), "little")
+        return digests
+
+    def bucket_digests(self, email: str) -> list[int]:
+        with self._lock(email):
+            return list(self._digests.get(email, [0] * DIGEST_BUCKETS))
+
+    def messages_in_buckets(self, email: str, buckets: set[int]) -> messenger_pb2.InboxResponse:
+        with self._lock(email):
+            mailbox = self._mailboxes.get(email)
+            if not mailbox:
+                return messenger_pb2.InboxResponse()
+            indexes = [i for i, id in enumerate(mailbox.ids) if message_hash(id) % DIGEST_BUCKETS in buckets]
+            encoded = mailbox.encode(indexes=indexes)
+        return messenger_pb2.InboxResponse.FromString(encoded)
+
+    def merge(self, email: str, messages: list) -> int:
+        """
+            Delivers the messages of a peer replica that this one is missing, skipping those already queued
+            or delivered. Returns how many were added.
+        """
+        with self._lock(email):
+            known = set(self._tombstones.get(email, ()))
+            mailbox = self._mailboxes.get(email)
+            if mailbox:
+                known.update(mailbox.ids)
+            missing = []
+            for message in messages:
+                if message.id not in known:
+                    known.add(message.id)
+                    missing.append(message)
+            ticket = self._deliver(email, missing)
+        self._commit(ticket)
+        return len(missing)
+
+    def offset(self, email: str) -> int:
+        return self._offsets.get(email, 0)
+
+    def tombstone_mark(self) -> int:
+        """A point in time: every tombstone that exists now was buried before the returned mark."""
+        return next(self._burials)
+
+    def tombstoned(self, email: str, ids) -> set:
+        """The ids among ids that were delivered by this replica."""
+        with self._lock(email):
+            tombstones = self._tombstones.get(email, {})
+            return {id for id in ids if id in tombstones}
+
+    def tombstone_mailboxes(self) -> list[str]:
+        return list(self._tombstones)
+
+    def forget_tombstones(self, email: str, before: int) -> int:
+        """Drops the tombstones of email buried before the mark before. Returns how many were dropped."""
+        with self._lock(email):
+            tombstones = self._tombstones.get(email)
+            if not tombstones:
+                return 0
+            forgotten = [id for id, burial in tombstones.items() if burial < before]
+            for id in forgotten:
+                del tombstones[id]
+            if not tombstones:
+                del self._tombstones[email]
+            return len(forgotten)
+
+    def compact(self) -> None:
+        """Snapshots every mailbox into the log, dropping the records that led to it."""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            self.wal.compact(self._snapshot_records())
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+    def _snapshot_records(self):
+        for email, offset in self._offsets.items():
+            if offset:
+                yield wal_log.OP_OFFSET, wal_log.encode_email_count(email, offset)
+        for email, tombstones in self._tombstones.items():
+            for id in tombstones:
+                yield wal_log.OP_TOMBSTONE, wal_log.encode_email_count(email, id & DIGEST_MASK)
+        for mailbox in self._mailboxes.values():
+            for i in range(len(mailbox)):
+                yield wal_log.OP_APPEND, mailbox.full_message(i)
+        for pushed in self._in_flight.values():
+            for payload in pushed.values():
+                yield wal_log.OP_PUSH, payload
+
+    def close(self) -> None:
+        if self.wal is not None:
+            self.wal.close()
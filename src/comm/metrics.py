@@ -0,0 +1,402 @@
+"""
+Lightweight metrics for client and server: counters, gauges and histograms kept in a registry,
+read through pluggable exporters (Prometheus text over HTTP, or in-memory for tests), and gRPC
+interceptors that record RPC latency, errors and bytes in/out on both sides.
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import grpc
+import grpc.aio
+
+
+# Latency buckets in milliseconds
+DEFAULT_BUCKETS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        """(sample name, labels, value) for every exported series."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge(Metric):
+    """Gauge set explicitly, or computed at collection time by callback (returning {labels tuple: value})."""
+    kind = "gauge"
+
+    def __init__(
+            self, name: str, help: str, labelnames: tuple[str, ...] = (),
+            callback: Callable[[], dict[tuple, float]] | None = None
+        ):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.callback is not None:
+            items = list(self.callback().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+            self, name: str, help: str, labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+        ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+
+        samples = []
+        for key, series in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append((f"{self.name}_bucket", {**labels, "le": le}, cumulative))
+            samples.append((f"{self.name}_count", labels, cumulative))
+            samples.append((f"{self.name}_sum", labels, series[-1]))
+        return samples
+
+
+class Registry:
+    """Holds metrics by name. Asking twice for the same name returns the same metric."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = (), callback=None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, help, labelnames)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def metrics(self) -> list[Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+
+# Process wide default registry
+REGISTRY = Registry()
+
+
+# ---------------------------------------------------------------- Exporters
+
+class InMemoryExporter:
+    """Snapshots a registry into plain dicts, for tests and debugging."""
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.registry = registry
+
+    def collect(self) -> dict[str, list[tuple[dict, float]]]:
+        snapshot = {}
+        for metric in self.registry.metrics():
+            for name, labels, value in metric.samples():
+                snapshot.setdefault(name, []).append((labels, value))
+        return snapshot
+
+    def value(self, name: str, **labels) -> float | None:
+        for sample_labels, value in self.collect().get(name, []):
+            if all(sample_labels.get(k) == str(v) for k, v in labels.items()):
+                return value
+        return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(registry: Registry = REGISTRY) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in registry.metrics():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """Serves render_prometheus() on http://host:port/metrics from a background thread."""
+
+    def __init__(self, port: int, host: str = "localhost", registry: Registry = REGISTRY):
+        exporter_registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(exporter_registry).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self) -> "PrometheusExporter":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ---------------------------------------------------------------- gRPC interceptors
+
+def _method_name(full_method: str) -> str:
+    # "/messenger.MessengerService/Send" -> "Send"
+    return full_method.rsplit("/", 1)[-1]
+
+
+def _byte_size(message) -> int:
+    return message.ByteSize() if hasattr(message, "ByteSize") else 0
+
+
+class ClientMetrics:
+    def __init__(self, registry: Registry = REGISTRY):
+        self.latency = registry.histogram(
+            "client_rpc_latency_ms", "Client side RPC latency per replica", ("method", "replica"))
+        self.errors = registry.counter(
+            "client_rpc_errors_total", "Failed client RPCs per replica", ("method", "replica", "code"))
+        self.bytes_sent = registry.counter(
+            "client_bytes_sent_total", "Serialized request bytes per replica", ("method", "replica"))
+        self.bytes_received = registry.counter(
+            "client_bytes_received_total", "Serialized response bytes per replica", ("method", "replica"))
+
+
+class MetricsClientInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Records latency, errors and bytes of every unary call made on the channel to one replica."""
+
+    def __init__(self, replica: str, registry: Registry = REGISTRY):
+        self.replica = replica
+        self.metrics = ClientMetrics(registry)
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = _method_name(client_call_details.method)
+        self.metrics.bytes_sent.inc(_byte_size(request), method=method, replica=self.replica)
+        start = time.perf_counter()
+        call = continuation(client_call_details, request)
+        # Works for blocking calls (already done) and futures alike
+        call.add_done_callback(lambda future: self._record(method, start, future))
+        return call
+
+    def _record(self, method: str, start: float, future) -> None:
+        self.metrics.latency.observe((time.perf_counter() - start) * 1000, method=method, replica=self.replica)
+        code = future.code()
+        if code != grpc.StatusCode.OK:
+            self.metrics.errors.inc(method=method, replica=self.replica, code=code.name)
+            return
+        self.metrics.bytes_received.inc(_byte_size(future.result()), method=method, replica=self.replica)
+
+
+class ServerMetrics:
+    def __init__(self, registry: Registry = REGISTRY):
+        self.latency = registry.histogram(
+            "server_rpc_latency_ms", "Server side handling time per method", ("method",))
+        self.errors = registry.counter(
+            "server_rpc_errors_total", "RPCs that ended with an exception", ("method",))
+        self.bytes_received = registry.counter(
+            "server_bytes_received_total", "Serialized request bytes", ("method",))
+        self.bytes_sent = registry.counter(
+            "server_bytes_sent_total", "Serialized response bytes", ("method",))
+
+    def record(self, method: str, start: float, request, response=None, failed: bool = False) -> None:
+        self.latency.observe((time.perf_counter() - start) * 1000, method=method)
+        self.bytes_received.inc(_byte_size(request), method=method)
+        if failed:
+            self.errors.inc(method=method)
+        elif response is not None:
+            self.bytes_sent.inc(_byte_size(response), method=method)
+
+
+class MetricsServerInterceptor(grpc.ServerInterceptor):
+    """Wraps unary-unary and unary-stream handlers of the thread pool server."""
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.metrics = ServerMetrics(registry)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = _method_name(handler_call_details.method)
+
+        if handler.unary_unary is not None:
+            behavior = handler.unary_unary
+
+            def unary_unary(request, context):
+                start = time.perf_counter()
+                try:
+                    response = behavior(request, context)
+                except Exception:
+                    self.metrics.record(method, start, request, failed=True)
+                    raise
+                self.metrics.record(method, start, request, response)
+                return response
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary, handler.request_deserializer, handler.response_serializer)
+
+        if handler.unary_stream is not None:
+            behavior = handler.unary_stream
+
+            def unary_stream(request, context):
+                start = time.perf_counter()
+                failed = False
+                try:
+                    for response in behavior(request, context):
+                        self.metrics.bytes_sent.inc(_byte_size(response), method=method)
+                        yield response
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    # Also reached when the client cancels the stream
+                    self.metrics.record(method, start, request, failed=failed)
+
+            return grpc.unary_stream_rpc_method_handler(
+                unary_stream, handler.request_deserializer, handler.response_serializer)
+
+        return handler
+
+
+class AsyncMetricsServerInterceptor(grpc.aio.ServerInterceptor):
+    """Same as MetricsServerInterceptor for the grpc.aio server."""
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.metrics = ServerMetrics(registry)
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = _method_name(handler_call_details.method)
+
+        if handler.unary_unary is not None:
+            behavior = handler.unary_unary
+
+            async def unary_unary(request, context):
+                start = time.perf_counter()
+                try:
+                    response = await behavior(request, context)
+                except Exception:
+                    self.metrics.record(method, start, request, failed=True)
+                    raise
+                self.metrics.record(method, start, request, response)
+                return response
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary, handler.request_deserializer, handler.response_serializer)
+
+        if handler.unary_stream is not None:
+            behavior = handler.unary_stream
+
+            async def unary_stream(request, context):
+                start = time.perf_counter()
+                failed = False
+                try:
+                    async for response in behavior(request, context):
+                        self.metrics.bytes_sent.inc(_byte_size(response), method=method)
+                        yield response
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    # Also reached when the client cancels the stream
+                    self.metrics.record(method, start, request, failed=failed)
+
+            return grpc.unary_stream_rpc_method_handler(
+                unary_stream, handler.request_deserializer, handler.response_serializer)
+
+        return handler
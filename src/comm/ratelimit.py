@@ -0,0 +1,251 @@
+"""
+Server-side admission control for writes.
+
+Every sender (self_email) gets a token bucket refilled at rate messages per second, holding at most burst
+tokens, and every mailbox is capped at max_mailbox_messages queued messages. Both are enforced by a server
+interceptor on Send and SendBatch, before the service touches the store. A rejected call ends with
+RESOURCE_EXHAUSTED, and its trailing metadata says how long to wait (RETRY_AFTER_METADATA) and which sender or
+mailbox hit the limit (LIMITED_KEY_METADATA). The client backs off that key on that replica until then
+(health.HealthTracker.throttle) instead of retrying right away. Replicated writes from a leader are not limited.
+
+The thread pool server also caps its open ReceiveStream calls (StreamLimitInterceptor), since each one holds
+a worker thread for as long as it lives. Streams over the cap are rejected the same way, keyed by recipient.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import grpc
+import grpc.aio
+
+import metrics
+
+
+RETRY_AFTER_METADATA = "retry-after-ms"
+# Binary metadata, since emails are not guaranteed to be printable ASCII
+LIMITED_KEY_METADATA = "rate-limit-key-bin"
+
+MAILBOX_FULL_RETRY_AFTER = 5  # seconds, a full mailbox only drains when its recipient reads it
+STREAM_RETRY_AFTER = 30  # seconds before a rejected ReceiveStream is opened again
+SWEEP_INTERVAL = 60  # seconds between removals of idle buckets
+LIMITED_METHODS = frozenset({"Send", "SendBatch"})
+
+REJECTED = metrics.REGISTRY.counter(
+    "server_rate_limited_total", "Writes rejected by admission control", ("reason",))
+
+
+@dataclass
+class RateLimits:
+    """0 disables a limit."""
+    rate: float = 0  # messages per second per sender
+    burst: int = 0  # tokens per sender bucket, at least 1 when rate is set
+    max_mailbox_messages: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 or self.max_mailbox_messages > 0
+
+
+@dataclass
+class Rejection:
+    key: str
+    retry_after: float  # seconds
+    reason: str
+    details: str
+
+    def trailing_metadata(self) -> tuple[tuple[str, str | bytes], ...]:
+        return (
+            (RETRY_AFTER_METADATA, str(max(int(self.retry_after * 1000), 1))),
+            (LIMITED_KEY_METADATA, self.key.encode("utf-8")),
+        )
+
+
+class RateLimiter:
+    """Token buckets keyed by sender. Buckets that have been idle long enough to refill completely are dropped."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.clock = clock
+
+        self._buckets = {}  # key -> [tokens, last refill time]
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, tokens: int = 1) -> float:
+        """
+            Takes tokens from the bucket of key. Returns 0 when allowed, otherwise the seconds to wait.
+            Requests larger than the burst are allowed once the bucket is full, leaving it in debt.
+        """
+        rejected = self.acquire_all({key: tokens})
+        return rejected[1] if rejected else 0.0
+
+    def acquire_all(self, tokens: dict[str, int]) -> tuple[str, float] | None:
+        """
+            Takes tokens[key] from the bucket of every key, or nothing at all. Returns None when allowed,
+            otherwise the first key short of tokens and the seconds to wait for it.
+        """
+        with self._lock:
+            now = self.clock()
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._sweep(now)
+
+            buckets = []
+            for key, count in tokens.items():
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [float(self.burst), now]
+                else:
+                    bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                    bucket[1] = now
+
+                needed = min(count, self.burst)
+                if bucket[0] < needed:
+                    return key, (needed - bucket[0]) / self.rate
+                buckets.append((bucket, count))
+
+            for bucket, count in buckets:
+                bucket[0] -= count
+            return None
+
+    def _sweep(self, now: float) -> None:
+        """Must be called with the lock held."""
+        full_after = self.burst / self.rate
+        for key in [k for k, (tokens, last) in self._buckets.items() if now - last >= full_after]:
+            del self._buckets[key]
+        self._last_sweep = now
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionControl:
+    """Checks a write against the sender rate limits and the mailbox caps."""
+
+    def __init__(self, limits: RateLimits, depth: Callable[[str], int], clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self.depth = depth
+        self.senders = RateLimiter(limits.rate, limits.burst, clock) if limits.rate > 0 else None
+
+    def check(self, messages) -> Rejection | None:
+        """Returns why the messages must be rejected, or None once their tokens were taken."""
+        senders = {}
+        recipients = {}
+        for message in messages:
+            senders[message.self_email] = senders.get(message.self_email, 0) + 1
+            recipients[message.dest_email] = recipients.get(message.dest_email, 0) + 1
+
+        # Checked concurrently with other writes, so a mailbox may overshoot its cap by a few messages
+        cap = self.limits.max_mailbox_messages
+        if cap:
+            for email, count in recipients.items():
+                if self.depth(email) + count > cap:
+                    REJECTED.inc(reason="mailbox_full")
+                    return Rejection(
+                        email, MAILBOX_FULL_RETRY_AFTER, "mailbox_full", f"Mailbox of {email} is full ({cap} messages)"
+                    )
+
+        if self.senders is not None:
+            # All or nothing, so a batch refused for one sender costs the others no tokens
+            rejected = self.senders.acquire_all(senders)
+            if rejected:
+                email, wait = rejected
+                REJECTED.inc(reason="sender_rate")
+                return Rejection(
+                    email, wait, "sender_rate", f"{email} exceeded {self.limits.rate:g} messages per second"
+                )
+        return None
+
+
+def _request_messages(method: str, request):
+    return request.messages if method == "SendBatch" else (request,)
+
+
+class RateLimitInterceptor(grpc.ServerInterceptor):
+    """Applies AdmissionControl to the writes of the thread pool server."""
+
+    def __init__(self, admission: AdmissionControl):
+        self.admission = admission
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        if handler is None or method not in LIMITED_METHODS:
+            return handler
+        behavior = handler.unary_unary
+
+        def limited(request, context):
+            rejection = self.admission.check(_request_messages(method, request))
+            if rejection is not None:
+                context.set_trailing_metadata(rejection.trailing_metadata())
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, rejection.details)
+            return behavior(request, context)
+
+        return grpc.unary_unary_rpc_method_handler(limited, handler.request_deserializer, handler.response_serializer)
+
+
+class AsyncRateLimitInterceptor(grpc.aio.ServerInterceptor):
+    """Same as RateLimitInterceptor for the grpc.aio server."""
+
+    def __init__(self, admission: AdmissionControl):
+        self.admission = admission
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        if handler is None or method not in LIMITED_METHODS:
+            return handler
+        behavior = handler.unary_unary
+
+        async def limited(request, context):
+            rejection = self.admission.check(_request_messages(method, request))
+            if rejection is not None:
+                await context.abort(
+                    grpc.StatusCode.RESOURCE_EXHAUSTED, rejection.details,
+                    trailing_metadata=rejection.trailing_metadata()
+                )
+            return await behavior(request, context)
+
+        return grpc.unary_unary_rpc_method_handler(limited, handler.request_deserializer, handler.response_serializer)
+
+
+class StreamLimitInterceptor(grpc.ServerInterceptor):
+    """Rejects ReceiveStream calls of the thread pool server past max_streams open ones."""
+
+    def __init__(self, max_streams: int):
+        self.max_streams = max_streams
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self.open >= self.max_streams:
+                return False
+            self.open += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self.open -= 1
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.endswith("/ReceiveStream"):
+            return handler
+        behavior = handler.unary_stream
+
+        def limited(request, context):
+            if not self._acquire():
+                REJECTED.inc(reason="streams")
+                rejection = Rejection(
+                    request.self_email, STREAM_RETRY_AFTER, "streams", f"Over {self.max_streams} open streams"
+                )
+                context.set_trailing_metadata(rejection.trailing_metadata())
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, rejection.details)
+            try:
+                yield from behavior(request, context)
+            finally:
+                self._release()
+
+        return grpc.unary_stream_rpc_method_handler(limited, handler.request_deserializer, handler.response_serializer)
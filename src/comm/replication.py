@@ -0,0 +1,213 @@
+"""
+Server to server replication.
+
+A leader (a server started with --peers) forwards every write it accepts from clients to each follower over
+one long lived Replicate stream per peer, so clients only need to write to the leader. Writes are grouped into
+batches of up to max_batch messages, or whatever arrived within window seconds. Up to max_in_flight batches
+are sent before their acknowledgements come back (pipelining). Unacknowledged batches are resent after a
+reconnect, and followers skip the sequences they already applied, so each message is applied once. A follower
+also skips messages a client already wrote to it directly (server.RecentIds).
+
+At most max_pending messages wait for a follower that is down or slow; past that the oldest are dropped, and
+anti-entropy (antientropy.py) repairs the follower once it is back.
+
+Replication is asynchronous: the leader answers the client as soon as the write is queued locally.
+"""
+import sys
+import os
+import uuid
+import logging
+import threading
+
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_messenger"))
+try:
+    import messenger_pb2
+    import messenger_pb2_grpc
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+import metrics
+
+
+DEFAULT_MAX_BATCH = 100
+DEFAULT_WINDOW = 0.005  # seconds
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_PENDING = 100_000  # messages waiting to be batched, per follower
+RECONNECT_DELAY = 1  # seconds
+
+DROPPED_MESSAGES = metrics.REGISTRY.counter(
+    "server_replication_dropped_total", "Messages never sent to a follower because its queue was full", ("peer",))
+
+
+def format_peer_address(addr: str) -> str:
+    """IPv6 peers need brackets around the IP part, e.g. [::1]:50051."""
+    if '[' in addr or addr.count(':') <= 1:
+        return addr
+    ip, port = addr.rsplit(':', 1)
+    return f'[{ip}]:{port}'
+
+
+class PeerLink:
+    """Replication stream from this leader to a single follower, reopened whenever it breaks."""
+
+    def __init__(
+            self, address: str, leader_id: str,
+            max_batch: int = DEFAULT_MAX_BATCH, window: float = DEFAULT_WINDOW,
+            max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_pending: int = DEFAULT_MAX_PENDING
+        ):
+        self.address = address
+        self.leader_id = leader_id
+        self.max_batch = max_batch
+        self.window = window
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+
+        self._pending = []  # Messages not batched yet
+        self._unacked = {}  # sequence -> ReplicateBatch sent but not acknowledged, in sequence order
+        self._sequence = 0
+        self._cond = threading.Condition()
+        self._call = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def enqueue(self, messages: list[messenger_pb2.SendRequest]) -> None:
+        with self._cond:
+            self._pending.extend(messages)
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+            self._cond.notify_all()
+        if overflow > 0:
+            DROPPED_MESSAGES.inc(overflow, peer=self.address)
+            logging.warning("Replication queue of %s is full, dropped %d message(s)", self.address, overflow)
+
+    def lag(self) -> int:
+        """Messages accepted by the leader that the follower has not acknowledged yet."""
+        with self._cond:
+            return len(self._pending) + sum(len(batch.messages) for batch in self._unacked.values())
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Blocks until every enqueued message was acknowledged. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._unacked, timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            call = self._call
+            self._cond.notify_all()
+        if call is not None:
+            call.cancel()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self) -> None:
+        channel = grpc.insecure_channel(format_peer_address(self.address))
+        stub = messenger_pb2_grpc.MessengerServiceStub(channel)
+
+        while not self._closed:
+            stream_done = threading.Event()
+            call = stub.Replicate(self._batches(stream_done))
+            with self._cond:
+                self._call = call
+            # Close the race with a close() issued before the call was registered
+            if self._closed:
+                call.cancel()
+
+            try:
+                for ack in call:
+                    self._acknowledge(ack.sequence)
+            except grpc.RpcError as e:
+                if not self._closed:
+                    logging.warning("Replication to %s interrupted: %s", self.address, e.code())
+            finally:
+                with self._cond:
+                    stream_done.set()
+                    self._call = None
+                    self._cond.notify_all()
+
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed, timeout=RECONNECT_DELAY)
+
+        channel.close()
+
+    def _acknowledge(self, sequence: int) -> None:
+        with self._cond:
+            for acknowledged in [s for s in self._unacked if s <= sequence]:
+                del self._unacked[acknowledged]
+            self._cond.notify_all()
+
+    def _batches(self, stream_done: threading.Event):
+        """Request iterator of one stream: the batches left unacknowledged by the previous stream, then new ones."""
+        with self._cond:
+            resend = list(self._unacked.values())
+        yield from resend
+
+        def stopped() -> bool:
+            return self._closed or stream_done.is_set()
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: stopped() or (self._pending and len(self._unacked) < self.max_in_flight)
+                )
+                if stopped():
+                    return
+                if len(self._pending) < self.max_batch:
+                    # Give concurrent writers a chance to join this batch
+                    self._cond.wait_for(lambda: stopped() or len(self._pending) >= self.max_batch, self.window)
+                    if stopped():
+                        return
+
+                messages = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self._sequence += 1
+                batch = messenger_pb2.ReplicateBatch(
+                    leader_id=self.leader_id, sequence=self._sequence, messages=messages
+                )
+                self._unacked[self._sequence] = batch
+            yield batch
+
+
+class Replicator:
+    """Leader side of replication: one PeerLink per follower address."""
+
+    def __init__(
+            self, peers: list[str],
+            max_batch: int = DEFAULT_MAX_BATCH, window: float = DEFAULT_WINDOW,
+            max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, registry: metrics.Registry = metrics.REGISTRY,
+            max_pending: int = DEFAULT_MAX_PENDING
+        ):
+        # Followers remember the last sequence applied per leader, and sequences restart with the process
+        self.leader_id = uuid.uuid4().hex
+        self.links = [
+            PeerLink(peer, self.leader_id, max_batch, window, max_in_flight, max_pending) for peer in peers
+        ]
+
+        registry.gauge(
+            "server_replication_lag_messages", "Messages not yet acknowledged per follower", ("peer",),
+            callback=lambda: {(link.address,): link.lag() for link in self.links}
+        )
+
+    def start(self) -> "Replicator":
+        for link in self.links:
+            link.start()
+        return self
+
+    def replicate(self, messages: list[messenger_pb2.SendRequest]) -> None:
+        for link in self.links:
+            link.enqueue(messages)
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        return all(link.wait_idle(timeout) for link in self.links)
+
+    def close(self) -> None:
+        for link in self.links:
+            link.close()
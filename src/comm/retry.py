@@ -0,0 +1,101 @@
+"""
+Client-side retries and hedged requests.
+
+RetryPolicy retries failed calls with a retryable status after an exponentially growing delay with full jitter
+(a random delay between 0 and the backoff), so clients that failed together do not retry together. Retries are
+only safe for idempotent calls: Send and SendBatch carry a globally unique message id, and the server drops ids
+it has seen recently (server.RecentIds), so a retried write is queued once even if the first attempt landed.
+
+A RetryBudget caps retries across all calls, as gRPC's retry throttling does: every failure takes a token,
+every success gives back token_ratio of one, and retries stop while fewer than half the tokens are left. When a
+replica goes down, retries therefore fade out instead of multiplying the load.
+
+HedgePolicy is for reads: when a replica has not answered within its own latency quantile (p95 by default),
+the same read is sent to a spare replica and the first answer wins. At most max_ratio of the reads are hedged.
+"""
+import random
+import threading
+from dataclasses import dataclass, field
+
+import grpc
+
+
+DEFAULT_RETRYABLE_CODES = frozenset({grpc.StatusCode.UNAVAILABLE})
+
+
+class RetryBudget:
+    """Token bucket shared by every call of a policy."""
+
+    def __init__(self, max_tokens: float = 10, token_ratio: float = 0.1):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.token_ratio)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.tokens = max(0.0, self.tokens - 1)
+
+    def allow_retry(self) -> bool:
+        with self._lock:
+            return self.tokens > self.max_tokens / 2
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3  # including the first one
+    base_delay: float = 0.05  # seconds
+    max_delay: float = 1.0  # seconds
+    multiplier: float = 2.0
+    retryable_codes: frozenset = DEFAULT_RETRYABLE_CODES
+    budget: RetryBudget | None = field(default_factory=RetryBudget)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before attempt + 1, full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1)))
+
+    def record(self, error: grpc.RpcError | None) -> None:
+        """Feeds the outcome of one attempt to the budget."""
+        if self.budget is None:
+            return
+        if error is None:
+            self.budget.record_success()
+        elif error.code() in self.retryable_codes:
+            self.budget.record_failure()
+
+    def should_retry(self, error: grpc.RpcError, attempt: int) -> bool:
+        if attempt >= self.max_attempts or error.code() not in self.retryable_codes:
+            return False
+        return self.budget is None or self.budget.allow_retry()
+
+
+class HedgePolicy:
+    """When to hedge a read, and how many reads may be hedged."""
+
+    def __init__(self, quantile: float = 0.95, min_samples: int = 20, max_ratio: float = 0.1):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self._reads = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+
+    def record_read(self) -> None:
+        with self._lock:
+            self._reads += 1
+            if self._reads >= 1000:
+                # Forget old traffic, so a burst of hedges long ago does not matter
+                self._reads //= 2
+                self._hedges //= 2
+
+    def try_hedge(self) -> bool:
+        """Takes one hedge from the budget, if there is one left."""
+        with self._lock:
+            if self._hedges + 1 > self.max_ratio * max(self._reads, 1 / self.max_ratio):
+                return False
+            self._hedges += 1
+            return True
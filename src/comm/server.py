@@ -3,8 +3,11 @@ import sys
 import os
 
 import grpc
+import grpc.aio
+import asyncio
+import queue
+import threading
 from concurrent import futures
-from collections import defaultdict
 import argparse
 
 
@@ -17,6 +20,20 @@ except ImportError as e:
     print(f"Debug: sys.path is currently: {sys.path}")
     sys.exit(1)
     
+import wal as wal_log
+from wal import WriteAheadLog
+from mailbox_store import MailboxStore, MAX_TOMBSTONES
+from replication import Replicator
+from antientropy import AntiEntropy
+import antientropy
+from codec import MessageCodec
+import codec as message_codec
+from blob_store import BlobStore, BlobTooLargeError, DigestMismatchError
+import blob_store
+from ratelimit import (
+    RateLimits, AdmissionControl, RateLimitInterceptor, AsyncRateLimitInterceptor, StreamLimitInterceptor
+)
+import metrics
     
 
 import logging
@@ -24,58 +41,422 @@ logging.basicConfig(level=logging.INFO)
 
 
 const_max_workers = 10
+# Every open ReceiveStream holds a worker of the thread pool server, on top of const_max_workers
+DEFAULT_MAX_STREAMS = 100
+STREAM_POLL_INTERVAL = 1  # seconds
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+IDEMPOTENCY_WINDOW = 100_000  # latest message ids remembered to drop retried writes
+
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+# Clients send keepalive pings even on idle connections (client.ClientConfig), which the server must accept
+SERVER_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_recv_ping_interval_without_data_ms", 10_000),
+    ("grpc.http2.max_ping_strikes", 0),
+    ("grpc.max_send_message_length", MAX_MESSAGE_BYTES),
+    ("grpc.max_receive_message_length", MAX_MESSAGE_BYTES),
+]
+
 
 def extract_receive_request(request:messenger_pb2.ReceiveRequest) -> str:
     return request.self_email
 
+def extract_fetch_request(request:messenger_pb2.FetchRequest) -> tuple[str, int, int, int]:
+    limit = request.limit or DEFAULT_PAGE_SIZE
+    return request.self_email, request.cursor, min(limit, MAX_PAGE_SIZE), request.since_id
+
+def extract_ack_request(request:messenger_pb2.AckRequest) -> tuple[str, int]:
+    return request.self_email, request.cursor
+
+def upload_error_code(error: Exception) -> grpc.StatusCode:
+    if isinstance(error, DigestMismatchError):
+        return grpc.StatusCode.DATA_LOSS
+    return grpc.StatusCode.INVALID_ARGUMENT
+
 def extract_send_request(
         request:messenger_pb2.SendRequest
     ) -> tuple[int, str, str, str]:
     return request.id, request.msg, request.self_email, request.dest_email
+
+
+class RecentIds:
+    """
+        The latest capacity message ids accepted from clients. A client retries a write whose answer it did not
+        get (client.RETRY), and the id tells whether the first attempt was queued after all. Like every other
+        layer, this takes ids as globally unique (client.SnowflakeIdGenerator, one node id per client).
+        A known id is only a duplicate while its message is still held (MessengerService.is_duplicate).
+    """
+    
+    def __init__(self, capacity: int = IDEMPOTENCY_WINDOW):
+        self.capacity = capacity
+        self._ids = {}  # insertion ordered, oldest first
+        self._lock = threading.Lock()
+
+    def add(self, id: int) -> bool:
+        """Remembers id. Returns False if it was already known. Id 0 (no id) is never a duplicate."""
+        if not id or not self.capacity:
+            return True
+        with self._lock:
+            if id in self._ids:
+                return False
+            self._ids[id] = None
+            if len(self._ids) > self.capacity:
+                del self._ids[next(iter(self._ids))]
+            return True
+
+    def __len__(self) -> int:
+        return len(self._ids)
     
     
 class MessengerService(messenger_pb2_grpc.MessengerServiceServicer):
-    def __init__(self):
-        # Simple in-memory storage: key="ip:port", value=[list of messages]
-        self.mailboxes = defaultdict(list)
+    def __init__(
+            self, store: MailboxStore | None = None, registry: metrics.Registry = metrics.REGISTRY,
+            replicator: Replicator | None = None, anti_entropy: AntiEntropy | None = None,
+            codec: MessageCodec | None = None, blobs: BlobStore | None = None,
+            idempotency_window: int = IDEMPOTENCY_WINDOW
+        ):
+        # Thread-safe mailboxes, persisted when the store has a write-ahead log
+        self.store = store if store is not None else MailboxStore()
+        # Attachment contents, referenced from messages by digest
+        self.blobs = blobs if blobs is not None else BlobStore()
+        # Compresses long texts that clients sent uncompressed, before they are queued
+        self.codec = codec
+        # Ids of the latest writes, so retried ones are only queued once
+        self.recent_ids = RecentIds(idempotency_window)
+        
+        # Leader: forwards the writes accepted from clients to the followers
+        self.replicator = replicator
+        # Follower: last batch sequence applied per leader
+        self._replicated = {}
+        self._replication_lock = threading.Lock()
+        # Pulls missing messages from the other replicas in the background
+        self.anti_entropy = anti_entropy
+        
+        # Queue depths are computed when the metrics are collected, never on the hot path
+        registry.gauge(
+            "server_mailbox_depth", "Queued messages per mailbox", ("mailbox",),
+            callback=lambda: {(email,): depth for email, depth in self.store.depths().items()}
+        )
+        registry.gauge(
+            "server_queued_messages", "Queued messages across all mailboxes",
+            callback=lambda: {(): sum(self.store.depths().values())}
+        )
+
+    def is_duplicate(self, message: messenger_pb2.SendRequest) -> bool:
+        """
+            Whether message is a retry of a write still queued here. A message written before but acknowledged since
+            is queued again: it is a mailbox moving back to this server (sharding.migrate), not a retry.
+        """
+        if self.recent_ids.add(message.id):
+            return False
+        return self.store.holds(message.dest_email, message.id)
 
     def Send(self, request, context):
         id, msg, self_email, dest_email = extract_send_request(request)
         recipient_id = dest_email
+        if self.is_duplicate(request):
+            logging.debug("Ignored retried message %d", id)
+            return messenger_pb2.SendResponse(success=True, debug_message="Duplicate ignored.")
+        if self.codec is not None:
+            self.codec.encode(request)
         
-        # Persist to a database in real application
-        self.mailboxes[recipient_id].append(request)
+        # Pushed straight to the connected recipient, or queued
+        self.store.append(recipient_id, request)
+        if self.replicator is not None:
+            self.replicator.replicate([request])
         
-        print(f"Received from: {self_email}, to: {dest_email}, msg: {request}")
+        logging.debug("Received from: %s, to: %s, msg: %s", self_email, dest_email, request)
         return messenger_pb2.SendResponse(
             success=True, debug_message="Message queued."
         )
 
+    def SendBatch(self, request, context):
+        results = []
+        accepted = []
+        for message in request.messages:
+            if self.is_duplicate(message):
+                results.append(messenger_pb2.SendResponse(success=True, debug_message="Duplicate ignored."))
+                continue
+            if self.codec is not None:
+                self.codec.encode(message)
+            self.store.append(message.dest_email, message)
+            accepted.append(message)
+            results.append(messenger_pb2.SendResponse(success=True, debug_message="Message queued."))
+        if self.replicator is not None and accepted:
+            self.replicator.replicate(accepted)
+        
+        logging.debug("Received batch of %d message(s)", len(request.messages))
+        return messenger_pb2.SendBatchResponse(results=results)
+
     def ReceiveAll(self, request, context):
         self_email = extract_receive_request(request)
-        messages = self.mailboxes.get(self_email, [])
+        inbox = self.store.drain(self_email)
+        
+        logging.debug("Sent: %s", inbox)
+        return inbox
+
+    def ReceiveStream(self, request, context):
+        self_email = extract_receive_request(request)
+        subscription = queue.Queue()
+        pending = self.store.subscribe(self_email, subscription)
+        
+        # Wake the stream up as soon as the client goes away
+        context.add_callback(lambda: subscription.put(None))
         
-        print(f"Sent: {messages}")
-        # Pop list from dictionary table
-        if self_email in self.mailboxes:
-            del self.mailboxes[self_email]
+        try:
+            # Deliver what was queued while the recipient was offline
+            for message in pending:
+                yield message
+                self.store.delivered(self_email, (message.id,))
             
-        return messenger_pb2.InboxResponse(messages=messages)
+            while context.is_active():
+                try:
+                    message = subscription.get(timeout=STREAM_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if message is None:
+                    break
+                yield message
+                self.store.delivered(self_email, (message.id,))
+        finally:
+            # Only those still in flight are queued again
+            undelivered = list(pending)
+            while True:
+                try:
+                    message = subscription.get_nowait()
+                except queue.Empty:
+                    break
+                if message is not None:
+                    undelivered.append(message)
+            self.store.unsubscribe(self_email, subscription, undelivered)
+
+    def Fetch(self, request, context):
+        self_email, cursor, limit, since_id = extract_fetch_request(request)
+        return self.store.fetch(self_email, cursor, limit, since_id)
+
+    def Ack(self, request, context):
+        self_email, cursor = extract_ack_request(request)
+        acknowledged = self.store.ack(self_email, cursor)
+        
+        return messenger_pb2.AckResponse(
+            success=True, debug_message=f"{acknowledged} message(s) acknowledged."
+        )
+
+    def apply_replicated(self, batch: messenger_pb2.ReplicateBatch) -> messenger_pb2.ReplicateAck:
+        """
+            Queues a batch forwarded by a leader, unless it was already applied before a reconnect. Messages a
+            client also wrote here directly (send_messages writes to every replica) are only queued once.
+        """
+        with self._replication_lock:
+            if batch.sequence > self._replicated.get(batch.leader_id, 0):
+                for message in batch.messages:
+                    if not self.is_duplicate(message):
+                        self.store.append(message.dest_email, message)
+                self._replicated[batch.leader_id] = batch.sequence
+        
+        logging.debug("Replicated batch %d of %d message(s)", batch.sequence, len(batch.messages))
+        return messenger_pb2.ReplicateAck(sequence=batch.sequence)
+
+    def Replicate(self, request_iterator, context):
+        for batch in request_iterator:
+            yield self.apply_replicated(batch)
+
+    def Digest(self, request, context):
+        if request.mailbox:
+            return messenger_pb2.DigestResponse(buckets=self.store.bucket_digests(request.mailbox))
+        return messenger_pb2.DigestResponse(mailboxes=self.store.mailbox_digests())
+
+    def Pull(self, request, context):
+        return self.store.messages_in_buckets(request.mailbox, set(request.buckets))
 
+    def Upload(self, request_iterator, context):
+        try:
+            with self.blobs.writer() as writer:
+                expected = ""
+                for chunk in request_iterator:
+                    if chunk.sha256:
+                        expected = chunk.sha256
+                        if self.blobs.has(expected):
+                            # Same content uploaded before, possibly for another recipient: skip the rest
+                            return messenger_pb2.UploadResponse(
+                                sha256=expected, size=self.blobs.size(expected), existed=True
+                            )
+                    writer.write(chunk.data)
+                digest = writer.commit(expected)
+        except (BlobTooLargeError, DigestMismatchError) as e:
+            context.abort(upload_error_code(e), str(e))
+        
+        logging.debug("Stored attachment %s (%d bytes)", digest, writer.size)
+        return messenger_pb2.UploadResponse(sha256=digest, size=writer.size)
+
+    def Download(self, request, context):
+        if not self.blobs.has(request.sha256):
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown attachment {request.sha256}")
+        for data in self.blobs.read_chunks(request.sha256, request.offset):
+            yield messenger_pb2.DownloadChunk(data=data)
+
+    def close(self) -> None:
+        if self.anti_entropy is not None:
+            self.anti_entropy.stop()
+        if self.replicator is not None:
+            self.replicator.close()
+        self.store.close()
+
+
+class AsyncSubscription:
+    """Stream subscription backed by an asyncio.Queue, fed safely from any thread."""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, message) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    def drain(self) -> list:
+        undelivered = []
+        while not self.queue.empty():
+            undelivered.append(self.queue.get_nowait())
+        return undelivered
 
 
-def serve_syncronous_server(ip:str, port:int):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=const_max_workers))
-    messenger_pb2_grpc.add_MessengerServiceServicer_to_server(MessengerService(), server)
+class AsyncMessengerService(messenger_pb2_grpc.MessengerServiceServicer):
+    """
+        grpc.aio front end for MessengerService. Mailbox operations only hold the service lock briefly,
+        so they run inline on the event loop, unless they have to wait for the write-ahead log.
+    """
     
+    def __init__(self, service: MessengerService):
+        self.service = service
+
+    async def _call(self, func, *args):
+        if self.service.store.wait_durable:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def Send(self, request, context):
+        return await self._call(self.service.Send, request, context)
+
+    async def SendBatch(self, request, context):
+        return await self._call(self.service.SendBatch, request, context)
+
+    async def ReceiveAll(self, request, context):
+        return await self._call(self.service.ReceiveAll, request, context)
+
+    async def ReceiveStream(self, request, context):
+        self_email = extract_receive_request(request)
+        subscription = AsyncSubscription(asyncio.get_running_loop())
+        pending = await self._call(self.service.store.subscribe, self_email, subscription)
+        
+        try:
+            # Deliver what was queued while the recipient was offline
+            for message in pending:
+                yield message
+                self.service.store.delivered(self_email, (message.id,))
+            
+            # The handler is cancelled when the client goes away
+            while True:
+                message = await subscription.queue.get()
+                yield message
+                self.service.store.delivered(self_email, (message.id,))
+        finally:
+            # Only those still in flight are queued again
+            self.service.store.unsubscribe(self_email, subscription, pending + subscription.drain())
+
+    async def Fetch(self, request, context):
+        return self.service.Fetch(request, context)
+
+    async def Ack(self, request, context):
+        return await self._call(self.service.Ack, request, context)
+
+    async def Digest(self, request, context):
+        return self.service.Digest(request, context)
+
+    async def Pull(self, request, context):
+        return self.service.Pull(request, context)
+
+    async def Replicate(self, request_iterator, context):
+        async for batch in request_iterator:
+            yield await self._call(self.service.apply_replicated, batch)
+
+    async def Upload(self, request_iterator, context):
+        # File operations run on worker threads, so a slow disk never stalls the event loop
+        blobs = self.service.blobs
+        try:
+            with blobs.writer() as writer:
+                expected = ""
+                async for chunk in request_iterator:
+                    if chunk.sha256:
+                        expected = chunk.sha256
+                        if blobs.has(expected):
+                            return messenger_pb2.UploadResponse(sha256=expected, size=blobs.size(expected), existed=True)
+                    await asyncio.to_thread(writer.write, chunk.data)
+                digest = await asyncio.to_thread(writer.commit, expected)
+        except (BlobTooLargeError, DigestMismatchError) as e:
+            await context.abort(upload_error_code(e), str(e))
+        return messenger_pb2.UploadResponse(sha256=digest, size=writer.size)
+
+    async def Download(self, request, context):
+        blobs = self.service.blobs
+        if not blobs.has(request.sha256):
+            await context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown attachment {request.sha256}")
+        chunks = blobs.read_chunks(request.sha256, request.offset)
+        try:
+            while (data := await asyncio.to_thread(next, chunks, None)) is not None:
+                yield messenger_pb2.DownloadChunk(data=data)
+        finally:
+            chunks.close()
+
+
+
+def format_bind_address(ip:str, port:int) -> str:
     # IPv6 addresses need brackets, e.g. [::]:50051 or [2804:14c:...]:50051
     if ':' in ip and not ip.startswith('['):
-        bind_address = f'[{ip}]:{port}'
-    else:
-        bind_address = f'{ip}:{port}'
-    
-    server.add_insecure_port(bind_address)
-    print(f"Server started. Listening on {bind_address} ...")
+        return f'[{ip}]:{port}'
+    return f'{ip}:{port}'
+
+
+def build_syncronous_server(
+        ip:str, port:int, service: MessengerService,
+        compression: grpc.Compression = grpc.Compression.NoCompression, limits: RateLimits | None = None,
+        max_streams: int = DEFAULT_MAX_STREAMS
+    ) -> tuple[grpc.Server, int]:
+    """
+        Creates the thread pool server without starting it. Returns it with the bound port (useful with port 0).
+        The pool gets a worker per allowed ReceiveStream on top of const_max_workers, so open streams
+        never starve the other RPCs. Streams past max_streams are rejected with RESOURCE_EXHAUSTED.
+    """
+    # After the metrics interceptor, so rejected calls still show up as failed RPCs
+    interceptors = [metrics.MetricsServerInterceptor(), StreamLimitInterceptor(max_streams)]
+    if limits is not None and limits.enabled:
+        interceptors.append(RateLimitInterceptor(AdmissionControl(limits, service.store.depth)))
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=const_max_workers + max_streams),
+        interceptors=interceptors,
+        options=SERVER_OPTIONS,
+        compression=compression
+    )
+    messenger_pb2_grpc.add_MessengerServiceServicer_to_server(service, server)
+    bound_port = server.add_insecure_port(format_bind_address(ip, port))
+    return server, bound_port
+
+
+def serve_syncronous_server(
+        ip:str, port:int, service: MessengerService | None = None,
+        compression: grpc.Compression = grpc.Compression.NoCompression, limits: RateLimits | None = None,
+        max_streams: int = DEFAULT_MAX_STREAMS
+    ):
+    if service is None:
+        service = MessengerService()
+    server, _ = build_syncronous_server(ip, port, service, compression, limits, max_streams)
+    print(f"Server started. Listening on {format_bind_address(ip, port)} ...")
     
     server.start()
     
@@ -83,6 +464,41 @@ def serve_syncronous_server(ip:str, port:int):
         server.wait_for_termination() #Completely blocking
     except KeyboardInterrupt:
         print("Terminated")
+    finally:
+        service.close()
+
+
+def build_asynchronous_server(
+        ip:str, port:int, service: MessengerService,
+        compression: grpc.Compression = grpc.Compression.NoCompression, limits: RateLimits | None = None
+    ) -> tuple[grpc.aio.Server, int]:
+    """Creates the grpc.aio server without starting it, on the running event loop. Returns it with the bound port."""
+    interceptors = [metrics.AsyncMetricsServerInterceptor()]
+    if limits is not None and limits.enabled:
+        interceptors.append(AsyncRateLimitInterceptor(AdmissionControl(limits, service.store.depth)))
+    server = grpc.aio.server(interceptors=interceptors, options=SERVER_OPTIONS, compression=compression)
+    messenger_pb2_grpc.add_MessengerServiceServicer_to_server(AsyncMessengerService(service), server)
+    bound_port = server.add_insecure_port(format_bind_address(ip, port))
+    return server, bound_port
+
+
+async def serve_asynchronous_server(
+        ip:str, port:int, service: MessengerService | None = None,
+        compression: grpc.Compression = grpc.Compression.NoCompression, limits: RateLimits | None = None
+    ):
+    """Same service on a grpc.aio event loop, without the thread pool cap on concurrent RPCs."""
+    if service is None:
+        service = MessengerService()
+    server, _ = build_asynchronous_server(ip, port, service, compression, limits)
+    print(f"Async server started. Listening on {format_bind_address(ip, port)} ...")
+    
+    await server.start()
+    
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(None)
+        service.close()
 
 
 if __name__ == '__main__':
@@ -101,7 +517,154 @@ if __name__ == '__main__':
         default=50051, 
         help="The port to listen on (default: 50051)"
     )
+    parser.add_argument(
+        "--mode", 
+        choices=["sync", "async"], 
+        default="sync", 
+        help="sync: thread pool server, async: grpc.aio event loop server (default: sync)"
+    )
+    parser.add_argument(
+        "--max-streams", 
+        type=int, 
+        default=DEFAULT_MAX_STREAMS, 
+        help="Open ReceiveStream calls the sync server accepts, each holds a thread (default: %(default)s)"
+    )
+    
+    parser.add_argument(
+        "--metrics-port", 
+        type=int, 
+        default=None, 
+        help="Serve Prometheus metrics on http://localhost:<port>/metrics (default: disabled)"
+    )
+    parser.add_argument(
+        "--data-dir", 
+        type=str, 
+        default=None, 
+        help="Directory for the mailbox write-ahead log (default: in-memory only)"
+    )
+    parser.add_argument(
+        "--flush-interval", 
+        type=float, 
+        default=wal_log.DEFAULT_FLUSH_INTERVAL, 
+        help="Seconds between group commits of the write-ahead log (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--compact-threshold", 
+        type=int, 
+        default=wal_log.DEFAULT_COMPACT_THRESHOLD, 
+        help="Log size in bytes that triggers a snapshot (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--peers", 
+        nargs="*", 
+        default=[], 
+        help="Follower addresses (ip:port). When given, this server replicates the writes it receives to them"
+    )
+    parser.add_argument(
+        "--anti-entropy-peers", 
+        nargs="*", 
+        default=[], 
+        help="Replica addresses (ip:port) to repair missing messages from in the background"
+    )
+    parser.add_argument(
+        "--anti-entropy-interval", 
+        type=float, 
+        default=antientropy.DEFAULT_INTERVAL, 
+        help="Seconds between anti-entropy rounds (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--wait-durable", 
+        action="store_true", 
+        help="Only answer writes once their log record was fsynced"
+    )
+    parser.add_argument(
+        "--blob-dir", 
+        type=str, 
+        default=None, 
+        help="Directory for attachment contents (default: <data-dir>/blobs, or a temporary directory)"
+    )
+    parser.add_argument(
+        "--max-attachment-bytes", 
+        type=int, 
+        default=blob_store.MAX_BLOB_BYTES, 
+        help="Largest attachment accepted by Upload (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--rate-limit", 
+        type=float, 
+        default=0, 
+        help="Messages per second each sender may queue, 0 for no limit (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--rate-burst", 
+        type=int, 
+        default=None, 
+        help="Messages a sender may queue at once above --rate-limit (default: one second worth)"
+    )
+    parser.add_argument(
+        "--max-mailbox-messages", 
+        type=int, 
+        default=0, 
+        help="Queued messages per mailbox before writes to it are rejected, 0 for no cap (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--compression", 
+        choices=list(COMPRESSION), 
+        default="none", 
+        help="gRPC compression of the responses, for clients that accept it (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--codec", 
+        choices=message_codec.available_codecs(), 
+        default="none", 
+        help="Compress the text of queued messages that clients sent uncompressed (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--codec-threshold", 
+        type=int, 
+        default=message_codec.DEFAULT_THRESHOLD, 
+        help="Minimum text size in bytes compressed by --codec (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--idempotency-window", 
+        type=int, 
+        default=IDEMPOTENCY_WINDOW, 
+        help="Latest message ids remembered to ignore retried writes, 0 to disable (default: %(default)s)"
+    )
     
     args = parser.parse_args()
-    srv = serve_syncronous_server(args.ip, args.port)
+    if args.metrics_port is not None:
+        exporter = metrics.PrometheusExporter(args.metrics_port).start()
+        print(f"Metrics available on http://localhost:{exporter.port}/metrics")
+    
+    wal = None
+    if args.data_dir is not None:
+        wal = WriteAheadLog(args.data_dir, args.flush_interval, args.compact_threshold)
+    replicator = Replicator(args.peers).start() if args.peers else None
+    # With anti-entropy, tombstones are forgotten once every peer confirmed them, never because of their number
+    max_tombstones = None if args.anti_entropy_peers else MAX_TOMBSTONES
+    store = MailboxStore(wal=wal, wait_durable=args.wait_durable, max_tombstones=max_tombstones)
+    anti_entropy = None
+    if args.anti_entropy_peers:
+        anti_entropy = AntiEntropy(store, args.anti_entropy_peers, args.anti_entropy_interval).start()
+    codec = MessageCodec.from_name(args.codec, args.codec_threshold)
+    blob_dir = args.blob_dir
+    if blob_dir is None and args.data_dir is not None:
+        blob_dir = os.path.join(args.data_dir, "blobs")
+    blobs = BlobStore(blob_dir, args.max_attachment_bytes)
+    service = MessengerService(
+        store, replicator=replicator, anti_entropy=anti_entropy, codec=codec, blobs=blobs,
+        idempotency_window=args.idempotency_window
+    )
+    compression = COMPRESSION[args.compression]
+    burst = args.rate_burst if args.rate_burst is not None else int(args.rate_limit)
+    limits = RateLimits(args.rate_limit, burst, args.max_mailbox_messages)
+    
+    if args.mode == "async":
+        try:
+            asyncio.run(serve_asynchronous_server(args.ip, args.port, service, compression, limits))
+        except KeyboardInterrupt:
+            print("Terminated")
+    else:
+        srv = serve_syncronous_server(args.ip, args.port, service, compression, limits, args.max_streams)
     
\ No newline at end of file
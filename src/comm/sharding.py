@@ -0,0 +1,222 @@
+"""
+Sharding of mailboxes over replica groups with consistent hashing.
+
+Every replica group (a list of servers holding the same mailboxes, replicated as usual) owns the arcs of a hash
+ring that end at its virtual nodes. A mailbox belongs to the group owning the hash of its dest_email, so each
+group only stores and serves its share of the mailboxes. When a group joins or leaves, only the mailboxes on the
+arcs that changed owner move (about 1/N of them).
+
+ShardedMessenger routes client calls to the owning group. While a rebalance is in progress it also reads from the
+previous owner, and migrate() moves the queued messages of the mailboxes that changed owner with the existing
+Fetch / SendBatch / Ack RPCs.
+
+This is a client library: neither ui.py nor the server command line set up groups, so applications that shard
+build a ShardedMessenger themselves.
+"""
+import sys
+import os
+import bisect
+import logging
+import hashlib
+from typing import Callable
+
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_messenger"))
+try:
+    import messenger_pb2
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+import client as cli
+
+
+DEFAULT_VNODES = 128
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+class HashRing:
+    """Consistent hash ring of group names, with vnodes virtual nodes per group to even out the arcs."""
+
+    def __init__(self, groups: list[str] | None = None, vnodes: int = DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self._hashes = []  # Sorted virtual node positions
+        self._owners = []  # Group of each position
+        for group in groups or []:
+            self.add(group)
+
+    @property
+    def groups(self) -> set[str]:
+        return set(self._owners)
+
+    def add(self, group: str) -> None:
+        if group in self._owners:
+            return
+        for i in range(self.vnodes):
+            position = ring_hash(f"{group}#{i}")
+            index = bisect.bisect(self._hashes, position)
+            self._hashes.insert(index, position)
+            self._owners.insert(index, group)
+
+    def remove(self, group: str) -> None:
+        keep = [(h, owner) for h, owner in zip(self._hashes, self._owners) if owner != group]
+        self._hashes = [h for h, _ in keep]
+        self._owners = [owner for _, owner in keep]
+
+    def owner(self, key: str) -> str:
+        if not self._hashes:
+            raise LookupError("The hash ring has no groups")
+        index = bisect.bisect(self._hashes, ring_hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+    def copy(self) -> "HashRing":
+        ring = HashRing(vnodes=self.vnodes)
+        ring._hashes = list(self._hashes)
+        ring._owners = list(self._owners)
+        return ring
+
+
+class ShardedMessenger:
+    """
+        Client-side router over several replica groups: key=group name, value=connections of its servers.
+        Writes go to the owner of dest_email only, reads to the owner of self_email (and to its previous
+        owner while a rebalance is in progress).
+    """
+
+    def __init__(self, groups: dict[str, list[cli.ServerConnection]], vnodes: int = DEFAULT_VNODES):
+        self.groups = dict(groups)
+        self.ring = HashRing(list(groups), vnodes)
+        # Ring before the last membership change, until finish_rebalance()
+        self.previous_ring = None
+        # (address, email) of the mailboxes the last migrate() left on their old server, or the address alone
+        # (email "") of a server it could not list
+        self.unmoved: list[tuple[str, str]] = []
+
+    def connections_for(self, email: str) -> list[cli.ServerConnection]:
+        return self.groups[self.ring.owner(email)]
+
+    def _read_groups(self, email: str) -> list[str]:
+        owners = [self.ring.owner(email)]
+        if self.previous_ring is not None:
+            previous = self.previous_ring.owner(email)
+            if previous != owners[0] and previous in self.groups:
+                owners.append(previous)
+        return owners
+
+    def send_messages(
+            self, id: int, dest_message: str, self_email: str, dest_email: str,
+            quorum: cli.Quorum = cli.Quorum.ALL
+        ) -> list[str]:
+        return cli.send_messages(id, self.connections_for(dest_email), dest_message, self_email, dest_email, quorum)
+
+    def send_batch(
+            self, messages: list[messenger_pb2.SendRequest], quorum: cli.Quorum = cli.Quorum.ALL
+        ) -> list[list[str]]:
+        """One SendBatch per owning group. Returns the failed servers of each message (same order)."""
+        by_group = {}
+        for index, message in enumerate(messages):
+            by_group.setdefault(self.ring.owner(message.dest_email), []).append(index)
+
+        failures = [[] for _ in messages]
+        for group, indexes in by_group.items():
+            group_failures = cli.send_batch(self.groups[group], [messages[i] for i in indexes], quorum)
+            for index, failed in zip(indexes, group_failures):
+                failures[index] = failed
+        return failures
+
+    def receive_all_messages(
+            self, self_email: str, quorum: cli.Quorum = cli.Quorum.ALL
+        ) -> list[messenger_pb2.InboxResponse | None]:
+        inboxes = []
+        for group in self._read_groups(self_email):
+            inboxes.extend(cli.receive_all_messages(self.groups[group], self_email, quorum))
+        return inboxes
+
+    def receive_paginated_messages(
+            self, self_email: str, page_size: int = cli.DEFAULT_PAGE_SIZE, since_id: int = 0,
+            known: Callable[[list[int]], set[int]] | None = None
+        ) -> list[messenger_pb2.InboxResponse | None]:
+        inboxes = []
+        for group in self._read_groups(self_email):
+            inboxes.extend(cli.receive_paginated_messages(
+                self.groups[group], self_email, page_size, since_id=since_id, known=known
+            ))
+        return inboxes
+
+    def add_group(self, name: str, connections: list[cli.ServerConnection]) -> None:
+        """Adds a replica group to the ring. Call migrate() and then finish_rebalance() afterwards."""
+        self.previous_ring = self.ring.copy()
+        self.groups[name] = connections
+        self.ring.add(name)
+
+    def remove_group(self, name: str) -> None:
+        """
+            Takes a group off the ring. Its connections are kept until finish_rebalance(),
+            so its mailboxes can still be read and migrated.
+        """
+        self.previous_ring = self.ring.copy()
+        self.ring.remove(name)
+
+    def migrate(self) -> int:
+        """
+            Moves the queued messages of every mailbox whose owner changed to its new group.
+            A mailbox is only acknowledged on the old servers once every new server queued it. A mailbox that
+            fails to move stays on its old server, and the next migrate() retries it (see unmoved).
+            Returns how many messages were moved.
+        """
+        self.unmoved = []
+        if self.previous_ring is None:
+            return 0
+
+        moved = 0
+        for group in self.previous_ring.groups:
+            for conn in self.groups.get(group, []):
+                try:
+                    mailboxes = conn.stub.Digest(messenger_pb2.DigestRequest(), timeout=cli.RPC_TIMEOUT).mailboxes
+                except grpc.RpcError as e:
+                    logging.warning("Could not list the mailboxes of %s to migrate: %s", conn.address, e)
+                    self.unmoved.append((conn.address, ""))
+                    continue
+                for email in mailboxes:
+                    new_group = self.ring.owner(email)
+                    if new_group == group:
+                        continue
+                    try:
+                        moved += self._move_mailbox(conn, email, self.groups[new_group])
+                    except grpc.RpcError as e:
+                        logging.warning("Mailbox %s stays on %s, its move to %s failed: %s", email, conn.address, new_group, e)
+                        self.unmoved.append((conn.address, email))
+        return moved
+
+    def _move_mailbox(self, conn: cli.ServerConnection, email: str, targets: list[cli.ServerConnection]) -> int:
+        messages = []
+        cursor = 0
+        while True:
+            page = conn.stub.Fetch(
+                messenger_pb2.FetchRequest(self_email=email, cursor=cursor), timeout=cli.RPC_TIMEOUT
+            )
+            messages.extend(page.messages)
+            cursor = page.next_cursor
+            if not page.has_more:
+                break
+        if not messages:
+            return 0
+
+        if any(cli.send_batch(targets, messages)):
+            # Left on the old server, the next migrate() retries it (duplicates are dropped by id on read)
+            return 0
+        conn.stub.Ack(messenger_pb2.AckRequest(self_email=email, cursor=cursor), timeout=cli.RPC_TIMEOUT)
+        return len(messages)
+
+    def finish_rebalance(self) -> None:
+        """Stops reading from previous owners and drops the connections of removed groups."""
+        removed = [group for group in self.groups if group not in self.ring.groups]
+        for group in removed:
+            for conn in self.groups.pop(group):
+                conn.close()
+        self.previous_ring = None
@@ -0,0 +1,227 @@
+"""
+Append-only write-ahead log with group commit, used to persist the server mailboxes.
+
+Records are buffered in memory and written + fsynced by a background thread every flush_interval,
+so a single fsync covers every record appended during that window. Compaction replaces the log by a
+snapshot of the current state, which keeps startup replay proportional to the queued data.
+"""
+import os
+import struct
+import threading
+import zlib
+from typing import Callable, Iterable, Iterator
+
+
+DEFAULT_FLUSH_INTERVAL = 0.05  # seconds
+DEFAULT_COMPACT_THRESHOLD = 16 * 1024 * 1024  # bytes of log before a snapshot is taken
+
+LOG_FILE = "mailboxes.wal"
+SNAPSHOT_FILE = "mailboxes.snapshot"
+
+# File header: magic + epoch. The log is only replayed on top of a snapshot with the same epoch
+FILE_HEADER = struct.Struct("<4sQ")
+FILE_MAGIC = b"MWAL"
+
+# Record header: op code, payload length, crc32 of the payload
+RECORD_HEADER = struct.Struct("<BII")
+
+OP_APPEND = 1     # payload: serialized SendRequest, queued in the mailbox of its dest_email
+OP_TRIM = 2       # payload: count + email, removes count messages from the head of the mailbox
+OP_OFFSET = 3     # payload: offset + email, sets the cursor position of the mailbox head (snapshots only)
+OP_PUSH = 4       # payload: serialized SendRequest, pushed to a ReceiveStream but not written to it yet
+OP_DELIVERED = 5  # payload: id + email, a pushed message was written to its stream (or queued again)
+OP_TOMBSTONE = 6  # payload: id + email, a delivered message anti-entropy must not bring back (snapshots only)
+
+COUNT_STRUCT = struct.Struct("<Q")
+
+
+def encode_record(op: int, payload: bytes) -> bytes:
+    return RECORD_HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+
+
+def encode_email_count(email: str, count: int) -> bytes:
+    return COUNT_STRUCT.pack(count) + email.encode("utf-8")
+
+
+def decode_email_count(payload: bytes) -> tuple[str, int]:
+    count, = COUNT_STRUCT.unpack_from(payload)
+    return payload[COUNT_STRUCT.size:].decode("utf-8"), count
+
+
+def read_records(path: str) -> tuple[int | None, list[tuple[int, bytes]], int]:
+    """
+        Reads every valid record of a log or snapshot file.
+        Returns the file epoch (None if missing or unreadable), the records, and the byte length of
+        the valid prefix. A torn or corrupted tail (crash mid-write) ends the read.
+    """
+    if not os.path.exists(path):
+        return None, [], 0
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < FILE_HEADER.size:
+        return None, [], 0
+    magic, epoch = FILE_HEADER.unpack_from(data)
+    if magic != FILE_MAGIC:
+        return None, [], 0
+
+    records = []
+    pos = FILE_HEADER.size
+    while pos + RECORD_HEADER.size <= len(data):
+        op, length, crc = RECORD_HEADER.unpack_from(data, pos)
+        start = pos + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append((op, payload))
+        pos = start + length
+
+    return epoch, records, pos
+
+
+class WriteAheadLog:
+    """
+        Group committed write-ahead log stored in data_dir.
+        append() only copies the record into a buffer; durability is reached once the flusher thread
+        has written and fsynced it, which callers can wait for with wait_durable().
+    """
+
+    def __init__(
+            self, data_dir: str,
+            flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+            compact_threshold: int = DEFAULT_COMPACT_THRESHOLD
+        ):
+        self.data_dir = data_dir
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+        self.log_path = os.path.join(data_dir, LOG_FILE)
+        self.snapshot_path = os.path.join(data_dir, SNAPSHOT_FILE)
+        os.makedirs(data_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # serializes disk writes, always taken before _lock
+        self._flushed = threading.Condition(self._lock)
+        self._buffer = bytearray()
+        self._appended = 0  # tickets handed out
+        self._durable = 0   # tickets written and fsynced
+        self._log_size = 0
+        self._epoch = 0
+        self._file = None
+        self._compactor = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def replay(self) -> Iterator[tuple[int, bytes]]:
+        """Yields the snapshot records followed by the log records written after it."""
+        snapshot_epoch, snapshot_records, _ = read_records(self.snapshot_path)
+        log_epoch, log_records, valid_size = read_records(self.log_path)
+
+        self._epoch = snapshot_epoch or 0
+        yield from snapshot_records
+
+        if log_epoch is not None and log_epoch == self._epoch:
+            # Drop a torn tail so new records are not appended after garbage
+            with open(self.log_path, "r+b") as f:
+                f.truncate(valid_size)
+            self._log_size = valid_size
+            yield from log_records
+        else:
+            # Missing log, or a log superseded by the snapshot (crash during compaction)
+            self._create_log()
+
+    def start(self, compactor: Callable[[], None] | None = None) -> None:
+        """
+            Opens the log for appending and starts the flusher thread.
+            compactor is called from the flusher thread once the log outgrows compact_threshold;
+            it must block mutations and call compact() with the current state.
+        """
+        if not os.path.exists(self.log_path):
+            self._create_log()
+        self._file = open(self.log_path, "ab")
+        self._log_size = self._file.tell()
+        self._compactor = compactor
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, op: int, payload: bytes) -> int:
+        """Buffers a record and returns its ticket for wait_durable()."""
+        record = encode_record(op, payload)
+        with self._lock:
+            self._buffer += record
+            self._appended += 1
+            return self._appended
+
+    def wait_durable(self, ticket: int) -> None:
+        with self._flushed:
+            self._flushed.wait_for(lambda: self._durable >= ticket or self._stop.is_set())
+
+    def flush(self) -> None:
+        """Writes and fsyncs every buffered record. Appends are not blocked during the disk write."""
+        with self._io_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                data = bytes(self._buffer)
+                ticket = self._appended
+                self._buffer.clear()
+
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            with self._lock:
+                self._log_size += len(data)
+                self._durable = ticket
+                self._flushed.notify_all()
+
+    def compact(self, records: Iterable[tuple[int, bytes]]) -> None:
+        """
+            Replaces snapshot and log by a snapshot made of records, which must describe the whole state.
+            The caller must block mutations meanwhile, so buffered records are already part of that state.
+        """
+        with self._io_lock, self._lock:
+            epoch = self._epoch + 1
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(FILE_HEADER.pack(FILE_MAGIC, epoch))
+                for op, payload in records:
+                    f.write(encode_record(op, payload))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            # From here the old log is ignored on replay, since its epoch no longer matches
+            self._epoch = epoch
+            self._file.close()
+            self._create_log()
+            self._file = open(self.log_path, "ab")
+            self._log_size = self._file.tell()
+
+            self._buffer.clear()
+            self._durable = self._appended
+            self._flushed.notify_all()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self._flushed:
+            self._flushed.notify_all()
+        self._file.close()
+
+    def _create_log(self) -> None:
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(FILE_HEADER.pack(FILE_MAGIC, self._epoch))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self._log_size = FILE_HEADER.size
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if self._compactor is not None and self._log_size > self.compact_threshold:
+                self._compactor()
@@ -0,0 +1,108 @@
+# Add grpc generated folder to path
+import sys
+import os
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import messenger_pb2
+    import antientropy
+    from mailbox_store import MailboxStore
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def send(service: ser.MessengerService, ids) -> None:
+    for id in ids:
+        service.Send(messenger_pb2.SendRequest(
+            id=id, msg=f"msg {id}", self_email="x@gmail.com", dest_email="dest@gmail.com"
+        ), None)
+
+
+def test_anti_entropy_repairs_only_divergent_buckets():
+    services = [ser.MessengerService(), ser.MessengerService()]
+    servers, stubs = [], []
+    for service in services:
+        server, port = ser.build_syncronous_server("localhost", 0, service)
+        server.start()
+        servers.append(server)
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+        stubs.append(connections[0].stub)
+    a, b = services
+    try:
+        send(a, range(1000))
+        send(b, range(1000))
+        send(a, [1000, 1001])   # writes that failed on b
+        send(b, [1002])         # and on a
+
+        pulled_before = antientropy.PULLED_BUCKETS.value(peer="a")
+        assert antientropy.sync_from_peer(b.store, stubs[0], peer="a") == 2
+        assert antientropy.sync_from_peer(a.store, stubs[1], peer="b") == 1
+        # At most the buckets of the three divergent messages, out of DIGEST_BUCKETS
+        assert antientropy.PULLED_BUCKETS.value(peer="a") - pulled_before <= 3
+
+        assert a.store.mailbox_digests() == b.store.mailbox_digests()
+        assert sorted(m.id for m in b.store.messages("dest@gmail.com")) == list(range(1003))
+        assert antientropy.sync_from_peer(b.store, stubs[0]) == 0
+
+        # Messages delivered by a are not brought back from b
+        a.ReceiveAll(messenger_pb2.ReceiveRequest(self_email="dest@gmail.com"), None)
+        assert antientropy.sync_from_peer(a.store, stubs[1]) == 0
+        assert a.store.messages("dest@gmail.com") == []
+    finally:
+        for server in servers:
+            server.stop(None)
+
+
+def test_tombstones_are_forgotten_once_every_peer_confirmed():
+    services = [ser.MessengerService(MailboxStore(max_tombstones=None)) for _ in range(3)]
+    servers, stubs = [], {}
+    for name, service in zip("abc", services):
+        server, port = ser.build_syncronous_server("localhost", 0, service)
+        server.start()
+        servers.append(server)
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+        stubs[name] = connections[0].stub
+    a, b, c = services
+    receive = messenger_pb2.ReceiveRequest(self_email="dest@gmail.com")
+    try:
+        for service in services:
+            send(service, [1, 2])
+        a.ReceiveAll(receive, None)
+        c.ReceiveAll(receive, None)
+        anti_entropy = antientropy.AntiEntropy(a.store, ["b", "c"])
+
+        # b was not reached, and then still holds both messages: the tombstones must stay
+        anti_entropy.sync_round({"c": stubs["c"]})
+        assert a.store.tombstoned("dest@gmail.com", [1, 2]) == {1, 2}
+        anti_entropy.sync_round({"b": stubs["b"], "c": stubs["c"]})
+        assert a.store.tombstoned("dest@gmail.com", [1, 2]) == {1, 2}
+        assert a.store.messages("dest@gmail.com") == []
+
+        b.ReceiveAll(receive, None)
+        anti_entropy.sync_round({"b": stubs["b"], "c": stubs["c"]})
+        assert a.store.tombstoned("dest@gmail.com", [1, 2]) == set()
+    finally:
+        for server in servers:
+            server.stop(None)
+
+
+if __name__ == '__main__':
+    test_anti_entropy_repairs_only_divergent_buckets()
+    test_tombstones_are_forgotten_once_every_peer_confirmed()
+    print("OK")
@@ -0,0 +1,128 @@
+# Add grpc generated folder to path
+import sys
+import os
+import tempfile
+
+import grpc
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import health
+    import messenger_pb2
+    from blob_store import BlobStore
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def test_upload_dedup_and_resumable_download():
+    with tempfile.TemporaryDirectory() as directory:
+        services = [ser.MessengerService(blobs=BlobStore(os.path.join(directory, f"blobs{i}"))) for i in range(2)]
+        servers = [ser.build_syncronous_server("localhost", 0, service) for service in services]
+        for server, _ in servers:
+            server.start()
+        try:
+            connections, _ = cli.connect_to_servers([f"localhost:{port}" for _, port in servers])
+            path = os.path.join(directory, "report.bin")
+            content = os.urandom(10_000)
+            with open(path, "wb") as file:
+                file.write(content)
+
+            attachment, failed = cli.upload_attachment(connections, path, chunk_size=1000)
+            assert failed == []
+            assert attachment.size == len(content) and attachment.name == "report.bin"
+            assert all(service.blobs.has(attachment.sha256) for service in services)
+
+            # Same content for another recipient is not sent again
+            stub = connections[0].stub
+            response = stub.Upload(cli.iter_upload_chunks(path, attachment.sha256, attachment.size, 1000))
+            assert response.existed
+
+            cli.send_messages(1, connections, "see attached", "a@gmail.com", "b@gmail.com", attachments=[attachment])
+            inbox = cli.receive_paginated_messages(connections, "b@gmail.com", health=None)[0]
+            received = inbox.messages[0].attachments[0]
+
+            target = os.path.join(directory, "downloaded.bin")
+            cli.download_attachment(connections, received, target, health=None)
+            with open(target, "rb") as file:
+                assert file.read() == content
+
+            tail = stub.Download(messenger_pb2.DownloadRequest(sha256=attachment.sha256, offset=9_500))
+            assert b"".join(chunk.data for chunk in tail) == content[9_500:]
+        finally:
+            for server, _ in servers:
+                server.stop(None)
+
+
+def test_download_probes_a_replica_due_for_it():
+    with tempfile.TemporaryDirectory() as directory:
+        services = [ser.MessengerService(blobs=BlobStore(os.path.join(directory, f"blobs{i}"))) for i in range(2)]
+        servers = [ser.build_syncronous_server("localhost", 0, service) for service in services]
+        for server, _ in servers:
+            server.start()
+        try:
+            connections, _ = cli.connect_to_servers([f"localhost:{port}" for _, port in servers])
+            path = os.path.join(directory, "report.bin")
+            with open(path, "wb") as file:
+                file.write(os.urandom(1000))
+            attachment, _ = cli.upload_attachment(connections, path)
+
+            now = [0.0]
+            tracker = health.HealthTracker(failure_threshold=1, base_backoff=1, clock=lambda: now[0])
+            tracker.record_failure(connections[0].address)
+            now[0] = 1
+            tracker.record_success(connections[1].address, 5)
+
+            # The healthy replica serves the download, and the other one stays open for a later probe
+            target = os.path.join(directory, "downloaded.bin")
+            cli.download_attachment(connections, attachment, target, health=tracker)
+            assert tracker.snapshot(connections[0].address).state is health.BreakerState.OPEN
+
+            # Once it is the only candidate left, the probe is actually sent, and closes the breaker
+            tracker.record_failure(connections[1].address)
+            os.unlink(target)
+            cli.download_attachment(connections, attachment, target, health=tracker)
+            assert tracker.snapshot(connections[0].address).state is health.BreakerState.CLOSED
+            assert os.path.getsize(target) == 1000
+        finally:
+            for server, _ in servers:
+                server.stop(None)
+
+def test_upload_rejects_content_not_matching_its_digest():
+    with tempfile.TemporaryDirectory() as directory:
+        service = ser.MessengerService(blobs=BlobStore(directory))
+        server, port = ser.build_syncronous_server("localhost", 0, service)
+        server.start()
+        try:
+            connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+            chunks = [messenger_pb2.UploadChunk(sha256="0" * 64, size=5), messenger_pb2.UploadChunk(data=b"hello")]
+            try:
+                connections[0].stub.Upload(iter(chunks))
+                assert False, "upload should have failed"
+            except grpc.RpcError as e:
+                assert e.code() == grpc.StatusCode.DATA_LOSS
+            assert os.listdir(service.blobs.temp_dir) == []
+        finally:
+            server.stop(None)
+
+
+if __name__ == '__main__':
+    test_upload_dedup_and_resumable_download()
+    test_download_probes_a_replica_due_for_it()
+    test_upload_rejects_content_not_matching_its_digest()
+    print("OK")
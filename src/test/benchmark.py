@@ -0,0 +1,291 @@
+# Add grpc generated folder to path
+import sys
+import os
+import time
+import json
+import math
+import random
+import socket
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timezone
+
+import grpc
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import messenger_pb2
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+# Load generator for the messenger.
+# Starts N replicas (in-process or as subprocesses), then many simulated users issue a configurable
+# mix of Send and ReceiveAll through the client fan-out for a fixed duration.
+# Reports throughput, p50/p99/p999 latency per operation and server RSS, and saves everything as JSON
+# so runs on different commits can be compared with --compare.
+
+
+SERVER_STARTUP_TIMEOUT = 10  # seconds
+
+
+class Replica:
+    """A benchmark server, either a subprocess or a grpc.Server inside this process."""
+
+    def __init__(self, address: str, process: subprocess.Popen | None = None, server: grpc.Server | None = None):
+        self.address = address
+        self.process = process
+        self.server = server
+
+    def rss_bytes(self) -> int | None:
+        # In-process replicas share the benchmark process, so their RSS includes the client side
+        pid = self.process.pid if self.process is not None else os.getpid()
+        return read_rss_bytes(pid)
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+        if self.server is not None:
+            self.server.stop(None)
+
+
+def read_rss_bytes(pid: int) -> int | None:
+    """Resident set size from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def start_replicas(count: int, spawn: str, server_mode: str) -> list[Replica]:
+    replicas = []
+    for _ in range(count):
+        if spawn == "inproc":
+            server, port = ser.build_syncronous_server("localhost", 0, ser.MessengerService())
+            server.start()
+            replicas.append(Replica(f"localhost:{port}", server=server))
+        else:
+            port = free_port()
+            process = subprocess.Popen(
+                [sys.executable, os.path.join(comm_dir, "server.py"), "--ip=localhost", f"--port={port}", f"--mode={server_mode}"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            replicas.append(Replica(f"localhost:{port}", process=process))
+
+    # Subprocesses may need longer than the client handshake timeout to boot
+    for replica in replicas:
+        channel = grpc.insecure_channel(replica.address)
+        grpc.channel_ready_future(channel).result(timeout=SERVER_STARTUP_TIMEOUT)
+        channel.close()
+    return replicas
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float | None:
+    """Nearest rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], failures: int, elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "failed": failures,
+        "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "p999_ms": percentile(latencies, 0.999),
+    }
+
+
+def run_users(
+        connections: list[cli.ServerConnection], users: int, duration: float,
+        send_ratio: float, payload_bytes: int, seed: int
+    ) -> tuple[dict, int, float]:
+    """Runs the simulated users. Returns per operation stats, messages delivered, and the elapsed time."""
+    emails = [f"user{i}@bench.local" for i in range(users)]
+    payload = "x" * payload_bytes
+    latencies = {"send": [], "receive_all": []}
+    failures = {"send": 0, "receive_all": 0}
+    received = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def user(index: int) -> None:
+        rng = random.Random(seed + index)
+        self_email = emails[index]
+        local = {"send": [], "receive_all": []}
+        local_failures = {"send": 0, "receive_all": 0}
+        local_received = 0
+
+        while not stop.is_set():
+            start = time.perf_counter()
+            if rng.random() < send_ratio:
+                op = "send"
+                request = messenger_pb2.SendRequest(
+                    id=cli.ID_GENERATOR.next_id(), msg=payload, self_email=self_email, dest_email=rng.choice(emails)
+                )
+                results = cli.fan_out(connections, "Send", request)
+            else:
+                op = "receive_all"
+                request = messenger_pb2.ReceiveRequest(self_email=self_email)
+                results = cli.fan_out(connections, "ReceiveAll", request)
+                inboxes = [r.response for r in results]
+                local_received += sum(1 for _ in cli.iter_receive_all_unique_responses(inboxes))
+            latency = (time.perf_counter() - start) * 1000
+
+            if any(r.error is not None for r in results):
+                local_failures[op] += 1
+            else:
+                local[op].append(latency)
+
+        with lock:
+            for op in latencies:
+                latencies[op].extend(local[op])
+                failures[op] += local_failures[op]
+            received[0] += local_received
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = {op: summarize(latencies[op], failures[op], elapsed) for op in latencies}
+    return stats, received[0], elapsed
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=current_test_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args) -> dict:
+    replicas = start_replicas(args.replicas, args.spawn, args.server_mode)
+    try:
+        config = cli.ClientConfig(pool_size=args.pool_size)
+        connections, failed = cli.connect_to_servers([replica.address for replica in replicas], config)
+        if failed:
+            raise RuntimeError(f"Failed to connect to: {', '.join(failed)}")
+
+        rss_before = [replica.rss_bytes() for replica in replicas]
+        stats, received, elapsed = run_users(
+            connections, args.users, args.duration, args.send_ratio, args.payload_bytes, args.seed
+        )
+        rss_after = [replica.rss_bytes() for replica in replicas]
+
+        for conn in connections:
+            conn.close()
+    finally:
+        for replica in replicas:
+            replica.stop()
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "config": {
+            "replicas": args.replicas, "spawn": args.spawn, "server_mode": args.server_mode,
+            "users": args.users, "duration_s": args.duration, "send_ratio": args.send_ratio,
+            "payload_bytes": args.payload_bytes, "seed": args.seed, "pool_size": args.pool_size,
+        },
+        "elapsed_s": elapsed,
+        "msgs_per_s": stats["send"]["ok"] / elapsed if elapsed else 0.0,
+        "received_msgs": received,
+        "operations": stats,
+        "server_rss_bytes": {"before": rss_before, "after": rss_after},
+    }
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Prints the relative change of the headline numbers against a previous run."""
+    def delta(new, old) -> str:
+        if new is None or not old:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"Against {baseline.get('commit') or 'baseline'}:")
+    print(f"  msgs/s: {delta(current['msgs_per_s'], baseline['msgs_per_s'])}")
+    for op, stats in current["operations"].items():
+        old = baseline["operations"].get(op, {})
+        changes = ", ".join(f"{key} {delta(stats[key], old.get(key))}" for key in ("p50_ms", "p99_ms", "p999_ms"))
+        print(f"  {op}: {changes}")
+
+
+def print_report(result: dict) -> None:
+    def ms(value: float | None) -> str:
+        return "n/a" if value is None else f"{value:.2f}"
+
+    print(f"msgs/s: {result['msgs_per_s']:.1f}  (received {result['received_msgs']})")
+    for op, stats in result["operations"].items():
+        print(
+            f"  {op:<12} ok={stats['ok']} failed={stats['failed']} ops/s={stats['ops_per_s']:.1f} "
+            f"p50={ms(stats['p50_ms'])} p99={ms(stats['p99_ms'])} p999={ms(stats['p999_ms'])} (ms)"
+        )
+    for before, after in zip(result["server_rss_bytes"]["before"], result["server_rss_bytes"]["after"]):
+        if before is not None and after is not None:
+            print(f"  server RSS: {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load generator and benchmark for the messenger.")
+    parser.add_argument("--replicas", type=int, default=3, help="Number of servers")
+    parser.add_argument("--spawn", choices=["subprocess", "inproc"], default="subprocess",
+                        help="Run servers as subprocesses or inside the benchmark process")
+    parser.add_argument("--server-mode", choices=["sync", "async"], default="sync",
+                        help="--mode passed to subprocess servers")
+    parser.add_argument("--users", type=int, default=20, help="Simulated users, one thread each")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load")
+    parser.add_argument("--send-ratio", type=float, default=0.8, help="Fraction of operations that are Send")
+    parser.add_argument("--payload-bytes", type=int, default=100, help="Size of each message body")
+    parser.add_argument("--pool-size", type=int, default=1, help="Channels per replica")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="JSON file for the results")
+    parser.add_argument("--compare", type=str, default=None, help="JSON file of a previous run to compare with")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
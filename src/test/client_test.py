@@ -0,0 +1,263 @@
+# Add grpc generated folder to path
+import sys
+import os
+import time
+import socket
+from concurrent import futures
+import grpc
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import messenger_pb2
+    import messenger_pb2_grpc
+    from retry import RetryPolicy
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def start_local_server() -> tuple[grpc.Server, str]:
+    server, port = ser.build_syncronous_server("localhost", 0, ser.MessengerService())
+    server.start()
+    return server, f"localhost:{port}"
+
+
+class SlowSendInterceptor(grpc.ServerInterceptor):
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.endswith("/Send"):
+            return handler
+        behavior = handler.unary_unary
+
+        def slow(request, context):
+            time.sleep(self.delay)
+            return behavior(request, context)
+
+        return grpc.unary_unary_rpc_method_handler(slow, handler.request_deserializer, handler.response_serializer)
+
+
+class FailedFuture:
+    """Already failed grpc future."""
+
+    def __init__(self, error: grpc.RpcError):
+        self.error = error
+
+    def result(self):
+        raise self.error
+
+    def add_done_callback(self, callback) -> None:
+        callback(self)
+
+
+class UnavailableError(grpc.RpcError):
+    def code(self) -> grpc.StatusCode:
+        return grpc.StatusCode.UNAVAILABLE
+
+
+class ClosingConnection:
+    """Fails the first Send with UNAVAILABLE, then behaves like a closed channel."""
+    address = "closing:1"
+
+    def __init__(self):
+        self.calls = 0
+        self.stub = self
+        self.Send = self
+
+    def future(self, request, timeout):
+        self.calls += 1
+        if self.calls > 1:
+            raise ValueError("Cannot invoke RPC on closed channel!")
+        return FailedFuture(UnavailableError())
+
+
+def make_inbox(messages: list[tuple[int, str, str]]) -> messenger_pb2.InboxResponse:
+    return messenger_pb2.InboxResponse(messages=[
+        messenger_pb2.SendRequest(id=id, msg=msg, self_email=sender, dest_email="dest@gmail.com")
+        for id, msg, sender in messages
+    ])
+
+
+def test_unique_responses_merge_and_dedup():
+    full = [(1, "a", "x@gmail.com"), (2, "b", "y@gmail.com"), (3, "c", "x@gmail.com"), (4, "d", "x@gmail.com")]
+    inboxes = [
+        make_inbox(full),
+        make_inbox([full[0], full[2]]),  # replica that missed some writes
+        None,                            # failed replica
+        make_inbox([full[1], full[3]]),
+    ]
+
+    unique = cli.extract_receive_all_unique_responses(inboxes)
+    assert [(id, msg, sender) for id, msg, sender, _ in unique] == full
+
+
+def test_unique_responses_streaming():
+    inboxes = [make_inbox([(i, str(i), "x@gmail.com") for i in range(1000)]) for _ in range(3)]
+
+    stream = cli.iter_receive_all_unique_responses(inboxes)
+    assert next(stream)[0] == 0
+    assert len(list(stream)) == 999
+
+
+def test_snowflake_ids_are_unique_and_increasing():
+    clock = [1_800_000_000.0]
+    generator = cli.SnowflakeIdGenerator(node_id=5, clock=lambda: clock[0])
+    ids = [generator.next_id() for _ in range(5000)]   # more than one millisecond worth of sequence
+    clock[0] -= 1                                       # clock stepping back
+    ids.append(generator.next_id())
+
+    assert ids == sorted(set(ids))
+    assert all(0 < id < 2**63 for id in ids)
+    assert (ids[0] >> cli.SnowflakeIdGenerator.SEQUENCE_BITS) & cli.SnowflakeIdGenerator.MAX_NODE == 5
+
+    other = cli.SnowflakeIdGenerator(node_id=6, clock=lambda: clock[0])
+    assert not set(ids) & {other.next_id() for _ in range(100)}
+
+
+def test_quorum_required():
+    assert cli.Quorum.FIRST.required(3) == 1
+    assert cli.Quorum.MAJORITY.required(3) == 2
+    assert cli.Quorum.MAJORITY.required(4) == 3
+    assert cli.Quorum.ALL.required(3) == 3
+    assert cli.Quorum.FIRST.required(0) == 0
+
+
+def test_fan_out_returns_at_quorum_while_a_replica_is_pending():
+    fast, fast_address = start_local_server()
+    slow = grpc.server(futures.ThreadPoolExecutor(max_workers=2), interceptors=[SlowSendInterceptor(1)])
+    messenger_pb2_grpc.add_MessengerServiceServicer_to_server(ser.MessengerService(), slow)
+    slow_port = slow.add_insecure_port("localhost:0")
+    slow.start()
+    try:
+        connections, _ = cli.connect_to_servers([f"localhost:{slow_port}", fast_address])
+        request = messenger_pb2.SendRequest(id=1, msg="hi", self_email="x@gmail.com", dest_email="dest@gmail.com")
+
+        start = time.monotonic()
+        pending, answered = cli.fan_out(connections, "Send", request, quorum=cli.Quorum.FIRST, health=None)
+        assert time.monotonic() - start < 0.5
+        assert answered.ok
+        assert pending.response is None and pending.error is None
+    finally:
+        fast.stop(None)
+        slow.stop(None)
+
+
+def test_fan_out_retry_that_cannot_be_sent_ends_the_replica():
+    conn = ClosingConnection()
+    request = messenger_pb2.SendRequest(id=1, msg="hi", self_email="x@gmail.com", dest_email="dest@gmail.com")
+
+    result, = cli.fan_out([conn], "Send", request, health=None, retry=RetryPolicy(base_delay=0.01, budget=None))
+    assert conn.calls == 2
+    assert isinstance(result.error, UnavailableError)
+
+
+def test_send_coalescer_batches_messages():
+    servers, addresses = zip(*(start_local_server() for _ in range(2)))
+    try:
+        connections, failed = cli.connect_to_servers(list(addresses))
+        assert not failed
+
+        coalescer = cli.SendCoalescer(connections, window=0.05, max_batch=10)
+        pending = [coalescer.submit(i, f"msg {i}", "x@gmail.com", "dest@gmail.com") for i in range(25)]
+        coalescer.close()
+        assert all(future.result(timeout=5) == [] for future in pending)
+
+        inboxes = cli.receive_all_messages(connections, "dest@gmail.com")
+        assert [len(inbox.messages) for inbox in inboxes] == [25, 25]
+        assert [m[0] for m in cli.extract_receive_all_unique_responses(inboxes)] == list(range(25))
+    finally:
+        for server in servers:
+            server.stop(None)
+
+
+def test_connect_handshakes_share_deadline():
+    server, address = start_local_server()
+    try:
+        # Non-routable addresses never answer, so each one would take the whole handshake timeout
+        dead = [f"10.255.255.1:{50051 + i}" for i in range(3)]
+        start = time.monotonic()
+        connections, failed = cli.connect_to_servers([dead[0], address] + dead[1:])
+        elapsed = time.monotonic() - start
+
+        assert [conn.address for conn in connections] == [address]
+        assert failed == dead
+        assert elapsed < 2 * cli.MAX_HANDSHAKE_TIMEOUT
+    finally:
+        server.stop(None)
+
+
+def test_reconnector_adds_server_when_it_comes_back():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+    address = f"localhost:{port}"
+
+    connections, failed = cli.connect_to_servers([address])
+    assert not connections and failed == [address]
+
+    reconnected = []
+    reconnector = cli.Reconnector(connections, failed, interval=0.1, on_reconnect=reconnected.append)
+    reconnector.start()
+    server, _ = ser.build_syncronous_server("localhost", port, ser.MessengerService())
+    server.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not connections and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert [conn.address for conn in connections] == [address]
+        assert reconnected == connections and failed == []
+        assert cli.send_messages(1, connections, "hello", "x@gmail.com", "dest@gmail.com") == []
+    finally:
+        reconnector.stop()
+        server.stop(None)
+
+
+def test_connection_pool_round_robin():
+    server, address = start_local_server()
+    try:
+        config = cli.ClientConfig(pool_size=3, compression=grpc.Compression.Gzip)
+        connections, failed = cli.connect_to_servers([address], config)
+        assert not failed
+        conn = connections[0]
+        assert len(conn.channels) == 3
+        assert [conn.stub for _ in range(4)] == conn.stubs + conn.stubs[:1]
+
+        for i in range(6):
+            assert cli.send_messages(i, connections, "hello", "x@gmail.com", "dest@gmail.com") == []
+        inboxes = cli.receive_all_messages(connections, "dest@gmail.com")
+        assert len(inboxes[0].messages) == 6
+        conn.close()
+    finally:
+        server.stop(None)
+
+
+if __name__ == '__main__':
+    test_unique_responses_merge_and_dedup()
+    test_unique_responses_streaming()
+    test_snowflake_ids_are_unique_and_increasing()
+    test_quorum_required()
+    test_fan_out_returns_at_quorum_while_a_replica_is_pending()
+    test_fan_out_retry_that_cannot_be_sent_ends_the_replica()
+    test_send_coalescer_batches_messages()
+    test_connect_handshakes_share_deadline()
+    test_reconnector_adds_server_when_it_comes_back()
+    test_connection_pool_round_robin()
+    print("OK")
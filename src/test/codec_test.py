@@ -0,0 +1,71 @@
+# Add grpc generated folder to path
+import sys
+import os
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import grpc
+    import client as cli
+    import server as ser
+    import messenger_pb2
+    from codec import MessageCodec, decode_text
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def test_codec_only_compresses_long_texts():
+    codec = MessageCodec(threshold=100)
+    short = codec.encode(messenger_pb2.SendRequest(id=1, msg="hello"))
+    assert short.codec == messenger_pb2.CODEC_NONE and short.msg == "hello"
+
+    text = "olá mundo " * 50
+    long = codec.encode(messenger_pb2.SendRequest(id=2, msg=text))
+    assert long.codec == messenger_pb2.CODEC_ZLIB and long.msg == ""
+    assert len(long.body) < len(text.encode())
+    assert decode_text(long) == text
+
+    # Encoding twice leaves the message alone
+    assert codec.encode(long).body == long.body
+
+
+def test_compressed_messages_round_trip_through_server():
+    service = ser.MessengerService(codec=MessageCodec(threshold=100))
+    server, port = ser.build_syncronous_server("localhost", 0, service, compression=grpc.Compression.Gzip)
+    server.start()
+    try:
+        config = cli.ClientConfig(compression=grpc.Compression.Gzip)
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"], config)
+        long_text = "long message " * 200
+        # Client compresses the first one, the server the second (client codec disabled)
+        cli.send_messages(1, connections, long_text, "a@gmail.com", "b@gmail.com")
+        cli.send_messages(2, connections, long_text, "a@gmail.com", "b@gmail.com", codec=None)
+        cli.send_messages(3, connections, "short", "a@gmail.com", "b@gmail.com")
+
+        queued = service.store.messages("b@gmail.com")
+        assert [m.codec for m in queued] == [messenger_pb2.CODEC_ZLIB, messenger_pb2.CODEC_ZLIB, messenger_pb2.CODEC_NONE]
+
+        inboxes = cli.receive_paginated_messages(connections, "b@gmail.com", health=None)
+        messages = cli.extract_receive_all_unique_responses(inboxes)
+        assert [m[1] for m in messages] == [long_text, long_text, "short"]
+    finally:
+        server.stop(None)
+
+
+if __name__ == '__main__':
+    test_codec_only_compresses_long_texts()
+    test_compressed_messages_round_trip_through_server()
+    print("OK")
@@ -0,0 +1,116 @@
+# Add grpc generated folder to path
+import sys
+import os
+import gzip
+import time
+import zlib
+import random
+import string
+import argparse
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import messenger_pb2
+    import codec as message_codec
+    from codec import MessageCodec, decode_text
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+# Bytes on the wire and CPU cost of one Send, for each compression scheme and message size.
+#   none: the serialized SendRequest
+#   grpc-gzip / grpc-deflate: gRPC message compression, which gzips / deflates the serialized message of every call.
+#     It runs once per replica call, so its CPU cost is multiplied by --replicas.
+#   codec-zlib / codec-zstd: MessageCodec, which compresses the text once before the fan-out
+# CPU is the time to encode and decode one message (compress + decompress), in microseconds.
+
+WORDS = [
+    "the", "message", "server", "replica", "inbox", "hello", "meeting", "tomorrow", "please", "send",
+    "report", "attached", "thanks", "review", "update", "project", "deadline", "team", "call", "notes",
+]
+
+
+def make_text(size: int, kind: str, rng: random.Random) -> str:
+    if kind == "random":
+        return "".join(rng.choices(string.ascii_letters + string.digits, k=size))
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def make_message(text: str) -> messenger_pb2.SendRequest:
+    return messenger_pb2.SendRequest(id=1 << 40, msg=text, self_email="sender@gmail.com", dest_email="dest@gmail.com")
+
+
+def time_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def measure_transport(name: str, text: str, iterations: int) -> tuple[int, float]:
+    serialized = make_message(text).SerializeToString()
+    if name == "none":
+        return len(serialized), 0.0
+    compress, decompress = (gzip.compress, gzip.decompress) if name == "grpc-gzip" else (zlib.compress, zlib.decompress)
+    compressed = compress(serialized)
+    return len(compressed), time_us(lambda: decompress(compress(serialized)), iterations)
+
+
+def measure_codec(codec: int, text: str, iterations: int) -> tuple[int, float]:
+    # Threshold 0 so every size is compressed; the default threshold would leave the short ones alone
+    encoder = MessageCodec(codec, threshold=0)
+
+    def round_trip() -> None:
+        decode_text(encoder.encode(make_message(text)))
+
+    encoded = encoder.encode(make_message(text))
+    return encoded.ByteSize(), time_us(round_trip, iterations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bytes on the wire and CPU cost of the compression schemes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024, 4096, 16384, 65536],
+                        help="Text sizes in bytes")
+    parser.add_argument("--text", choices=["words", "random"], default="words",
+                        help="words: chat-like text, random: barely compressible characters")
+    parser.add_argument("--replicas", type=int, default=3, help="Calls per Send, for the CPU of gRPC compression")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    schemes = ["none", "grpc-gzip", "grpc-deflate"] + [
+        f"codec-{name}" for name in message_codec.available_codecs() if name != "none"
+    ]
+
+    print(f"{'size':>7} {'scheme':<13} {'bytes':>8} {'ratio':>6} {'cpu us/send':>12}")
+    for size in args.sizes:
+        text = make_text(size, args.text, rng)
+        baseline = None
+        for scheme in schemes:
+            if scheme.startswith("codec-"):
+                wire_bytes, cpu = measure_codec(message_codec.CODECS[scheme[len("codec-"):]], text, args.iterations)
+            else:
+                wire_bytes, cpu = measure_transport(scheme, text, args.iterations)
+                cpu *= args.replicas
+            baseline = baseline or wire_bytes
+            print(f"{size:>7} {scheme:<13} {wire_bytes:>8} {wire_bytes / baseline:>6.2f} {cpu:>12.1f}")
@@ -0,0 +1,135 @@
+# Add grpc generated folder to path
+import sys
+import os
+
+import pytest
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import messenger_pb2
+    from servers import MODES, RunningServer, start_server
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def connect(mode: str) -> tuple[RunningServer, cli.ServerConnection]:
+    server = start_server(mode)
+    connections, _ = cli.connect_to_servers([server.address])
+    return server, connections[0]
+
+
+def queue_messages(conn: cli.ServerConnection, ids, dest_email: str = "b@gmail.com") -> None:
+    conn.stub.SendBatch(messenger_pb2.SendBatchRequest(messages=[
+        messenger_pb2.SendRequest(id=id, msg=f"message {id}", self_email="a@gmail.com", dest_email=dest_email)
+        for id in ids
+    ]))
+
+
+def fetch(conn: cli.ServerConnection, cursor: int = 0, limit: int = 0) -> messenger_pb2.FetchResponse:
+    return conn.stub.Fetch(messenger_pb2.FetchRequest(self_email="b@gmail.com", cursor=cursor, limit=limit))
+
+
+def ack(conn: cli.ServerConnection, cursor: int) -> messenger_pb2.AckResponse:
+    return conn.stub.Ack(messenger_pb2.AckRequest(self_email="b@gmail.com", cursor=cursor))
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_fetch_pages_advance_the_cursor(mode: str):
+    server, conn = connect(mode)
+    try:
+        queue_messages(conn, range(1, 6))
+        pages = []
+        cursor = 0
+        while True:
+            page = fetch(conn, cursor, limit=2)
+            pages.append([m.id for m in page.messages])
+            assert page.next_cursor == cursor + len(page.messages)
+            cursor = page.next_cursor
+            if not page.has_more:
+                break
+        assert pages == [[1, 2], [3, 4], [5]]
+
+        # Fetching does not remove anything, and a cursor past the end returns an empty page
+        assert [m.id for m in fetch(conn, limit=2).messages] == [1, 2]
+        end = fetch(conn, cursor=5)
+        assert not end.messages and end.next_cursor == 5 and not end.has_more
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_fetch_limit_defaults_and_cap(mode: str):
+    server, conn = connect(mode)
+    try:
+        queue_messages(conn, range(1, ser.MAX_PAGE_SIZE + 11))
+        assert len(fetch(conn).messages) == ser.DEFAULT_PAGE_SIZE
+        capped = fetch(conn, limit=ser.MAX_PAGE_SIZE * 2)
+        assert len(capped.messages) == ser.MAX_PAGE_SIZE and capped.has_more
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_ack_of_a_partial_page(mode: str):
+    server, conn = connect(mode)
+    try:
+        queue_messages(conn, range(1, 6))
+        page = fetch(conn, limit=3)
+        assert [m.id for m in page.messages] == [1, 2, 3] and page.next_cursor == 3
+
+        # Only the first two were processed: the third stays queued
+        assert ack(conn, 2).debug_message == "2 message(s) acknowledged."
+        assert [m.id for m in fetch(conn, cursor=2).messages] == [3, 4, 5]
+        # Cursors are positions in the mailbox, so an old cursor skips nothing nor returns removed messages
+        assert [m.id for m in fetch(conn, cursor=0).messages] == [3, 4, 5]
+
+        # Acknowledging the same cursor again, or one behind it, removes nothing
+        assert ack(conn, 2).debug_message == "0 message(s) acknowledged."
+        assert ack(conn, 10).debug_message == "3 message(s) acknowledged."
+        assert not fetch(conn).messages
+    finally:
+        server.stop()
+
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_skipped_messages_count_toward_the_page(mode: str):
+    server, conn = connect(mode)
+    try:
+        queue_messages(conn, range(1, ser.MAX_PAGE_SIZE * 3))
+        request = messenger_pb2.FetchRequest(self_email="b@gmail.com", limit=ser.MAX_PAGE_SIZE, since_id=10**9)
+        page = conn.stub.Fetch(request)
+        # Everything is skipped, yet the page stays bounded and the cursor continues from there
+        assert not page.messages and len(page.skipped_ids) == ser.MAX_PAGE_SIZE
+        assert page.next_cursor == ser.MAX_PAGE_SIZE and page.has_more
+
+        request.cursor, request.since_id = page.next_cursor, ser.MAX_PAGE_SIZE + 2
+        page = conn.stub.Fetch(request)
+        assert list(page.skipped_ids) == [ser.MAX_PAGE_SIZE + 1, ser.MAX_PAGE_SIZE + 2]
+        assert len(page.messages) == ser.MAX_PAGE_SIZE - 2
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    for mode in MODES:
+        test_fetch_pages_advance_the_cursor(mode)
+        test_fetch_limit_defaults_and_cap(mode)
+        test_ack_of_a_partial_page(mode)
+        test_skipped_messages_count_toward_the_page(mode)
+    print("OK")
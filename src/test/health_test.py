@@ -0,0 +1,129 @@
+# Add grpc generated folder to path
+import sys
+import os
+import time
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import health
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Replica:
+    def __init__(self, address: str):
+        self.address = address
+
+
+def test_breaker_opens_probes_and_backs_off():
+    clock = FakeClock()
+    tracker = health.HealthTracker(failure_threshold=2, base_backoff=1, max_backoff=3, clock=clock)
+
+    tracker.record_failure("a")
+    assert tracker.allow("a")
+    tracker.record_failure("a")
+    assert not tracker.allow("a")
+
+    clock.now = 1
+    assert tracker.allow("a")       # the probe
+    assert not tracker.allow("a")   # nobody else while it is in flight
+    tracker.record_failure("a")
+    assert tracker.snapshot("a").backoff == 2
+
+    clock.now = 3
+    assert tracker.allow("a")
+    tracker.record_success("a", 5.0)
+    assert tracker.snapshot("a").state is health.BreakerState.CLOSED
+    assert tracker.snapshot("a").backoff == 0
+    assert tracker.allow("a")
+
+
+def test_fastest_prefers_low_latency_and_adds_probes():
+    clock = FakeClock()
+    tracker = health.HealthTracker(failure_threshold=1, base_backoff=1, clock=clock)
+    replicas = [Replica(address) for address in ("slow", "fast", "dead")]
+    tracker.record_success("slow", 50)
+    tracker.record_success("fast", 5)
+    tracker.record_failure("dead")
+
+    assert [r.address for r in tracker.fastest(replicas, 1)] == ["fast"]
+    assert [r.address for r in tracker.fastest(replicas, 3)] == ["fast", "slow"]
+    clock.now = 1
+    assert [r.address for r in tracker.fastest(replicas, 1)] == ["fast", "dead"]
+
+
+def test_lost_probe_is_replaced_after_probe_timeout():
+    clock = FakeClock()
+    tracker = health.HealthTracker(failure_threshold=1, base_backoff=1, probe_timeout=5, clock=clock)
+    tracker.record_failure("a")
+
+    clock.now = 1
+    assert tracker.allow("a")       # a probe whose outcome is never recorded
+    clock.now = 5.9
+    assert not tracker.allow("a")
+    clock.now = 6
+    assert tracker.allow("a")
+    assert not tracker.allow("a")
+
+
+def test_ranked_admits_no_probe():
+    clock = FakeClock()
+    tracker = health.HealthTracker(failure_threshold=1, base_backoff=1, clock=clock)
+    replicas = [Replica(address) for address in ("dead", "slow", "fast")]
+    tracker.record_success("slow", 50)
+    tracker.record_success("fast", 5)
+    tracker.record_failure("dead")
+
+    clock.now = 1
+    assert [r.address for r in tracker.ranked(replicas)] == ["fast", "slow", "dead"]
+    assert tracker.snapshot("dead").state is health.BreakerState.OPEN
+    assert tracker.allow("dead")
+
+def test_fan_out_skips_open_replica():
+    server, port = ser.build_syncronous_server("localhost", 0, ser.MessengerService())
+    server.start()
+    address = f"localhost:{port}"
+    connections, _ = cli.connect_to_servers([address])
+    server.stop(None).wait()
+
+    tracker = health.HealthTracker(failure_threshold=1, base_backoff=60)
+    results = cli.fan_out(connections, "Send", cli.messenger_pb2.SendRequest(id=1), health=tracker)
+    assert results[0].error is not None and not isinstance(results[0].error, health.CircuitOpenError)
+
+    start = time.perf_counter()
+    results = cli.fan_out(connections, "Send", cli.messenger_pb2.SendRequest(id=2), health=tracker)
+    assert time.perf_counter() - start < 0.1
+    assert isinstance(results[0].error, health.CircuitOpenError)
+
+
+if __name__ == '__main__':
+    test_breaker_opens_probes_and_backs_off()
+    test_fastest_prefers_low_latency_and_adds_probes()
+    test_lost_probe_is_replaced_after_probe_timeout()
+    test_ranked_admits_no_probe()
+    test_fan_out_skips_open_replica()
+    print("OK")
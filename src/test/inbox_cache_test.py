@@ -0,0 +1,114 @@
+# Add grpc generated folder to path
+import sys
+import os
+import tempfile
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import inbox_cache
+    from inbox_cache import InboxCache
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def test_cache_persists_and_dedups():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "inbox.sqlite3")
+        cache = InboxCache(path)
+        first = [(2, "b", "x@gmail.com", "me@gmail.com"), (1, "a", "x@gmail.com", "me@gmail.com")]
+        assert cache.add("me@gmail.com", first) == first
+        assert cache.add("me@gmail.com", [first[0], (3, "c", "y@gmail.com", "me@gmail.com")]) == [
+            (3, "c", "y@gmail.com", "me@gmail.com")
+        ]
+        cache.add("other@gmail.com", [(4, "d", "x@gmail.com", "other@gmail.com")])
+        cache.close()
+
+        cache = InboxCache(path)
+        assert [m[0] for m in cache.load("me@gmail.com")] == [1, 2, 3]
+        assert cache.last_id("me@gmail.com") == 3
+        assert cache.last_id("nobody@gmail.com") == 0
+        cache.close()
+
+
+def test_refresh_transfers_only_the_delta():
+    service = ser.MessengerService()
+    server, port = ser.build_syncronous_server("localhost", 0, service)
+    server.start()
+    cache = InboxCache(":memory:")
+    try:
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+        generator = cli.SnowflakeIdGenerator(node_id=1)
+        old, new = generator.next_id(), generator.next_id()
+        # Already delivered by another replica, and cached
+        cache.add("me@gmail.com", [(old, "old", "x@gmail.com", "me@gmail.com")])
+        for id in (old, new):
+            cli.send_messages(id, connections, "hi", "x@gmail.com", "me@gmail.com")
+
+        known = lambda ids: cache.known("me@gmail.com", ids)
+        inboxes = cli.receive_paginated_messages(
+            connections, "me@gmail.com", since_id=old, health=None, known=known
+        )
+        assert [m.id for m in inboxes[0].messages] == [new]
+        # The skipped message was acknowledged along with the rest
+        assert service.store.messages("me@gmail.com") == []
+
+        assert cache.since_id("me@gmail.com") < old
+        assert cache.since_id("me@gmail.com") > old - (2 * inbox_cache.SINCE_ID_MARGIN_MS << 22)
+    finally:
+        cache.close()
+        server.stop(None)
+
+
+def test_skipped_messages_missing_from_the_cache_are_fetched():
+    service = ser.MessengerService()
+    server, port = ser.build_syncronous_server("localhost", 0, service)
+    server.start()
+    cache = InboxCache(":memory:")
+    try:
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+        generator = cli.SnowflakeIdGenerator(node_id=1)
+        cached, late, new = generator.next_id(), generator.next_id(), generator.next_id()
+        cache.add("me@gmail.com", [(cached, "cached", "x@gmail.com", "me@gmail.com")])
+        for id in (cached, late, new):
+            cli.send_messages(id, connections, "hi", "x@gmail.com", "me@gmail.com")
+
+        # late is behind since_id but was never cached, so it must not be acknowledged unseen
+        known = lambda ids: cache.known("me@gmail.com", ids)
+        inboxes = cli.receive_paginated_messages(
+            connections, "me@gmail.com", page_size=2, since_id=late, health=None, known=known
+        )
+        assert {m.id for m in inboxes[0].messages} >= {late, new}
+        assert service.store.messages("me@gmail.com") == []
+
+        # Without known, nothing skipped is taken as cached
+        older, newer = generator.next_id(), generator.next_id()
+        for id in (older, newer):
+            cli.send_messages(id, connections, "hi", "x@gmail.com", "me@gmail.com")
+        inboxes = cli.receive_paginated_messages(connections, "me@gmail.com", since_id=older, health=None)
+        assert [m.id for m in inboxes[0].messages] == [older, newer]
+    finally:
+        cache.close()
+        server.stop(None)
+
+
+if __name__ == '__main__':
+    test_cache_persists_and_dedups()
+    test_refresh_transfers_only_the_delta()
+    test_skipped_messages_missing_from_the_cache_are_fetched()
+    print("OK")
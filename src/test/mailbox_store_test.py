@@ -0,0 +1,102 @@
+# Add grpc generated folder to path
+import sys
+import os
+import threading
+from collections import Counter
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    from mailbox_store import MailboxStore
+    import messenger_pb2
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+SENDERS = 8
+MESSAGES_PER_SENDER = 2000
+RECIPIENTS = [f"user{i}@gmail.com" for i in range(4)]
+
+
+def hammer(store: MailboxStore, receive) -> Counter:
+    """Runs SENDERS threads sending to RECIPIENTS while one receiver per recipient keeps draining."""
+    received = Counter()
+    received_lock = threading.Lock()
+    senders_done = threading.Event()
+
+    def sender(sender_id: int) -> None:
+        for i in range(MESSAGES_PER_SENDER):
+            dest_email = RECIPIENTS[i % len(RECIPIENTS)]
+            store.append(dest_email, messenger_pb2.SendRequest(
+                id=i, msg="stress", self_email=f"sender{sender_id}@gmail.com", dest_email=dest_email
+            ))
+
+    def receiver(email: str) -> None:
+        while True:
+            finished = senders_done.is_set()
+            messages = receive(store, email)
+            with received_lock:
+                received.update((m.id, m.self_email) for m in messages)
+            # Keep going after the senders stopped until the tail is picked up
+            if finished and not messages:
+                break
+
+    senders = [threading.Thread(target=sender, args=(i,)) for i in range(SENDERS)]
+    receivers = [threading.Thread(target=receiver, args=(email,)) for email in RECIPIENTS]
+    for thread in senders + receivers:
+        thread.start()
+    for thread in senders:
+        thread.join()
+    senders_done.set()
+    for thread in receivers:
+        thread.join()
+
+    return received
+
+
+def assert_no_loss(received: Counter) -> None:
+    expected = {(i, f"sender{s}@gmail.com") for s in range(SENDERS) for i in range(MESSAGES_PER_SENDER)}
+    assert set(received) == expected, f"lost {len(expected - set(received))} message(s)"
+    assert max(received.values()) == 1, "message delivered twice"
+
+
+def receive_all(store: MailboxStore, email: str) -> list:
+    return store.drain(email).messages
+
+
+def fetch_and_ack(store: MailboxStore, email: str) -> list:
+    page = store.fetch(email, 0, 50)
+    store.ack(email, page.next_cursor)
+    return page.messages
+
+
+def test_concurrent_send_receive_all_no_loss():
+    assert_no_loss(hammer(MailboxStore(), receive_all))
+
+
+def test_concurrent_send_fetch_ack_no_loss():
+    assert_no_loss(hammer(MailboxStore(), fetch_and_ack))
+
+
+def test_single_stripe_no_loss():
+    assert_no_loss(hammer(MailboxStore(stripes=1), receive_all))
+
+
+if __name__ == '__main__':
+    test_concurrent_send_receive_all_no_loss()
+    test_concurrent_send_fetch_ack_no_loss()
+    test_single_stripe_no_loss()
+    print("OK")
@@ -0,0 +1,89 @@
+# Add grpc generated folder to path
+import sys
+import os
+import gc
+import json
+import argparse
+import subprocess
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+if current_test_dir not in sys.path:
+    sys.path.insert(0, current_test_dir)
+
+try:
+    import messenger_pb2
+    from mailbox_store import MailboxStore
+    from benchmark import read_rss_bytes
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+# Server memory per queued message.
+# Each layout fills its mailboxes in a fresh subprocess and reports the RSS growth divided by the message count:
+#   store: the current MailboxStore
+#   protobuf: a dict of SendRequest lists, how mailboxes were kept before the compact representation
+
+
+def make_message(i: int, mailboxes: int, payload_bytes: int) -> messenger_pb2.SendRequest:
+    return messenger_pb2.SendRequest(
+        id=(1 << 40) + i, msg="x" * payload_bytes,
+        self_email=f"sender{i % 100}@gmail.com", dest_email=f"user{i % mailboxes}@gmail.com"
+    )
+
+
+def fill(layout: str, messages: int, mailboxes: int, payload_bytes: int) -> dict:
+    gc.collect()
+    before = read_rss_bytes(os.getpid())
+
+    if layout == "store":
+        store = MailboxStore()
+        for i in range(messages):
+            message = make_message(i, mailboxes, payload_bytes)
+            store.append(message.dest_email, message)
+    else:
+        store = {}
+        for i in range(messages):
+            message = make_message(i, mailboxes, payload_bytes)
+            store.setdefault(message.dest_email, []).append(message)
+
+    gc.collect()
+    after = read_rss_bytes(os.getpid())
+    return {"layout": layout, "messages": messages, "bytes_per_message": (after - before) / messages}
+
+
+def run_child(layout: str, args) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", layout, f"--messages={args.messages}",
+         f"--mailboxes={args.mailboxes}", f"--payload-bytes={args.payload_bytes}"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bytes of server memory per queued message.")
+    parser.add_argument("--layouts", nargs="+", choices=["store", "protobuf"], default=["protobuf", "store"])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--mailboxes", type=int, default=100)
+    parser.add_argument("--payload-bytes", type=int, default=100, help="Size of each message body")
+    parser.add_argument("--child", choices=["store", "protobuf"], default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(fill(args.child, args.messages, args.mailboxes, args.payload_bytes)))
+    else:
+        for layout in args.layouts:
+            result = run_child(layout, args)
+            print(f"{layout:<9} {result['bytes_per_message']:.0f} bytes/message")
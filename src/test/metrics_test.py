@@ -0,0 +1,72 @@
+# Add grpc generated folder to path
+import sys
+import os
+import urllib.request
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import metrics
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def test_histogram_buckets_and_prometheus_text():
+    registry = metrics.Registry()
+    histogram = registry.histogram("latency_ms", "test latency", ("method",), buckets=(1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value, method="Send")
+    registry.counter("calls_total", "test calls").inc(3)
+
+    text = metrics.render_prometheus(registry)
+    assert 'latency_ms_bucket{method="Send",le="1"} 2' in text
+    assert 'latency_ms_bucket{method="Send",le="10"} 3' in text
+    assert 'latency_ms_bucket{method="Send",le="+Inf"} 4' in text
+    assert 'latency_ms_count{method="Send"} 4' in text
+    assert "calls_total 3" in text
+
+
+def test_interceptors_record_rpcs():
+    exporter = metrics.InMemoryExporter()
+    server, port = ser.build_syncronous_server("localhost", 0, ser.MessengerService())
+    server.start()
+    prometheus = metrics.PrometheusExporter(0).start()
+    try:
+        address = f"localhost:{port}"
+        connections, _ = cli.connect_to_servers([address])
+        server_before = exporter.value("server_rpc_latency_ms_count", method="Send") or 0
+        client_before = exporter.value("client_rpc_latency_ms_count", method="Send", replica=address) or 0
+
+        cli.send_messages(1, connections, "hello", "a@gmail.com", "b@gmail.com")
+        cli.send_messages(2, connections, "hello", "a@gmail.com", "b@gmail.com")
+
+        assert exporter.value("server_rpc_latency_ms_count", method="Send") == server_before + 2
+        assert exporter.value("client_rpc_latency_ms_count", method="Send", replica=address) == client_before + 2
+        assert exporter.value("server_mailbox_depth", mailbox="b@gmail.com") == 2
+
+        with urllib.request.urlopen(f"http://localhost:{prometheus.port}/metrics") as response:
+            assert "server_queued_messages 2" in response.read().decode()
+    finally:
+        prometheus.stop()
+        server.stop(None)
+
+
+if __name__ == '__main__':
+    test_histogram_buckets_and_prometheus_text()
+    test_interceptors_record_rpcs()
+    print("OK")
@@ -0,0 +1,82 @@
+# Add grpc generated folder to path
+import sys
+import os
+import json
+import argparse
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+if current_test_dir not in sys.path:
+    sys.path.insert(0, current_test_dir)
+
+try:
+    import client as cli
+    import benchmark
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+# Throughput against the number of channels per replica (client.ClientConfig.pool_size).
+# The same replicas serve every pool size, and each size runs the benchmark.py user mix for a fixed duration.
+
+
+def sweep(args) -> dict:
+    replicas = benchmark.start_replicas(args.replicas, args.spawn, args.server_mode)
+    results = {}
+    try:
+        for pool_size in args.pool_sizes:
+            config = cli.ClientConfig(pool_size=pool_size)
+            connections, failed = cli.connect_to_servers([replica.address for replica in replicas], config)
+            if failed:
+                raise RuntimeError(f"Failed to connect to: {', '.join(failed)}")
+            try:
+                stats, _, elapsed = benchmark.run_users(
+                    connections, args.users, args.duration, args.send_ratio, args.payload_bytes, args.seed
+                )
+            finally:
+                for conn in connections:
+                    conn.close()
+
+            results[pool_size] = {
+                "msgs_per_s": stats["send"]["ok"] / elapsed if elapsed else 0.0,
+                "send_p99_ms": stats["send"]["p99_ms"],
+                "failed": sum(op["failed"] for op in stats.values()),
+            }
+            print(f"pool_size={pool_size}: {results[pool_size]}")
+    finally:
+        for replica in replicas:
+            replica.stop()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Messenger throughput against channels per replica.")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--replicas", type=int, default=3, help="Number of servers")
+    parser.add_argument("--spawn", choices=["subprocess", "inproc"], default="subprocess",
+                        help="Run servers as subprocesses or inside the benchmark process")
+    parser.add_argument("--server-mode", choices=["sync", "async"], default="async",
+                        help="--mode passed to subprocess servers")
+    parser.add_argument("--users", type=int, default=64, help="Simulated users, one thread each")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of load per pool size")
+    parser.add_argument("--send-ratio", type=float, default=0.9, help="Fraction of operations that are Send")
+    parser.add_argument("--payload-bytes", type=int, default=100, help="Size of each message body")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = sweep(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
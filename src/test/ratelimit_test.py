@@ -0,0 +1,131 @@
+# Add grpc generated folder to path
+import sys
+import os
+
+import grpc
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import health
+    import messenger_pb2
+    from ratelimit import AdmissionControl, RateLimiter, RateLimits
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def send(connections, tracker, id: int, self_email: str, dest_email: str) -> cli.ReplicaResult:
+    request = messenger_pb2.SendRequest(id=id, msg="hi", self_email=self_email, dest_email=dest_email)
+    return cli.fan_out(connections, "Send", request, health=tracker, keys=(self_email, dest_email))[0]
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=2, clock=clock)
+    assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0.5
+    assert limiter.acquire("b") == 0
+
+    clock.now = 0.5
+    assert limiter.acquire("a") == 0
+    # Larger than the burst: waits for a full bucket, then goes into debt
+    clock.now = 10
+    assert limiter.acquire("a", 5) == 0
+    assert limiter.acquire("a") == 2.0
+
+
+def test_rejected_batch_takes_no_tokens_from_other_senders():
+    clock = FakeClock()
+    admission = AdmissionControl(RateLimits(rate=1, burst=2), lambda email: 0, clock)
+    assert admission.senders.acquire("b@gmail.com", 2) == 0
+    batch = [
+        messenger_pb2.SendRequest(id=id, msg="hi", self_email=sender, dest_email="c@gmail.com")
+        for id, sender in enumerate(["a@gmail.com", "b@gmail.com"], 1)
+    ]
+    rejection = admission.check(batch)
+    assert rejection is not None and rejection.key == "b@gmail.com"
+    # a@gmail.com still has its whole burst
+    assert admission.senders.acquire("a@gmail.com", 2) == 0
+
+
+def test_rate_limited_sender_is_backed_off_without_opening_the_breaker():
+    service = ser.MessengerService()
+    server, port = ser.build_syncronous_server(
+        "localhost", 0, service, limits=RateLimits(rate=0.5, burst=2)
+    )
+    server.start()
+    try:
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+        address = connections[0].address
+        tracker = health.HealthTracker()
+
+        assert send(connections, tracker, 1, "spam@gmail.com", "b@gmail.com").ok
+        assert send(connections, tracker, 2, "spam@gmail.com", "b@gmail.com").ok
+        rejected = send(connections, tracker, 3, "spam@gmail.com", "b@gmail.com")
+        assert rejected.error.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        assert 0 < tracker.throttled(address, ["spam@gmail.com"]) <= 2
+
+        # Backed off locally: the next call never reaches the server
+        skipped = send(connections, tracker, 4, "spam@gmail.com", "c@gmail.com")
+        assert isinstance(skipped.error, health.ThrottledError)
+        assert service.store.depth("c@gmail.com") == 0
+
+        # The replica stays healthy for everyone else
+        assert tracker.snapshot(address).state is health.BreakerState.CLOSED
+        assert send(connections, tracker, 5, "polite@gmail.com", "c@gmail.com").ok
+    finally:
+        server.stop(None)
+
+
+def test_full_mailbox_rejects_writes_until_read():
+    service = ser.MessengerService()
+    server, port = ser.build_syncronous_server("localhost", 0, service, limits=RateLimits(max_mailbox_messages=2))
+    server.start()
+    try:
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+        stub = connections[0].stub
+        for id in (1, 2):
+            stub.Send(messenger_pb2.SendRequest(id=id, msg="hi", self_email="a@gmail.com", dest_email="b@gmail.com"))
+        try:
+            stub.Send(messenger_pb2.SendRequest(id=3, msg="hi", self_email="a@gmail.com", dest_email="b@gmail.com"))
+            assert False, "the mailbox should be full"
+        except grpc.RpcError as e:
+            assert e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+            assert health.retry_after_hint(e)[0] == "b@gmail.com"
+
+        stub.ReceiveAll(messenger_pb2.ReceiveRequest(self_email="b@gmail.com"))
+        stub.Send(messenger_pb2.SendRequest(id=3, msg="hi", self_email="a@gmail.com", dest_email="b@gmail.com"))
+        assert service.store.depth("b@gmail.com") == 1
+    finally:
+        server.stop(None)
+
+
+if __name__ == '__main__':
+    test_token_bucket_refills_over_time()
+    test_rejected_batch_takes_no_tokens_from_other_senders()
+    test_rate_limited_sender_is_backed_off_without_opening_the_breaker()
+    test_full_mailbox_rejects_writes_until_read()
+    print("OK")
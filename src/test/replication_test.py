@@ -0,0 +1,154 @@
+# Add grpc generated folder to path
+import sys
+import os
+import socket
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import messenger_pb2
+    import replication
+    from replication import Replicator, PeerLink
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(service: ser.MessengerService, port: int = 0):
+    server, port = ser.build_syncronous_server("localhost", port, service)
+    server.start()
+    return server, f"localhost:{port}"
+
+
+def test_follower_skips_resent_batches():
+    service = ser.MessengerService()
+    batch = messenger_pb2.ReplicateBatch(leader_id="leader", sequence=1, messages=[
+        messenger_pb2.SendRequest(id=1, msg="hello", self_email="x@gmail.com", dest_email="dest@gmail.com")
+    ])
+
+    assert service.apply_replicated(batch).sequence == 1
+    assert service.apply_replicated(batch).sequence == 1
+    assert len(service.store.messages("dest@gmail.com")) == 1
+
+
+def test_leader_replicates_client_writes():
+    followers = [ser.MessengerService() for _ in range(2)]
+    servers, addresses = zip(*(start_server(service) for service in followers))
+
+    # The second follower comes up only after the leader has accepted writes
+    late_port = free_port()
+    late = ser.MessengerService()
+    replicator = Replicator(list(addresses) + [f"localhost:{late_port}"], max_batch=8).start()
+    leader = ser.MessengerService(replicator=replicator)
+    leader_server, leader_address = start_server(leader)
+    late_server = None
+    try:
+        connections, failed = cli.connect_to_servers([leader_address])
+        assert not failed
+        for i in range(20):
+            assert cli.send_messages(i, connections, f"msg {i}", "x@gmail.com", "dest@gmail.com") == []
+        coalescer = cli.SendCoalescer(connections)
+        pending = [coalescer.submit(i, f"msg {i}", "x@gmail.com", "dest@gmail.com") for i in range(20, 40)]
+        coalescer.close()
+        assert all(future.result(timeout=5) == [] for future in pending)
+
+        late_server, _ = start_server(late, late_port)
+        assert replicator.wait_idle(timeout=10)
+
+        for service in followers + [late, leader]:
+            assert [m.id for m in service.store.messages("dest@gmail.com")] == list(range(40))
+    finally:
+        leader_server.stop(None)
+        leader.close()
+        for server in servers + ((late_server,) if late_server else ()):
+            server.stop(None)
+
+
+
+def test_client_writes_to_every_replica_are_queued_once():
+    follower = ser.MessengerService()
+    follower_server, follower_address = start_server(follower)
+    replicator = Replicator([follower_address]).start()
+    leader = ser.MessengerService(replicator=replicator)
+    leader_server, leader_address = start_server(leader)
+    try:
+        connections, failed = cli.connect_to_servers([leader_address, follower_address])
+        assert not failed
+        for i in range(1, 11):
+            assert cli.send_messages(i, connections, f"msg {i}", "x@gmail.com", "dest@gmail.com") == []
+        assert replicator.wait_idle(timeout=10)
+
+        for service in (leader, follower):
+            assert [m.id for m in service.store.messages("dest@gmail.com")] == list(range(1, 11))
+    finally:
+        leader_server.stop(None)
+        leader.close()
+        follower_server.stop(None)
+
+
+def test_client_with_a_leader_writes_once():
+    follower = ser.MessengerService()
+    follower_server, follower_address = start_server(follower)
+    replicator = Replicator([follower_address]).start()
+    leader = ser.MessengerService(replicator=replicator)
+    leader_server, leader_address = start_server(leader)
+    try:
+        config = cli.ClientConfig(write_addresses=(leader_address,))
+        connections, failed = cli.connect_to_servers([leader_address, follower_address], config)
+        assert not failed
+        writers = config.write_connections(connections)
+        assert [conn.address for conn in writers] == [leader_address]
+
+        for i in range(1, 6):
+            assert cli.send_messages(i, writers, f"msg {i}", "x@gmail.com", "dest@gmail.com") == []
+        assert replicator.wait_idle(timeout=10)
+
+        # Reads still cover every replica
+        inboxes = cli.receive_paginated_messages(connections, "dest@gmail.com", health=None)
+        assert all([m.id for m in inbox.messages] == list(range(1, 6)) for inbox in inboxes)
+
+        # Without a connected leader, every replica is written
+        assert config.write_connections(connections[1:]) == connections[1:]
+    finally:
+        leader_server.stop(None)
+        leader.close()
+        follower_server.stop(None)
+
+
+def test_pending_messages_are_bounded():
+    link = PeerLink(f"localhost:{free_port()}", "leader", max_pending=5)
+    dropped = replication.DROPPED_MESSAGES.value(peer=link.address)
+    link.enqueue([messenger_pb2.SendRequest(id=i, dest_email="dest@gmail.com") for i in range(8)])
+
+    assert link.lag() == 5
+    assert replication.DROPPED_MESSAGES.value(peer=link.address) - dropped == 3
+    # The newest messages are kept
+    assert [m.id for m in link._pending] == [3, 4, 5, 6, 7]
+
+if __name__ == '__main__':
+    test_follower_skips_resent_batches()
+    test_leader_replicates_client_writes()
+    test_client_writes_to_every_replica_are_queued_once()
+    test_client_with_a_leader_writes_once()
+    test_pending_messages_are_bounded()
+    print("OK")
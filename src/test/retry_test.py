@@ -0,0 +1,153 @@
+# Add grpc generated folder to path
+import sys
+import os
+import time
+from concurrent import futures
+
+import grpc
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import health
+    import messenger_pb2
+    import messenger_pb2_grpc
+    from retry import RetryBudget, RetryPolicy, HedgePolicy
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code: grpc.StatusCode):
+        self._code = code
+
+    def code(self) -> grpc.StatusCode:
+        return self._code
+
+
+class FaultInterceptor(grpc.ServerInterceptor):
+    """Runs method normally, but sleeps delay seconds first, then fails the first failures calls with UNAVAILABLE."""
+
+    def __init__(self, method: str, failures: int = 0, delay: float = 0):
+        self.method = method
+        self.failures = failures
+        self.delay = delay
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.endswith("/" + self.method):
+            return handler
+        behavior = handler.unary_unary
+
+        def faulty(request, context):
+            time.sleep(self.delay)
+            response = behavior(request, context)
+            if self.failures:
+                # The write went through, only its answer is lost
+                self.failures -= 1
+                context.abort(grpc.StatusCode.UNAVAILABLE, "Connection reset")
+            return response
+
+        return grpc.unary_unary_rpc_method_handler(faulty, handler.request_deserializer, handler.response_serializer)
+
+
+def start_server(service: ser.MessengerService, interceptor: FaultInterceptor) -> tuple[grpc.Server, int]:
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), interceptors=[interceptor])
+    messenger_pb2_grpc.add_MessengerServiceServicer_to_server(service, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    return server, port
+
+
+def test_backoff_and_budget():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.3, budget=RetryBudget(max_tokens=4, token_ratio=0.5))
+    assert all(0 <= policy.backoff(attempt) <= 0.3 for attempt in range(1, 10) for _ in range(20))
+
+    unavailable = FakeRpcError(grpc.StatusCode.UNAVAILABLE)
+    not_found = FakeRpcError(grpc.StatusCode.NOT_FOUND)
+    assert policy.should_retry(unavailable, 1) and not policy.should_retry(unavailable, 3)
+    assert not policy.should_retry(not_found, 1)
+
+    # Two failures spend half the budget, and retries stop until successes earn it back
+    policy.record(unavailable)
+    policy.record(unavailable)
+    assert not policy.should_retry(unavailable, 1)
+    policy.record(None)
+    assert policy.should_retry(unavailable, 1)
+
+
+def test_lost_answer_is_retried_and_queued_once():
+    service = ser.MessengerService()
+    interceptor = FaultInterceptor("Send", failures=2)
+    server, port = start_server(service, interceptor)
+    try:
+        connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+        tracker = health.HealthTracker()
+        policy = RetryPolicy(base_delay=0.01, budget=None)
+
+        request = messenger_pb2.SendRequest(id=7, msg="hi", self_email="a@gmail.com", dest_email="b@gmail.com")
+        results = cli.fan_out(connections, "Send", request, health=tracker, retry=policy)
+        assert results[0].ok and results[0].attempts == 3
+        assert service.store.depth("b@gmail.com") == 1
+
+        # Without retries the first failure is final
+        interceptor.failures = 1
+        failed = cli.send_messages(8, connections, "hi", "a@gmail.com", "b@gmail.com", retry=None)
+        assert failed == [connections[0].address]
+        assert cli.send_messages(8, connections, "hi", "a@gmail.com", "b@gmail.com") == []
+        assert service.store.depth("b@gmail.com") == 2
+
+    finally:
+        server.stop(None)
+
+
+def test_slow_read_is_hedged_on_a_spare():
+    services = [ser.MessengerService() for _ in range(2)]
+    slow, slow_port = start_server(services[0], FaultInterceptor("Fetch", delay=1))
+    fast, fast_port = start_server(services[1], FaultInterceptor("Fetch"))
+    try:
+        connections, _ = cli.connect_to_servers([f"localhost:{slow_port}", f"localhost:{fast_port}"])
+        cli.send_messages(1, connections, "hi", "a@gmail.com", "b@gmail.com")
+
+        # The slow replica looks like the fastest one, with a p95 of 5 ms
+        tracker = health.HealthTracker()
+        for _ in range(20):
+            tracker.record_success(connections[0].address, 5)
+            tracker.record_success(connections[1].address, 50)
+
+        start = time.perf_counter()
+        inboxes = cli.receive_paginated_messages(
+            connections, "b@gmail.com", quorum=cli.Quorum.FIRST, health=tracker, hedge=HedgePolicy()
+        )
+        assert time.perf_counter() - start < 1
+        assert inboxes[0] is None and [m.id for m in inboxes[1].messages] == [1]
+
+        # The read that lost the race is not acknowledged, so the slow replica keeps the message
+        assert services[1].store.depth("b@gmail.com") == 0
+        time.sleep(1.5)
+        assert services[0].store.depth("b@gmail.com") == 1
+    finally:
+        slow.stop(None)
+        fast.stop(None)
+
+
+if __name__ == '__main__':
+    test_backoff_and_budget()
+    test_lost_answer_is_retried_and_queued_once()
+    test_slow_read_is_hedged_on_a_spare()
+    print("OK")
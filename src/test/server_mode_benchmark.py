@@ -0,0 +1,134 @@
+# Add grpc generated folder to path
+import sys
+import os
+import time
+import json
+import socket
+import asyncio
+import argparse
+import subprocess
+import statistics
+
+import grpc
+import grpc.aio
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import messenger_pb2
+    import messenger_pb2_grpc
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+# Compares the thread pool server (--mode sync) with the grpc.aio server (--mode async).
+# Each mode runs as a subprocess. The benchmark first opens idle ReceiveStream subscriptions, which
+# hold on to a worker in sync mode, then measures Send throughput and latency with many concurrent calls.
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(comm_dir, "server.py"), "--ip=localhost", f"--port={port}", f"--mode={mode}"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    channel = grpc.insecure_channel(f"localhost:{port}")
+    grpc.channel_ready_future(channel).result(timeout=10)
+    channel.close()
+    return process
+
+
+async def run_load(port: int, streams: int, calls: int, concurrency: int, timeout: float) -> dict:
+    async with grpc.aio.insecure_channel(f"localhost:{port}") as channel:
+        stub = messenger_pb2_grpc.MessengerServiceStub(channel)
+
+        # Idle subscriptions, one per simulated online user
+        subscriptions = [
+            stub.ReceiveStream(messenger_pb2.ReceiveRequest(self_email=f"idle{i}@gmail.com"))
+            for i in range(streams)
+        ]
+        await asyncio.sleep(0.5)
+
+        latencies = []
+        failures = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_one(i: int) -> None:
+            nonlocal failures
+            request = messenger_pb2.SendRequest(
+                id=i, msg="benchmark", self_email="bench@gmail.com", dest_email=f"user{i % 100}@gmail.com"
+            )
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await stub.Send(request, timeout=timeout)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except grpc.aio.AioRpcError:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send_one(i) for i in range(calls)))
+        elapsed = time.perf_counter() - start
+
+        for subscription in subscriptions:
+            subscription.cancel()
+        # Let the cancellations finish before the channel closes
+        await asyncio.gather(*(subscription.code() for subscription in subscriptions))
+
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "failed": failures,
+        "msgs_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] if latencies else None,
+    }
+
+
+async def benchmark(modes: list[str], streams: int, calls: int, concurrency: int, timeout: float) -> dict:
+    # Every mode shares one event loop: grpc.aio keeps per-loop state, and a second asyncio.run would leave the
+    # first loop's callbacks firing on a closed loop
+    results = {}
+    for mode in modes:
+        port = free_port()
+        process = start_server(mode, port)
+        try:
+            results[mode] = await run_load(port, streams, calls, concurrency, timeout)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"[{mode}] {results[mode]}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare sync and async server modes.")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--streams", type=int, default=20, help="Idle ReceiveStream subscriptions held open")
+    parser.add_argument("--calls", type=int, default=5000, help="Send RPCs issued")
+    parser.add_argument("--concurrency", type=int, default=500, help="Send RPCs in flight at once")
+    parser.add_argument("--timeout", type=float, default=5, help="Deadline of each Send in seconds")
+    parser.add_argument("--output", type=str, default=None, help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args.modes, args.streams, args.calls, args.concurrency, args.timeout))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
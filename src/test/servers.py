@@ -0,0 +1,66 @@
+# Add grpc generated folder to path
+import sys
+import os
+import asyncio
+import threading
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import server as ser
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+# Test helper: runs a MessengerService in either server mode (--mode sync or --mode async) on a free port
+MODES = ("sync", "async")
+
+
+class RunningServer:
+    def __init__(self, mode: str, service: ser.MessengerService, **kwargs):
+        self.mode = mode
+        self.service = service
+        if mode == "sync":
+            self._server, self.port = ser.build_syncronous_server("localhost", 0, service, **kwargs)
+            self._server.start()
+            return
+
+        # grpc.aio servers live on an event loop, here one running on its own thread
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._server, self.port = asyncio.run_coroutine_threadsafe(self._start(kwargs), self._loop).result()
+
+    async def _start(self, kwargs: dict):
+        server, port = ser.build_asynchronous_server("localhost", 0, self.service, **kwargs)
+        await server.start()
+        return server, port
+
+    @property
+    def address(self) -> str:
+        return f"localhost:{self.port}"
+
+    def stop(self) -> None:
+        if self.mode == "sync":
+            self._server.stop(None)
+            return
+        asyncio.run_coroutine_threadsafe(self._server.stop(None), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def start_server(mode: str, service: ser.MessengerService | None = None, **kwargs) -> RunningServer:
+    return RunningServer(mode, service if service is not None else ser.MessengerService(), **kwargs)
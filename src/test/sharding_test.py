@@ -0,0 +1,139 @@
+# Add grpc generated folder to path
+import sys
+import os
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import grpc
+    import client as cli
+    import server as ser
+    import sharding
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+EMAILS = [f"user{i}@gmail.com" for i in range(200)]
+
+
+def test_ring_moves_only_the_new_groups_share():
+    ring = sharding.HashRing(["a", "b", "c"])
+    before = {email: ring.owner(email) for email in EMAILS}
+    assert set(before.values()) == {"a", "b", "c"}
+
+    ring.add("d")
+    after = {email: ring.owner(email) for email in EMAILS}
+    moved = [email for email in EMAILS if before[email] != after[email]]
+    assert all(after[email] == "d" for email in moved)
+    assert 0 < len(moved) < len(EMAILS) / 2
+
+    ring.remove("d")
+    assert {email: ring.owner(email) for email in EMAILS} == before
+
+
+class FlakyService(ser.MessengerService):
+    """Fails the Fetch calls of the mailboxes in failing."""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = set()
+
+    def Fetch(self, request, context):
+        if request.self_email in self.failing:
+            context.abort(grpc.StatusCode.UNAVAILABLE, "Connection reset")
+        return super().Fetch(request, context)
+
+
+def start_group(name: str) -> tuple:
+    service = FlakyService()
+    server, port = ser.build_syncronous_server("localhost", 0, service)
+    server.start()
+    connections, _ = cli.connect_to_servers([f"localhost:{port}"])
+    return server, service, connections
+
+
+def test_sharded_messenger_routes_and_rebalances():
+    groups = {name: start_group(name) for name in ("a", "b", "c")}
+    messenger = sharding.ShardedMessenger({name: group[2] for name, group in groups.items()})
+    try:
+        for i, email in enumerate(EMAILS):
+            assert messenger.send_messages(cli.ID_GENERATOR.next_id(), f"msg {i}", "x@gmail.com", email) == []
+
+        # Each mailbox lives only on its owner
+        for name, (_, service, _) in groups.items():
+            owned = [email for email in EMAILS if messenger.ring.owner(email) == name]
+            assert set(service.store.depths()) == set(owned)
+
+        groups["d"] = start_group("d")
+        messenger.add_group("d", groups["d"][2])
+        moved = [email for email in EMAILS if messenger.ring.owner(email) == "d"]
+        assert moved
+
+        # Before the migration, reads still find the messages on the previous owner
+        inboxes = messenger.receive_paginated_messages(moved[0])
+        assert len(cli.extract_receive_all_unique_responses(inboxes)) == 1
+
+        # A mailbox that fails to move stays where it was, without stopping the others
+        for _, service, _ in groups.values():
+            service.failing = {moved[1]}
+        assert messenger.migrate() == len(moved) - 2
+        assert [email for _, email in messenger.unmoved] == [moved[1]]
+        assert groups["d"][1].store.depth(moved[1]) == 0
+        assert sum(service.store.depth(moved[1]) for _, service, _ in groups.values()) == 1
+
+        for _, service, _ in groups.values():
+            service.failing = set()
+        assert messenger.migrate() == 1
+        assert messenger.unmoved == []
+        messenger.finish_rebalance()
+        assert set(groups["d"][1].store.depths()) == set(moved[1:])
+        for email in moved[1:]:
+            inboxes = messenger.receive_all_messages(email)
+            assert len(cli.extract_receive_all_unique_responses(inboxes)) == 1
+    finally:
+        for server, service, connections in groups.values():
+            server.stop(None)
+
+
+
+def test_mailboxes_moving_back_are_not_lost():
+    groups = {"a": start_group("a")}
+    messenger = sharding.ShardedMessenger({"a": groups["a"][2]})
+    emails = EMAILS[:50]
+    try:
+        for i, email in enumerate(emails):
+            assert messenger.send_messages(cli.ID_GENERATOR.next_id(), f"msg {i}", "x@gmail.com", email) == []
+
+        groups["d"] = start_group("d")
+        messenger.add_group("d", groups["d"][2])
+        moved = messenger.migrate()
+        messenger.finish_rebalance()
+        assert 0 < moved < len(emails)
+
+        # The same messages come back to a, which has seen their ids before
+        messenger.remove_group("d")
+        assert messenger.migrate() == moved
+        messenger.finish_rebalance()
+        assert sum(groups["a"][1].store.depths().values()) == len(emails)
+    finally:
+        for server, service, connections in groups.values():
+            server.stop(None)
+
+if __name__ == '__main__':
+    test_ring_moves_only_the_new_groups_share()
+    test_sharded_messenger_routes_and_rebalances()
+    test_mailboxes_moving_back_are_not_lost()
+    print("OK")
@@ -0,0 +1,129 @@
+# Add grpc generated folder to path
+import sys
+import os
+import threading
+import time
+
+import grpc
+import pytest
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import client as cli
+    import server as ser
+    import messenger_pb2
+    from servers import MODES, start_server
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+class Inbox:
+    """on_message / on_error callbacks of an InboxSubscription."""
+
+    def __init__(self):
+        self.messages = []
+        self.errors = []
+        self.changed = threading.Condition()
+
+    def on_message(self, message: tuple[int, str, str, str]) -> None:
+        with self.changed:
+            self.messages.append(message)
+            self.changed.notify_all()
+
+    def on_error(self, address: str, error: grpc.RpcError) -> None:
+        with self.changed:
+            self.errors.append(error)
+            self.changed.notify_all()
+
+    def wait(self, predicate, timeout: float = 5) -> bool:
+        with self.changed:
+            return self.changed.wait_for(predicate, timeout)
+
+
+def subscribe(connections, email: str) -> tuple[cli.InboxSubscription, Inbox]:
+    inbox = Inbox()
+    subscription = cli.InboxSubscription(connections, email, inbox.on_message, inbox.on_error)
+    subscription.start()
+    return subscription, inbox
+
+
+def wait_until(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_subscription_gets_queued_then_pushed_messages(mode: str):
+    server = start_server(mode)
+    service = server.service
+    try:
+        connections, _ = cli.connect_to_servers([server.address])
+        cli.send_messages(1, connections, "while offline", "a@gmail.com", "b@gmail.com")
+
+        subscription, inbox = subscribe(connections, "b@gmail.com")
+        assert inbox.wait(lambda: len(inbox.messages) == 1)
+        cli.send_messages(2, connections, "while online", "a@gmail.com", "b@gmail.com")
+        assert inbox.wait(lambda: len(inbox.messages) == 2)
+        assert [(id, msg) for id, msg, _, _ in inbox.messages] == [(1, "while offline"), (2, "while online")]
+
+        # Written to the stream, so nothing is queued again when it closes
+        subscription.cancel()
+        assert wait_until(lambda: not service.store._subscribers)
+        assert service.store.depth("b@gmail.com") == 0
+    finally:
+        server.stop()
+
+
+def test_streams_past_the_cap_are_rejected_without_starving_other_rpcs():
+    # Thread pool server only, the async one has no worker to hold
+    streams = ser.const_max_workers + 2
+    server = start_server("sync", max_streams=streams)
+    service = server.service
+    subscriptions = []
+    try:
+        connections, _ = cli.connect_to_servers([server.address])
+        for i in range(streams):
+            subscriptions.append(subscribe(connections, f"user{i}@gmail.com")[0])
+        assert wait_until(lambda: len(service.store._subscribers) == streams)
+
+        extra, inbox = subscribe(connections, "late@gmail.com")
+        subscriptions.append(extra)
+        assert inbox.wait(lambda: inbox.errors)
+        assert inbox.errors[0].code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+
+        # Every stream holds a worker, yet unary calls still get one
+        stub = connections[0].stub
+        response = stub.Send(
+            messenger_pb2.SendRequest(id=1, msg="hi", self_email="a@gmail.com", dest_email="late@gmail.com"),
+            timeout=1
+        )
+        assert response.success
+        page = stub.Fetch(messenger_pb2.FetchRequest(self_email="late@gmail.com"), timeout=1)
+        assert [m.id for m in page.messages] == [1]
+    finally:
+        for subscription in subscriptions:
+            subscription.cancel()
+        server.stop()
+
+
+if __name__ == '__main__':
+    for mode in MODES:
+        test_subscription_gets_queued_then_pushed_messages(mode)
+    test_streams_past_the_cap_are_rejected_without_starving_other_rpcs()
+    print("OK")
@@ -0,0 +1,147 @@
+# Add grpc generated folder to path
+import sys
+import os
+import tempfile
+import queue
+
+
+current_test_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_test_dir)
+comm_dir = os.path.join(src_dir, "comm")
+generated_code_dir = os.path.join(comm_dir, "grpc_messenger")
+
+# Ensure the imports are based on the location of the py file
+if comm_dir not in sys.path:
+    sys.path.insert(0, comm_dir)
+if generated_code_dir not in sys.path:
+    sys.path.insert(0, generated_code_dir)
+
+try:
+    import server as ser
+    import wal as wal_log
+    from mailbox_store import MailboxStore
+    import messenger_pb2
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print(f"Debug: sys.path is currently: {sys.path}")
+    sys.exit(1)
+
+
+
+def open_service(data_dir: str) -> ser.MessengerService:
+    return ser.MessengerService(MailboxStore(wal=wal_log.WriteAheadLog(data_dir, flush_interval=0.01)))
+
+
+def send(service: ser.MessengerService, id: int, dest_email: str) -> None:
+    service.Send(messenger_pb2.SendRequest(
+        id=id, msg=f"message {id}", self_email="sender@gmail.com", dest_email=dest_email
+    ), None)
+
+
+def mailbox_ids(service: ser.MessengerService, email: str) -> list[int]:
+    return [message.id for message in service.store.messages(email)]
+
+
+def test_replay_after_restart():
+    with tempfile.TemporaryDirectory() as data_dir:
+        service = open_service(data_dir)
+        for id in range(10):
+            send(service, id, "a@gmail.com")
+        send(service, 100, "b@gmail.com")
+        service.Ack(messenger_pb2.AckRequest(self_email="a@gmail.com", cursor=4), None)
+        inbox = service.ReceiveAll(messenger_pb2.ReceiveRequest(self_email="b@gmail.com"), None)
+        assert [message.id for message in inbox.messages] == [100]
+        service.close()
+
+        service = open_service(data_dir)
+        assert mailbox_ids(service, "a@gmail.com") == list(range(4, 10))
+        assert mailbox_ids(service, "b@gmail.com") == []
+        assert service.store.offset("a@gmail.com") == 4
+        service.close()
+
+
+def test_replay_after_compaction():
+    with tempfile.TemporaryDirectory() as data_dir:
+        service = open_service(data_dir)
+        for id in range(5):
+            send(service, id, "a@gmail.com")
+        service.Ack(messenger_pb2.AckRequest(self_email="a@gmail.com", cursor=2), None)
+        service.store.compact()
+        send(service, 5, "a@gmail.com")
+        service.close()
+
+        service = open_service(data_dir)
+        assert mailbox_ids(service, "a@gmail.com") == [2, 3, 4, 5]
+        assert service.store.offset("a@gmail.com") == 2
+        service.close()
+
+
+def test_tombstones_survive_compaction():
+    with tempfile.TemporaryDirectory() as data_dir:
+        service = open_service(data_dir)
+        for id in range(3):
+            send(service, id, "a@gmail.com")
+        service.ReceiveAll(messenger_pb2.ReceiveRequest(self_email="a@gmail.com"), None)
+        service.store.compact()
+        service.close()
+
+        # A peer still holding the delivered messages cannot bring them back after a restart
+        service = open_service(data_dir)
+        peer_copy = [
+            messenger_pb2.SendRequest(id=id, msg=f"message {id}", self_email="sender@gmail.com", dest_email="a@gmail.com")
+            for id in range(4)
+        ]
+        assert service.store.merge("a@gmail.com", peer_copy) == 1
+        assert mailbox_ids(service, "a@gmail.com") == [3]
+        service.close()
+
+def test_torn_tail_is_dropped():
+    with tempfile.TemporaryDirectory() as data_dir:
+        service = open_service(data_dir)
+        for id in range(3):
+            send(service, id, "a@gmail.com")
+        service.close()
+
+        # Simulate a crash in the middle of a write
+        with open(os.path.join(data_dir, wal_log.LOG_FILE), "ab") as f:
+            f.write(wal_log.encode_record(wal_log.OP_APPEND, b"partial record")[:-4])
+
+        service = open_service(data_dir)
+        send(service, 3, "a@gmail.com")
+        service.close()
+
+        service = open_service(data_dir)
+        assert mailbox_ids(service, "a@gmail.com") == [0, 1, 2, 3]
+        service.close()
+
+
+def test_pushed_messages_are_requeued_unless_written():
+    with tempfile.TemporaryDirectory() as data_dir:
+        service = open_service(data_dir)
+        send(service, 1, "a@gmail.com")
+        stream = queue.Queue()
+        assert [m.id for m in service.store.subscribe("a@gmail.com", stream)] == [1]
+        send(service, 2, "a@gmail.com")
+        send(service, 3, "a@gmail.com")
+        assert stream.qsize() == 2
+        service.store.compact()
+        service.store.delivered("a@gmail.com", [1, 2])
+        # Stops without closing the stream, as in a crash
+        service.close()
+
+        service = open_service(data_dir)
+        assert mailbox_ids(service, "a@gmail.com") == [3]
+        service.close()
+
+        service = open_service(data_dir)
+        assert mailbox_ids(service, "a@gmail.com") == [3]
+        service.close()
+
+
+if __name__ == '__main__':
+    test_replay_after_restart()
+    test_replay_after_compaction()
+    test_tombstones_survive_compaction()
+    test_torn_tail_is_dropped()
+    test_pushed_messages_are_requeued_unless_written()
+    print("OK")
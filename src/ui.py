@@ -7,10 +7,12 @@ import sys
 import os
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QListWidget, QTextEdit, QMessageBox,
-    QSplitter, QFrame, QListWidgetItem
+    QLabel, QLineEdit, QPushButton, QListWidget, QListView, QTextEdit, QMessageBox,
+    QSplitter, QFrame, QComboBox
+)
+from PyQt6.QtCore import (
+    Qt, QTimer, QObject, QRunnable, QThreadPool, QAbstractListModel, QModelIndex, pyqtSignal
 )
-from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont
 
 # Add comm folder to path for imports
@@ -22,6 +24,117 @@ if grpc_dir not in sys.path:
     sys.path.insert(0, grpc_dir)
 
 import client as cli
+from inbox_cache import InboxCache
+
+
+class WorkerSignals(QObject):
+    """Signals of a Worker. QRunnable is not a QObject, so they live in a separate object."""
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """Runs a blocking client call on the QThreadPool and reports its outcome through signals."""
+    
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        # Lifetime is managed by _workers, not by the thread pool
+        self.setAutoDelete(False)
+    
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+# Workers in flight, so their signals are not garbage collected before being delivered
+_workers = set()
+
+
+def run_in_background(fn, *args, on_result=None, on_error=None, **kwargs) -> Worker:
+    """
+        Schedules fn(*args, **kwargs) on the global thread pool. The callbacks are connected to
+        queued signals, so they run on the GUI thread once the call finishes.
+    """
+    worker = Worker(fn, *args, **kwargs)
+    if on_result is not None:
+        worker.signals.result.connect(on_result)
+    if on_error is not None:
+        worker.signals.error.connect(on_error)
+    _workers.add(worker)
+    worker.signals.finished.connect(lambda: _workers.discard(worker))
+    QThreadPool.globalInstance().start(worker)
+    return worker
+
+
+# Read quorums offered in the server window. Below "all", the replicas left unread are spares for hedged reads
+READ_QUORUMS = {
+    "Todas": cli.Quorum.ALL,
+    "Maioria": cli.Quorum.MAJORITY,
+    "Primeira": cli.Quorum.FIRST,
+}
+
+
+def fetch_unique_messages(
+        connections: list[cli.ServerConnection], email: str, cache: InboxCache | None = None,
+        quorum: cli.Quorum = cli.Quorum.ALL
+    ) -> list[tuple[int, str, str, str]]:
+    """With a cache, only messages newer than what it holds are transferred, and only the uncached ones are returned."""
+    since_id, known = 0, None
+    if cache is not None:
+        since_id = cache.since_id(email)
+        known = lambda ids: cache.known(email, ids)
+    inbox_responses = cli.receive_paginated_messages(
+        connections, email, quorum=quorum, since_id=since_id, known=known
+    )
+    messages = cli.extract_receive_all_unique_responses(inbox_responses)
+    return cache.add(email, messages) if cache is not None else messages
+
+
+class InboxModel(QAbstractListModel):
+    """
+        Inbox messages for a QListView, which only asks for the rows it is showing.
+        Keeps every message received so far, keyed by its globally unique id, so the same message
+        coming back from a refresh or from another replica is never added twice.
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.messages = []
+        self.seen = set()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        msg_id, msg_text, sender_email, dest_email = self.messages[index.row()]
+        return f"📧 De: {sender_email}\n   {msg_text}"
+    
+    def add_messages(self, messages: list[tuple[int, str, str, str]]) -> int:
+        """Appends the messages not seen before as a single row insertion. Returns how many were new."""
+        new = []
+        for message in messages:
+            if message[0] not in self.seen:
+                self.seen.add(message[0])
+                new.append(message)
+        if new:
+            first = len(self.messages)
+            self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+            self.messages.extend(new)
+            self.endInsertRows()
+        return len(new)
 
 
 class ServerConfigWindow(QMainWindow):
@@ -103,6 +216,40 @@ class ServerConfigWindow(QMainWindow):
         email_layout.addWidget(self.email_input)
         layout.addLayout(email_layout)
         
+        # Read quorum
+        quorum_layout = QHBoxLayout()
+        quorum_label = QLabel("Ler de:")
+        quorum_label.setFont(QFont("Arial", 11, QFont.Weight.Bold))
+        quorum_layout.addWidget(quorum_label)
+        
+        self.quorum_input = QComboBox()
+        self.quorum_input.addItems(list(READ_QUORUMS))
+        self.quorum_input.setToolTip("Abaixo de todas, as réplicas não lidas são reservas para leituras lentas (hedge)")
+        quorum_layout.addWidget(self.quorum_input)
+        layout.addLayout(quorum_layout)
+        
+        # Replication leader: with one, messages are only written to it and it replicates them
+        leader_layout = QHBoxLayout()
+        leader_label = QLabel("Líder:")
+        leader_label.setFont(QFont("Arial", 11, QFont.Weight.Bold))
+        leader_layout.addWidget(leader_label)
+        
+        self.leader_input = QLineEdit()
+        self.leader_input.setPlaceholderText("IP:Porta do líder (opcional, escreve em todos se vazio)")
+        leader_layout.addWidget(self.leader_input)
+        layout.addLayout(leader_layout)
+        
+        # Snowflake node id: messages are identified by id alone, so each client needs its own
+        node_layout = QHBoxLayout()
+        node_label = QLabel("Nó:")
+        node_label.setFont(QFont("Arial", 11, QFont.Weight.Bold))
+        node_layout.addWidget(node_label)
+        
+        self.node_input = QLineEdit()
+        self.node_input.setPlaceholderText(f"0-{cli.SnowflakeIdGenerator.MAX_NODE}, único por cliente (aleatório se vazio)")
+        node_layout.addWidget(self.node_input)
+        layout.addLayout(node_layout)
+        
         # Connect button
         self.connect_btn = QPushButton("Conectar")
         self.connect_btn.setFont(QFont("Arial", 12, QFont.Weight.Bold))
@@ -155,11 +302,34 @@ class ServerConfigWindow(QMainWindow):
             QMessageBox.warning(self, "Aviso", "Digite seu email.")
             return
         
+        node = self.node_input.text().strip()
+        if node and not (node.isdigit() and int(node) <= cli.SnowflakeIdGenerator.MAX_NODE):
+            QMessageBox.warning(self, "Aviso", f"O nó deve ser um número de 0 a {cli.SnowflakeIdGenerator.MAX_NODE}.")
+            return
+        
         self.status_label.setText("Conectando...")
         self.status_label.setStyleSheet("color: orange;")
-        QApplication.processEvents()
-        
-        connections, failed = cli.connect_to_servers(self.servers)
+        self.connect_btn.setEnabled(False)
+        
+        leader = self.leader_input.text().strip()
+        self.pending_email = email
+        self.pending_config = cli.ClientConfig(
+            write_addresses=(leader,) if leader else (), node_id=int(node) if node else None
+        )
+        run_in_background(
+            cli.connect_to_servers, list(self.servers), self.pending_config,
+            on_result=self.on_connected, on_error=self.on_connect_error
+        )
+    
+    def on_connect_error(self, error: str):
+        self.connect_btn.setEnabled(True)
+        self.status_label.setText(f"Erro: {error}")
+        self.status_label.setStyleSheet("color: red;")
+    
+    def on_connected(self, result: tuple[list[cli.ServerConnection], list[str]]):
+        connections, failed = result
+        email = self.pending_email
+        self.connect_btn.setEnabled(True)
         
         if not connections:
             self.status_label.setText("Falha: Nenhum servidor disponível.")
@@ -178,7 +348,10 @@ class ServerConfigWindow(QMainWindow):
         self.status_label.setStyleSheet("color: green;")
         
         # Open chat window
-        self.chat_window = ChatWindow(self.connections, self.user_email)
+        read_quorum = READ_QUORUMS[self.quorum_input.currentText()]
+        self.chat_window = ChatWindow(
+            self.connections, self.user_email, failed, read_quorum=read_quorum, config=self.pending_config
+        )
         self.chat_window.show()
         self.hide()
 
@@ -186,12 +359,42 @@ class ServerConfigWindow(QMainWindow):
 class ChatWindow(QMainWindow):
     """Main chat window for sending and receiving messages."""
     
-    def __init__(self, connections: list[cli.ServerConnection], user_email: str):
+    # Emitted from the subscription threads, delivered on the GUI thread
+    message_received = pyqtSignal(tuple)
+    # Emitted from the reconnector thread when a failed server comes back
+    server_reconnected = pyqtSignal(object)
+    
+    def __init__(
+            self, connections: list[cli.ServerConnection], user_email: str,
+            failed: list[str] | None = None, cache: InboxCache | None = None,
+            read_quorum: cli.Quorum = cli.Quorum.ALL, config: cli.ClientConfig | None = None
+        ):
         super().__init__()
         self.connections = connections
         self.user_email = user_email
-        self.message_id_counter = 1
+        self.read_quorum = read_quorum
+        self.config = config if config is not None else cli.ClientConfig()
+        self.id_generator = cli.SnowflakeIdGenerator(self.config.node_id)
+        self.inbox_model = InboxModel(self)
         self.init_ui()
+        
+        # History received in earlier sessions, straight from the local disk
+        self.cache = cache if cache is not None else InboxCache()
+        self.add_inbox_messages(self.cache.load(self.user_email))
+        
+        # Messages are pushed by the servers as soon as they are queued
+        self.message_received.connect(self.add_inbox_message)
+        self.subscription = cli.InboxSubscription(
+            self.connections, self.user_email, on_message=self.message_received.emit
+        )
+        self.subscription.start()
+        
+        # Servers that failed the handshake rejoin the connection list once they answer
+        self.server_reconnected.connect(self.on_server_reconnected)
+        self.reconnector = cli.Reconnector(
+            self.connections, list(failed or []), on_reconnect=self.server_reconnected.emit, config=self.config
+        )
+        self.reconnector.start()
     
     def init_ui(self):
         self.setWindowTitle(f"Chat - {self.user_email}")
@@ -212,9 +415,9 @@ class ChatWindow(QMainWindow):
         
         header_layout.addStretch()
         
-        servers_label = QLabel(f"Servidores conectados: {len(self.connections)}")
-        servers_label.setStyleSheet("color: green;")
-        header_layout.addWidget(servers_label)
+        self.servers_label = QLabel(f"Servidores conectados: {len(self.connections)}")
+        self.servers_label.setStyleSheet("color: green;")
+        header_layout.addWidget(self.servers_label)
         
         layout.addLayout(header_layout)
         
@@ -223,8 +426,15 @@ class ChatWindow(QMainWindow):
         inbox_label.setFont(QFont("Arial", 11, QFont.Weight.Bold))
         layout.addWidget(inbox_label)
         
-        self.inbox_list = QListWidget()
+        self.inbox_empty_label = QLabel("(Nenhuma mensagem)")
+        layout.addWidget(self.inbox_empty_label)
+        
+        self.inbox_list = QListView()
         self.inbox_list.setMinimumHeight(200)
+        # Every row has the same layout, so the view can skip measuring rows it does not show
+        self.inbox_list.setUniformItemSizes(True)
+        self.inbox_list.setLayoutMode(QListView.LayoutMode.Batched)
+        self.inbox_list.setModel(self.inbox_model)
         layout.addWidget(self.inbox_list)
         
         # Refresh button
@@ -272,31 +482,39 @@ class ChatWindow(QMainWindow):
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.status_label)
     
+    def set_error(self, error: str):
+        self.status_label.setText(f"Erro: {error}")
+        self.status_label.setStyleSheet("color: red;")
+    
     def refresh_inbox(self):
         self.status_label.setText("Atualizando...")
         self.status_label.setStyleSheet("color: orange;")
-        QApplication.processEvents()
+        self.refresh_btn.setEnabled(False)
         
-        try:
-            inbox_responses = cli.receive_all_messages(self.connections, self.user_email)
-            unique_messages = cli.extract_receive_all_unique_responses(inbox_responses)
-            
-            self.inbox_list.clear()
-            
-            if not unique_messages:
-                self.inbox_list.addItem("(Nenhuma mensagem)")
-            else:
-                for msg_id, msg_text, sender_email, dest_email in unique_messages:
-                    item_text = f"📧 De: {sender_email}\n   {msg_text}"
-                    item = QListWidgetItem(item_text)
-                    self.inbox_list.addItem(item)
-            
-            self.status_label.setText(f"Inbox atualizado: {len(unique_messages)} mensagem(s)")
-            self.status_label.setStyleSheet("color: green;")
-            
-        except Exception as e:
-            self.status_label.setText(f"Erro: {str(e)}")
-            self.status_label.setStyleSheet("color: red;")
+        run_in_background(
+            fetch_unique_messages, self.connections, self.user_email, self.cache, self.read_quorum,
+            on_result=self.on_inbox_refreshed, on_error=self.on_refresh_error
+        )
+    
+    def on_inbox_refreshed(self, unique_messages: list[tuple[int, str, str, str]]):
+        self.refresh_btn.setEnabled(True)
+        new_messages = self.add_inbox_messages(unique_messages)
+        
+        self.status_label.setText(f"Inbox atualizado: {new_messages} mensagem(s)")
+        self.status_label.setStyleSheet("color: green;")
+    
+    def on_refresh_error(self, error: str):
+        self.refresh_btn.setEnabled(True)
+        self.set_error(error)
+    
+    def add_inbox_message(self, message: tuple[int, str, str, str]):
+        self.add_inbox_messages(self.cache.add(self.user_email, [message]))
+    
+    def add_inbox_messages(self, messages: list[tuple[int, str, str, str]]) -> int:
+        new_messages = self.inbox_model.add_messages(messages)
+        if new_messages:
+            self.inbox_empty_label.hide()
+        return new_messages
     
     def send_message(self):
         dest_email = self.dest_input.text().strip()
@@ -312,36 +530,44 @@ class ChatWindow(QMainWindow):
         
         self.status_label.setText("Enviando...")
         self.status_label.setStyleSheet("color: orange;")
-        QApplication.processEvents()
-        
-        try:
-            failed_servers = cli.send_messages(
-                id=self.message_id_counter,
-                connections=self.connections,
-                dest_message=message,
-                self_email=self.user_email,
-                dest_email=dest_email
-            )
-            
-            self.message_id_counter += 1
-            
-            if failed_servers:
-                self.status_label.setText(f"Enviado (falha em {len(failed_servers)} servidor(es))")
-                self.status_label.setStyleSheet("color: orange;")
-            else:
-                self.status_label.setText("Mensagem enviada com sucesso!")
-                self.status_label.setStyleSheet("color: green;")
-                self.message_input.clear()
-                
-        except Exception as e:
-            self.status_label.setText(f"Erro: {str(e)}")
-            self.status_label.setStyleSheet("color: red;")
+        self.send_btn.setEnabled(False)
+        
+        run_in_background(
+            cli.send_messages,
+            id=self.id_generator.next_id(),
+            connections=self.config.write_connections(self.connections),
+            dest_message=message,
+            self_email=self.user_email,
+            dest_email=dest_email,
+            on_result=self.on_message_sent, on_error=self.on_send_error
+        )
+    
+    def on_message_sent(self, failed_servers: list[str]):
+        self.send_btn.setEnabled(True)
+        if failed_servers:
+            self.status_label.setText(f"Enviado (falha em {len(failed_servers)} servidor(es))")
+            self.status_label.setStyleSheet("color: orange;")
+        else:
+            self.status_label.setText("Mensagem enviada com sucesso!")
+            self.status_label.setStyleSheet("color: green;")
+            self.message_input.clear()
+    
+    def on_send_error(self, error: str):
+        self.send_btn.setEnabled(True)
+        self.set_error(error)
 
+    def on_server_reconnected(self, conn: cli.ServerConnection):
+        self.subscription.add_connection(conn)
+        self.servers_label.setText(f"Servidores conectados: {len(self.connections)}")
+    
     def closeEvent(self, event):
         """Handle window close - close all connections."""
+        self.reconnector.stop()
+        self.subscription.cancel()
         for conn in self.connections:
             try:
-                conn.channel.close()
+                conn.close()
             except:
                 pass
+        self.cache.close()
         event.accept()